@@ -5,17 +5,20 @@ import httpx
 import anyio
 from typing import Any
 
+from .http_pool import AZURE, UpstreamHttpPool
 from ..models.common import DetectionBox, NormalizedBounds
 from ..services.errors import DetectionError
+from ..services.executors import BlockingCallPool
 from ..services.utils import clamp
 
 
 class AzureDetectionClient:
   """Thin wrapper over Azure Computer Vision object detection."""
 
-  def __init__(self, endpoint: str, api_key: str) -> None:
+  def __init__(self, endpoint: str, api_key: str, http_pool: UpstreamHttpPool | None = None) -> None:
     self.endpoint = endpoint.rstrip("/")
     self.api_key = api_key
+    self.http_pool = http_pool
 
   async def detect(self, image_bytes: bytes, image_width: int, image_height: int, max_results: int) -> list[DetectionBox]:
     if not self.endpoint or not self.api_key:
@@ -24,8 +27,11 @@ class AzureDetectionClient:
     url = f"{self.endpoint}/vision/v3.2/detect"
     headers = {"Ocp-Apim-Subscription-Key": self.api_key, "Content-Type": "application/octet-stream"}
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-      response = await client.post(url, headers=headers, content=image_bytes)
+    if self.http_pool is not None:
+      response = await self.http_pool.get(AZURE).post(url, headers=headers, content=image_bytes)
+    else:
+      async with httpx.AsyncClient(timeout=10.0) as client:
+        response = await client.post(url, headers=headers, content=image_bytes)
 
     try:
       response.raise_for_status()
@@ -81,7 +87,9 @@ class AzureDetectionClient:
 class AliyunDetectionClient:
   """Alibaba Cloud ObjectDet wrapper."""
 
-  def __init__(self, access_key: str, access_secret: str, region: str, endpoint: str):
+  def __init__(
+    self, access_key: str, access_secret: str, region: str, endpoint: str, executor: BlockingCallPool | None = None
+  ):
     try:
       from alibabacloud_objectdet20191230.client import Client as ObjectdetClient  # type: ignore
       from alibabacloud_objectdet20191230 import models as objectdet_models  # type: ignore
@@ -96,15 +104,17 @@ class AliyunDetectionClient:
       endpoint=endpoint,
     )
     self.client = ObjectdetClient(config)
+    self.models = objectdet_models
+    self.executor = executor
 
   async def detect(self, image_bytes: bytes, image_width: int, image_height: int, max_results: int) -> list[DetectionBox]:
-    # objectdet_models is imported lazily above
-    from alibabacloud_objectdet20191230 import models as objectdet_models  # type: ignore
-
-    request = objectdet_models.DetectObjectRequest(image_base64=base64.b64encode(image_bytes).decode("utf-8"))
+    request = self.models.DetectObjectRequest(image_base64=base64.b64encode(image_bytes).decode("utf-8"))
     try:
       # SDK is sync; run in thread to avoid blocking event loop
-      response = await anyio.to_thread.run_sync(self.client.detect_object, request)
+      if self.executor is not None:
+        response = await self.executor.run(self.client.detect_object, request)
+      else:
+        response = await anyio.to_thread.run_sync(self.client.detect_object, request)
     except Exception as exc:
       raise DetectionError("aliyun_error", "阿里云检测失败", status_code=502) from exc
 
@@ -0,0 +1,90 @@
+"""Shared, connection-pooled HTTP clients for upstream services."""
+from __future__ import annotations
+
+import httpx
+
+from ..config import Settings
+from .resilience import ResilientTransport, UpstreamGuard
+
+AZURE = "azure"
+LLM = "llm"
+GEMINI = "gemini"
+# Job completion callbacks to client-supplied (allowlisted) URLs.
+CALLBACK = "callback"
+
+
+def _http2_available() -> bool:
+  try:
+    import h2  # type: ignore  # noqa: F401
+  except ImportError:  # pragma: no cover - optional dep for HTTP/2
+    return False
+  return True
+
+
+class UpstreamHttpPool:
+  """Holds one keep-alive `httpx.AsyncClient` per upstream, reused across requests.
+
+  Every client sends through a `ResilientTransport` whose per-upstream guard
+  (circuit breaker, retries, adaptive concurrency) survives client rebuilds.
+  """
+
+  def __init__(self, settings: Settings):
+    self.settings = settings
+    self._timeouts = {
+      AZURE: settings.azure_cv_timeout,
+      LLM: settings.text_gen_timeout,
+      GEMINI: settings.image_gen_timeout,
+      CALLBACK: settings.image_job_callback_timeout,
+    }
+    self._clients: dict[str, httpx.AsyncClient] = {}
+    self.guards = {upstream: self._build_guard(upstream) for upstream in self._timeouts}
+
+  def get(self, upstream: str) -> httpx.AsyncClient:
+    """Return the pooled client for `upstream`, creating it on first use."""
+    client = self._clients.get(upstream)
+    if client is None or client.is_closed:
+      client = self._build_client(upstream)
+      self._clients[upstream] = client
+    return client
+
+  def start(self) -> None:
+    """Eagerly open clients for every known upstream (called from app lifespan)."""
+    for upstream in self._timeouts:
+      self.get(upstream)
+
+  async def aclose(self) -> None:
+    clients = list(self._clients.values())
+    self._clients.clear()
+    for client in clients:
+      await client.aclose()
+
+  def _build_client(self, upstream: str) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+      max_connections=self.settings.upstream_max_connections,
+      max_keepalive_connections=self.settings.upstream_max_keepalive_connections,
+      keepalive_expiry=self.settings.upstream_keepalive_expiry,
+    )
+    timeout = httpx.Timeout(self._timeouts.get(upstream, 10.0), connect=self.settings.upstream_connect_timeout)
+    http2 = self.settings.upstream_http2 and _http2_available()
+    if upstream not in self.guards:
+      self.guards[upstream] = self._build_guard(upstream)
+    transport = ResilientTransport(httpx.AsyncHTTPTransport(limits=limits, http2=http2), self.guards[upstream])
+    return httpx.AsyncClient(transport=transport, timeout=timeout)
+
+  def _build_guard(self, upstream: str) -> UpstreamGuard:
+    settings = self.settings
+    return UpstreamGuard(
+      upstream,
+      max_attempts=settings.upstream_max_attempts,
+      retry_base_delay=settings.upstream_retry_base_delay,
+      retry_max_delay=settings.upstream_retry_max_delay,
+      failure_threshold=settings.upstream_breaker_failure_threshold,
+      reset_seconds=settings.upstream_breaker_reset_seconds,
+      initial_concurrency=settings.upstream_concurrency_initial,
+      min_concurrency=settings.upstream_concurrency_min,
+      max_concurrency=settings.upstream_max_connections,
+      queue_timeout=settings.upstream_concurrency_queue_timeout,
+    )
+
+  def stats(self) -> dict[str, dict[str, float | str]]:
+    return {upstream: guard.stats() for upstream, guard in self.guards.items()}
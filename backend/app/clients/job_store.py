@@ -0,0 +1,235 @@
+"""Pluggable persistence for image generation jobs.
+
+`MemoryJobStore` is the in-process default; `SQLiteJobStore` keeps jobs in a
+local SQLite file (shared by workers on one host, or standing in for a real
+broker in tests). Both hand out queued jobs highest priority first, then FIFO.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import sqlite3
+import threading
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Protocol
+
+from ..services.executors import BlockingCallPool
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class JobRecord:
+  id: str
+  status: str
+  priority: int
+  created_at: float
+  updated_at: float
+  image: bytes
+  prompt: str | None
+  block_size: int
+  callback_url: str | None = None
+  expires_at: float | None = None
+  result: bytes | None = None
+  mime_type: str | None = None
+  error_code: str | None = None
+  error_message: str | None = None
+
+
+class JobStore(Protocol):
+  async def add(self, job: JobRecord) -> None: ...
+
+  async def get(self, job_id: str) -> JobRecord | None: ...
+
+  async def claim_next(self, now: float) -> JobRecord | None:
+    """Atomically move the best queued job to `running` and return it."""
+    ...
+
+  async def update(self, job: JobRecord) -> None: ...
+
+  async def count_queued(self) -> int: ...
+
+  async def purge_expired(self, now: float) -> int: ...
+
+  async def requeue_stale(self, before: float, now: float) -> int:
+    """Move `running` jobs claimed before `before` (their worker died) back to `queued`."""
+    ...
+
+  def close(self) -> None: ...
+
+
+class MemoryJobStore:
+  def __init__(self) -> None:
+    self._jobs: dict[str, JobRecord] = {}
+    self._queue: list[tuple[int, int, str]] = []
+    self._sequence = itertools.count()
+
+  async def add(self, job: JobRecord) -> None:
+    self._jobs[job.id] = job
+    heapq.heappush(self._queue, (-job.priority, next(self._sequence), job.id))
+
+  async def get(self, job_id: str) -> JobRecord | None:
+    return self._jobs.get(job_id)
+
+  async def claim_next(self, now: float) -> JobRecord | None:
+    while self._queue:
+      _, _, job_id = heapq.heappop(self._queue)
+      job = self._jobs.get(job_id)
+      if job is not None and job.status == QUEUED:
+        claimed = replace(job, status=RUNNING, updated_at=now)
+        self._jobs[job_id] = claimed
+        return claimed
+    return None
+
+  async def update(self, job: JobRecord) -> None:
+    self._jobs[job.id] = job
+    if job.status == QUEUED:
+      # Re-queued (e.g. interrupted); a stale heap entry for it is skipped once claimed.
+      heapq.heappush(self._queue, (-job.priority, next(self._sequence), job.id))
+
+  async def count_queued(self) -> int:
+    return sum(1 for job in self._jobs.values() if job.status == QUEUED)
+
+  async def purge_expired(self, now: float) -> int:
+    expired = [job_id for job_id, job in self._jobs.items() if job.expires_at is not None and job.expires_at <= now]
+    for job_id in expired:
+      del self._jobs[job_id]
+    return len(expired)
+
+  async def requeue_stale(self, before: float, now: float) -> int:
+    stale = [job for job in self._jobs.values() if job.status == RUNNING and job.updated_at < before]
+    for job in stale:
+      await self.update(replace(job, status=QUEUED, updated_at=now))
+    return len(stale)
+
+  def close(self) -> None:
+    pass
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+  id TEXT PRIMARY KEY,
+  status TEXT NOT NULL,
+  priority INTEGER NOT NULL,
+  created_at REAL NOT NULL,
+  updated_at REAL NOT NULL,
+  image BLOB NOT NULL,
+  prompt TEXT,
+  block_size INTEGER NOT NULL,
+  callback_url TEXT,
+  expires_at REAL,
+  result BLOB,
+  mime_type TEXT,
+  error_code TEXT,
+  error_message TEXT
+)
+"""
+
+_COLUMNS = (
+  "id, status, priority, created_at, updated_at, image, prompt, block_size, callback_url, expires_at, "
+  "result, mime_type, error_code, error_message"
+)
+
+
+class SQLiteJobStore:
+  """Jobs in a SQLite file; blocking sqlite calls run on a small dedicated pool."""
+
+  def __init__(self, path: Path | str, max_workers: int = 2):
+    self.path = str(path)
+    if self.path != ":memory:":
+      Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+    self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+    self._lock = threading.Lock()
+    self.executor = BlockingCallPool("sqlite-jobs", max_workers)
+    with self._lock:
+      self._conn.execute("PRAGMA journal_mode=WAL")
+      self._conn.execute(_SCHEMA)
+      self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at)")
+
+  async def add(self, job: JobRecord) -> None:
+    await self.executor.run(self._write, job, True)
+
+  async def get(self, job_id: str) -> JobRecord | None:
+    return await self.executor.run(self._get_sync, job_id)
+
+  async def claim_next(self, now: float) -> JobRecord | None:
+    return await self.executor.run(self._claim_sync, now)
+
+  async def update(self, job: JobRecord) -> None:
+    await self.executor.run(self._write, job, False)
+
+  async def count_queued(self) -> int:
+    return await self.executor.run(self._scalar, "SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,))
+
+  async def purge_expired(self, now: float) -> int:
+    return await self.executor.run(self._delete_expired, now)
+
+  async def requeue_stale(self, before: float, now: float) -> int:
+    return await self.executor.run(self._requeue_stale_sync, before, now)
+
+  def close(self) -> None:
+    self.executor.shutdown()
+    with self._lock:
+      self._conn.close()
+
+  def _write(self, job: JobRecord, insert: bool) -> None:
+    verb = "INSERT" if insert else "REPLACE"
+    with self._lock:
+      self._conn.execute(f"{verb} INTO jobs ({_COLUMNS}) VALUES ({', '.join('?' * 14)})", _row(job))
+
+  def _get_sync(self, job_id: str) -> JobRecord | None:
+    with self._lock:
+      row = self._conn.execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return JobRecord(*row) if row else None
+
+  def _claim_sync(self, now: float) -> JobRecord | None:
+    with self._lock:
+      self._conn.execute("BEGIN IMMEDIATE")
+      try:
+        row = self._conn.execute(
+          f"SELECT {_COLUMNS} FROM jobs WHERE status = ? ORDER BY priority DESC, created_at LIMIT 1", (QUEUED,)
+        ).fetchone()
+        if row is not None:
+          self._conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (RUNNING, now, row[0]))
+        self._conn.execute("COMMIT")
+      except BaseException:
+        self._conn.execute("ROLLBACK")
+        raise
+    return replace(JobRecord(*row), status=RUNNING, updated_at=now) if row else None
+
+  def _scalar(self, sql: str, params: tuple) -> int:
+    with self._lock:
+      return self._conn.execute(sql, params).fetchone()[0]
+
+  def _delete_expired(self, now: float) -> int:
+    with self._lock:
+      return self._conn.execute("DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)).rowcount
+
+  def _requeue_stale_sync(self, before: float, now: float) -> int:
+    with self._lock:
+      return self._conn.execute(
+        "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ?", (QUEUED, now, RUNNING, before)
+      ).rowcount
+
+
+def _row(job: JobRecord) -> tuple:
+  return (
+    job.id,
+    job.status,
+    job.priority,
+    job.created_at,
+    job.updated_at,
+    job.image,
+    job.prompt,
+    job.block_size,
+    job.callback_url,
+    job.expires_at,
+    job.result,
+    job.mime_type,
+    job.error_code,
+    job.error_message,
+  )
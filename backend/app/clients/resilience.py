@@ -0,0 +1,347 @@
+"""Circuit breaking, Retry-After aware retries and adaptive concurrency for upstream HTTP calls.
+
+`ResilientTransport` wraps the real httpx transport of each pooled client, so
+Azure, the LLM and Gemini get the same protection without changes to their
+clients. Throttled or broken upstreams are answered locally with a synthetic
+429/503 (plus `Retry-After`), which the clients already map to their errors.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Callable
+
+import httpx
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+from ..services.metrics import observe_upstream
+
+# Throttling / temporary unavailability: retried, and shrink the concurrency limit.
+OVERLOAD_STATUSES = frozenset({429, 503})
+
+
+class CircuitBreaker:
+  """Closed -> open after `failure_threshold` consecutive failures -> half-open probe after `reset_seconds`."""
+
+  def __init__(self, failure_threshold: int, reset_seconds: float, clock: Callable[[], float] = time.monotonic):
+    self.failure_threshold = max(1, failure_threshold)
+    self.reset_seconds = reset_seconds
+    self._clock = clock
+    self.consecutive_failures = 0
+    self.opened = 0
+    self._open_until = 0.0
+    self._tripped = False
+    self._probing = False
+    # Status for locally answered calls: 429 while honouring a Retry-After, 503 after failures.
+    self.reject_status = 503
+
+  @property
+  def state(self) -> str:
+    if not self._tripped:
+      return "closed"
+    return "open" if self._clock() < self._open_until else "half_open"
+
+  def allow(self) -> float | None:
+    """Return None if a call may go out, else the seconds until the next attempt is allowed."""
+    if not self._tripped:
+      return None
+    remaining = self._open_until - self._clock()
+    if remaining > 0:
+      return remaining
+    if self._probing:
+      return 1.0
+    self._probing = True
+    return None
+
+  def record_success(self) -> None:
+    self.consecutive_failures = 0
+    self._tripped = False
+    self._probing = False
+
+  def release_probe(self) -> None:
+    """The half-open probe was cancelled without an answer: stay half-open and let the next call probe."""
+    self._probing = False
+
+  def record_failure(self) -> None:
+    self.consecutive_failures += 1
+    if self._probing or self.consecutive_failures >= self.failure_threshold:
+      self.reject_status = 503
+      self._open(self.reset_seconds)
+
+  def throttle(self, seconds: float) -> None:
+    """Open for `seconds`, e.g. when the upstream sent a long Retry-After."""
+    self.reject_status = 429
+    self._open(seconds)
+
+  def _open(self, seconds: float) -> None:
+    if not self._tripped or self._probing:
+      self.opened += 1
+    self._tripped = True
+    self._probing = False
+    self._open_until = max(self._open_until, self._clock() + seconds)
+
+
+class AdaptiveLimit:
+  """AIMD concurrency limit: +1/limit per success, halve on overload, FIFO waiters."""
+
+  def __init__(self, initial: int, minimum: int, maximum: int):
+    self.minimum = max(1, minimum)
+    self.maximum = max(self.minimum, maximum)
+    self.limit = float(min(max(initial, self.minimum), self.maximum))
+    self.in_flight = 0
+    self._waiters: deque[asyncio.Future[None]] = deque()
+
+  @property
+  def current(self) -> int:
+    return max(self.minimum, int(self.limit))
+
+  @property
+  def waiting(self) -> int:
+    return len(self._waiters)
+
+  async def acquire(self, timeout: float) -> bool:
+    if self.in_flight < self.current and not self._waiters:
+      self.in_flight += 1
+      return True
+    waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+    self._waiters.append(waiter)
+    try:
+      await asyncio.wait_for(asyncio.shield(waiter), timeout)
+      return True
+    except asyncio.TimeoutError:
+      if waiter.done() and not waiter.cancelled():
+        return True  # the slot was handed over just as we gave up
+      waiter.cancel()
+      return False
+    except asyncio.CancelledError:
+      if waiter.done() and not waiter.cancelled():
+        self.release()
+      waiter.cancel()
+      raise
+    finally:
+      if waiter in self._waiters:
+        self._waiters.remove(waiter)
+
+  def release(self) -> None:
+    self.in_flight -= 1
+    self._wake()
+
+  def on_success(self) -> None:
+    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+    self._wake()
+
+  def on_overload(self) -> None:
+    self.limit = max(self.minimum, self.limit / 2)
+
+  def _wake(self) -> None:
+    while self._waiters and self.in_flight < self.current:
+      waiter = self._waiters.popleft()
+      if not waiter.done():
+        self.in_flight += 1
+        waiter.set_result(None)
+
+
+class UpstreamGuard:
+  """Per-upstream resilience state; outlives the httpx clients that use it."""
+
+  def __init__(
+    self,
+    name: str,
+    *,
+    max_attempts: int = 3,
+    retry_base_delay: float = 0.2,
+    retry_max_delay: float = 2.0,
+    failure_threshold: int = 5,
+    reset_seconds: float = 10.0,
+    initial_concurrency: int = 8,
+    min_concurrency: int = 1,
+    max_concurrency: int = 20,
+    queue_timeout: float = 2.0,
+    clock: Callable[[], float] = time.monotonic,
+  ):
+    self.name = name
+    self.max_attempts = max(1, max_attempts)
+    self.retry_max_delay = retry_max_delay
+    self.queue_timeout = queue_timeout
+    self.breaker = CircuitBreaker(failure_threshold, reset_seconds, clock)
+    self.limiter = AdaptiveLimit(initial_concurrency, min_concurrency, max_concurrency)
+    self._backoff = wait_random_exponential(multiplier=retry_base_delay, max=retry_max_delay)
+    self.calls = 0
+    self.retries = 0
+    self.rejected = 0
+    self.throttled = 0
+
+  def stats(self) -> dict[str, float | str]:
+    return {
+      "state": self.breaker.state,
+      "consecutive_failures": self.breaker.consecutive_failures,
+      "breaker_opened": self.breaker.opened,
+      "concurrency_limit": round(self.limiter.limit, 2),
+      "in_flight": self.limiter.in_flight,
+      "waiting": self.limiter.waiting,
+      "calls": self.calls,
+      "retries": self.retries,
+      "rejected": self.rejected,
+      "throttled": self.throttled,
+    }
+
+  def retry_wait(self, retry_state) -> float:
+    error = retry_state.outcome.exception() if retry_state.outcome else None
+    if isinstance(error, _RetryableResponse) and error.retry_after is not None:
+      return error.retry_after
+    return self._backoff(retry_state)
+
+
+class _RetryableResponse(Exception):
+  def __init__(self, response: httpx.Response, retry_after: float | None):
+    super().__init__(f"upstream answered {response.status_code}")
+    self.response = response
+    self.retry_after = retry_after
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+  """Holds the concurrency slot until a (possibly streamed) body is closed."""
+
+  def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+    self._stream = stream
+    self._release: Callable[[], None] | None = release
+
+  async def __aiter__(self) -> AsyncIterator[bytes]:
+    async for chunk in self._stream:
+      yield chunk
+
+  async def aclose(self) -> None:
+    try:
+      await self._stream.aclose()
+    finally:
+      release, self._release = self._release, None
+      if release is not None:
+        release()
+
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+  def __init__(self, inner: httpx.AsyncBaseTransport, guard: UpstreamGuard):
+    self.inner = inner
+    self.guard = guard
+
+  async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+    await request.aread()  # buffered body so retries can resend it
+    retrying = AsyncRetrying(
+      stop=stop_after_attempt(self.guard.max_attempts),
+      wait=self.guard.retry_wait,
+      retry=retry_if_exception_type((_RetryableResponse, httpx.ConnectError)),
+      before_sleep=self._count_retry,
+      reraise=True,
+    )
+    try:
+      return await retrying(self._send_once, request)
+    except _RetryableResponse as exc:
+      return exc.response
+
+  def _count_retry(self, retry_state) -> None:
+    self.guard.retries += 1
+
+  async def _send_once(self, request: httpx.Request) -> httpx.Response:
+    guard = self.guard
+    wait = guard.breaker.allow()
+    if wait is not None:
+      guard.rejected += 1
+      return _local_response(request, guard.breaker.reject_status, wait)
+    # In half-open state the call just let through is the single probe; it must hand the slot back
+    # if it ends without an answer, or the breaker would refuse every later call.
+    probe = guard.breaker.state == "half_open"
+    try:
+      acquired = await guard.limiter.acquire(guard.queue_timeout)
+    except BaseException:
+      if probe:
+        guard.breaker.release_probe()
+      raise
+    if not acquired:
+      if probe:
+        guard.breaker.release_probe()
+      guard.rejected += 1
+      return _local_response(request, 503, guard.queue_timeout)
+
+    guard.calls += 1
+    started = time.perf_counter()
+    try:
+      response = await self.inner.handle_async_request(request)
+    except httpx.TimeoutException:
+      observe_upstream(guard.name, "timeout", time.perf_counter() - started)
+      guard.limiter.release()
+      guard.limiter.on_overload()
+      guard.breaker.record_failure()
+      raise
+    except Exception:
+      observe_upstream(guard.name, "error", time.perf_counter() - started)
+      guard.limiter.release()
+      guard.breaker.record_failure()
+      raise
+    except BaseException:
+      # Cancelled, e.g. the losing side of a hedged detection or a client disconnect.
+      guard.limiter.release()
+      if probe:
+        guard.breaker.release_probe()
+      raise
+
+    status = response.status_code
+    elapsed = time.perf_counter() - started
+    if status in OVERLOAD_STATUSES or status >= 500:
+      observe_upstream(guard.name, "throttled" if status in OVERLOAD_STATUSES else "server_error", elapsed)
+      try:
+        # Raw bytes straight from the transport stream: the rebuilt response keeps the original
+        # Content-Encoding, and responses built with `content=` (already read) work too.
+        body = b"".join([chunk async for chunk in response.stream])
+        await response.aclose()
+      finally:
+        guard.limiter.release()
+      guard.breaker.record_failure()
+      if status not in OVERLOAD_STATUSES:
+        return httpx.Response(status, headers=response.headers, content=body, request=request)
+      guard.limiter.on_overload()
+      guard.throttled += 1
+      retry_after = _retry_after_seconds(response.headers.get("retry-after"))
+      rebuilt = httpx.Response(status, headers=response.headers, content=body, request=request)
+      if retry_after is not None and retry_after > guard.retry_max_delay:
+        # Not worth waiting in-request: stop everyone calling until the upstream says so.
+        guard.breaker.throttle(retry_after)
+        return rebuilt
+      raise _RetryableResponse(rebuilt, retry_after)
+
+    observe_upstream(guard.name, "ok" if status < 400 else "client_error", elapsed)
+    guard.breaker.record_success()
+    guard.limiter.on_success()
+    return httpx.Response(
+      status,
+      headers=response.headers,
+      stream=_ReleasingStream(response.stream, guard.limiter.release),
+      extensions=response.extensions,
+      request=request,
+    )
+
+  async def aclose(self) -> None:
+    await self.inner.aclose()
+
+
+def _local_response(request: httpx.Request, status: int, retry_after: float) -> httpx.Response:
+  return httpx.Response(
+    status,
+    headers={"Retry-After": str(max(1, round(retry_after))), "X-Upstream-Guard": "rejected"},
+    json={"error": "upstream temporarily unavailable"},
+    request=request,
+  )
+
+
+def _retry_after_seconds(value: str | None) -> float | None:
+  if not value:
+    return None
+  try:
+    return max(0.0, float(value))
+  except ValueError:
+    pass
+  try:
+    return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+  except (TypeError, ValueError):
+    return None
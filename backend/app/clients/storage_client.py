@@ -1,97 +1,262 @@
 from __future__ import annotations
 
+import bisect
 import json
-from datetime import datetime
+import os
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import List
+from typing import Any, List, Tuple
 
 from ..models.common import ArtworkRecord
 from ..services.errors import StorageError
+from ..services.executors import BlockingCallPool
+
+
+RecordKey = Tuple[datetime, str]
+
+
+def record_key(record: ArtworkRecord) -> RecordKey:
+  """Sort/pagination key for artwork records: (created_at in UTC, id)."""
+  created_at = record.created_at
+  if created_at.tzinfo is None:
+    created_at = created_at.replace(tzinfo=timezone.utc)
+  return created_at, record.id
+
+
+class SortedRecordIndex:
+  """Records kept sorted ascending by `record_key`, paged newest-first via bisect."""
+
+  def __init__(self, records: List[ArtworkRecord] | None = None):
+    self._records: list[ArtworkRecord] = sorted(records or [], key=record_key)
+    self._keys: list[RecordKey] = [record_key(record) for record in self._records]
+
+  def insert(self, record: ArtworkRecord) -> None:
+    key = record_key(record)
+    # New records are almost always the newest, so this is usually an O(1) append.
+    position = bisect.bisect_right(self._keys, key)
+    self._keys.insert(position, key)
+    self._records.insert(position, record)
+
+  def page(self, limit: int, before: RecordKey | None = None) -> List[ArtworkRecord]:
+    """Return up to `limit` records newest-first, strictly older than `before`."""
+    end = len(self._keys) if before is None else bisect.bisect_left(self._keys, before)
+    start = max(0, end - limit)
+    return self._records[start:end][::-1]
+
+  def __len__(self) -> int:
+    return len(self._records)
 
 
 class LocalStorageClient:
-  """Simple filesystem-backed storage used for local dev and tests."""
+  """Filesystem-backed storage used for local dev and tests.
+
+  Records live in an append-only JSONL log (`records.jsonl`). The log is read
+  once on startup into an in-memory index; each save appends one line.
+  """
 
   def __init__(self, base_dir: Path):
     self.base_dir = Path(base_dir)
     self.images_dir = self.base_dir / "images"
-    self.records_file = self.base_dir / "records.json"
+    self.records_log = self.base_dir / "records.jsonl"
+    self.legacy_records_file = self.base_dir / "records.json"
     self.images_dir.mkdir(parents=True, exist_ok=True)
-    if not self.records_file.exists():
-      self.records_file.write_text("[]", encoding="utf-8")
+    if not self.records_log.exists() and self.legacy_records_file.exists():
+      self._migrate_legacy_records()
+    self._index(self._load_log())
+    self._stored_images: set[str] = {path.name for path in self.images_dir.iterdir() if path.is_file()}
+
+  async def find_image(self, filename: str) -> str | None:
+    """Return the URL of an already-stored image, or None if it must be uploaded."""
+    if filename in self._stored_images:
+      return self._image_url(filename)
+    return None
 
   async def upload_image(self, filename: str, data: bytes, content_type: str = "image/png") -> str:
     try:
       path = self.images_dir / filename
       path.write_bytes(data)
-      return f"local://artworks/{filename}"
     except Exception as exc:  # pragma: no cover - defensive
       raise StorageError("local_write_failed", "无法写入本地存储") from exc
+    self._stored_images.add(filename)
+    return self._image_url(filename)
+
+  @staticmethod
+  def _image_url(filename: str) -> str:
+    return f"local://artworks/{filename}"
 
   async def save_record(self, record: ArtworkRecord) -> None:
-    records = self._load_records()
-    records.append(record)
-    self.records_file.write_text(
-      json.dumps([r.model_dump(mode="json") for r in records], ensure_ascii=False), encoding="utf-8"
-    )
+    await self.save_records([record])
+
+  async def save_records(self, records: List[ArtworkRecord]) -> None:
+    """Append several records with one write."""
+    if not records:
+      return
+    lines = "".join(json.dumps(record.model_dump(mode="json"), ensure_ascii=False) + "\n" for record in records)
+    try:
+      self._append_line(lines.encode("utf-8"))
+    except OSError as exc:  # pragma: no cover - defensive
+      raise StorageError("local_write_failed", "无法写入本地存储") from exc
+    for record in records:
+      self._insert(record)
+
+  async def list_records(
+    self, limit: int = 20, before: RecordKey | None = None, user_id: str | None = None
+  ) -> List[ArtworkRecord]:
+    """Return up to `limit` records newest-first, strictly older than `before`."""
+    if user_id is None:
+      return self._all.page(limit, before)
+    index = self._by_user.get(user_id)
+    return index.page(limit, before) if index else []
+
+  def close(self) -> None:
+    """Nothing to release; present for parity with SupabaseStorageClient."""
+
+  def compact(self) -> int:
+    """Rewrite the log with only well-formed records; returns the number kept.
+
+    Intended to run offline (no server writing to the same directory).
+    """
+    records = self._load_log()
+    tmp_path = self.records_log.with_suffix(".jsonl.tmp")
+    with tmp_path.open("w", encoding="utf-8") as handle:
+      for record in records:
+        handle.write(json.dumps(record.model_dump(mode="json"), ensure_ascii=False) + "\n")
+      handle.flush()
+      os.fsync(handle.fileno())
+    os.replace(tmp_path, self.records_log)
+    self._index(records)
+    return len(records)
+
+  def _index(self, records: List[ArtworkRecord]) -> None:
+    """Rebuild the global index and the per-user secondary indexes."""
+    self._all = SortedRecordIndex(records)
+    grouped: dict[str, list[ArtworkRecord]] = {}
+    for record in records:
+      grouped.setdefault(record.user_id, []).append(record)
+    self._by_user = {user_id: SortedRecordIndex(items) for user_id, items in grouped.items()}
 
-  async def list_records(self, limit: int = 20) -> List[ArtworkRecord]:
-    records = self._load_records()
-    sorted_records = sorted(records, key=lambda r: r.created_at, reverse=True)
-    return sorted_records[:limit]
+  def _insert(self, record: ArtworkRecord) -> None:
+    self._all.insert(record)
+    self._by_user.setdefault(record.user_id, SortedRecordIndex()).insert(record)
 
-  def _load_records(self) -> List[ArtworkRecord]:
-    raw = self.records_file.read_text(encoding="utf-8")
-    if not raw.strip():
+  def _append_line(self, data: bytes) -> None:
+    # One O_APPEND write per record so concurrent appends never interleave mid-line.
+    fd = os.open(self.records_log, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+      os.write(fd, data)
+    finally:
+      os.close(fd)
+
+  def _load_log(self) -> List[ArtworkRecord]:
+    if not self.records_log.exists():
       return []
-    data = json.loads(raw)
+    raw = self.records_log.read_bytes()
+    complete_end = raw.rfind(b"\n") + 1
+    if complete_end < len(raw):
+      # Drop a torn trailing line left by a crash so the next append starts clean.
+      with self.records_log.open("r+b") as handle:
+        handle.truncate(complete_end)
     records: list[ArtworkRecord] = []
-    for item in data:
+    for line in raw[:complete_end].decode("utf-8").splitlines():
+      if not line.strip():
+        continue
       try:
-        records.append(
-          ArtworkRecord(
-            id=item["id"],
-            user_id=item["user_id"],
-            url=item["url"],
-            created_at=datetime.fromisoformat(item["created_at"]),
-          )
-        )
+        records.append(self._parse_record(json.loads(line)))
       except Exception:
         continue
     return records
 
+  def _migrate_legacy_records(self) -> None:
+    """Convert a pre-JSONL `records.json` array into the append-only log."""
+    raw = self.legacy_records_file.read_text(encoding="utf-8")
+    items = json.loads(raw) if raw.strip() else []
+    lines = []
+    for item in items:
+      try:
+        record = self._parse_record(item)
+      except Exception:
+        continue
+      lines.append(json.dumps(record.model_dump(mode="json"), ensure_ascii=False) + "\n")
+    tmp_path = self.records_log.with_suffix(".jsonl.tmp")
+    tmp_path.write_text("".join(lines), encoding="utf-8")
+    os.replace(tmp_path, self.records_log)
+
+  @staticmethod
+  def _parse_record(item: dict) -> ArtworkRecord:
+    return ArtworkRecord(
+      id=item["id"],
+      user_id=item["user_id"],
+      url=item["url"],
+      created_at=datetime.fromisoformat(item["created_at"]),
+    )
+
 
 class SupabaseStorageClient:
-  """Supabase-backed storage. Only instantiated when credentials are present."""
+  """Supabase-backed storage. Only instantiated when credentials are present.
 
-  def __init__(self, url: str, key: str, bucket: str, table: str):
-    try:
-      from supabase import create_client
-    except ImportError as exc:  # pragma: no cover - library missing
-      raise StorageError("supabase_import", "缺少 supabase 依赖") from exc
+  The supabase SDK is synchronous, so every call runs on a dedicated bounded
+  thread pool instead of blocking the event loop.
+  """
 
-    self.client = create_client(url, key)
+  def __init__(self, url: str, key: str, bucket: str, table: str, max_workers: int = 4, client: Any = None):
+    if client is None:
+      try:
+        from supabase import create_client
+      except ImportError as exc:  # pragma: no cover - library missing
+        raise StorageError("supabase_import", "缺少 supabase 依赖") from exc
+      client = create_client(url, key)
+
+    self.client = client
     self.bucket = bucket
     self.table = table
+    self.executor = BlockingCallPool("supabase", max_workers, upstream="supabase")
+    # filename -> public URL for blobs known to exist in the bucket.
+    self._stored_images: dict[str, str] = {}
+
+  async def find_image(self, filename: str) -> str | None:
+    """Return the public URL if the bucket already holds `filename`, else None.
+
+    Known blobs are answered from memory; otherwise one `exists()` lookup
+    (a HEAD request) replaces a multi-MB upload after a restart or on another
+    instance.
+    """
+    url = self._stored_images.get(filename)
+    if url is not None:
+      return url
+    try:
+      url = await self.executor.run(self._find_sync, filename)
+    except Exception:  # pragma: no cover - a failed lookup just means "upload it"
+      return None
+    if url is not None:
+      self._stored_images[filename] = url
+    return url
 
   async def upload_image(self, filename: str, data: bytes, content_type: str = "image/png") -> str:
     try:
-      self.client.storage.from_(self.bucket).upload(filename, data, {"content-type": content_type, "upsert": True})
-      public_url = self.client.storage.from_(self.bucket).get_public_url(filename)
-      return public_url
+      url = await self.executor.run(self._upload_sync, filename, data, content_type)
     except Exception as exc:  # pragma: no cover - network path not exercised in tests
       raise StorageError("supabase_upload_failed", "Supabase 上传失败") from exc
+    self._stored_images[filename] = url
+    return url
 
   async def save_record(self, record: ArtworkRecord) -> None:
+    await self.save_records([record])
+
+  async def save_records(self, records: List[ArtworkRecord]) -> None:
+    """Insert several records with a single round trip."""
+    if not records:
+      return
+    rows = [record.model_dump(mode="json") for record in records]
     try:
-      self.client.table(self.table).insert(record.model_dump()).execute()
+      await self.executor.run(lambda: self.client.table(self.table).insert(rows).execute())
     except Exception as exc:  # pragma: no cover
       raise StorageError("supabase_insert_failed", "Supabase 记录写入失败") from exc
 
-  async def list_records(self, limit: int = 20) -> List[ArtworkRecord]:
+  async def list_records(
+    self, limit: int = 20, before: RecordKey | None = None, user_id: str | None = None
+  ) -> List[ArtworkRecord]:
     try:
-      response = self.client.table(self.table).select("*").order("created_at", desc=True).limit(limit).execute()
-      items = response.data or []
+      items = await self.executor.run(self._list_sync, limit, before, user_id)
       return [
         ArtworkRecord(
           id=item["id"],
@@ -103,3 +268,30 @@ class SupabaseStorageClient:
       ]
     except Exception as exc:  # pragma: no cover
       raise StorageError("supabase_list_failed", "Supabase 读取失败") from exc
+
+  def close(self) -> None:
+    self.executor.shutdown()
+
+  def _upload_sync(self, filename: str, data: bytes, content_type: str) -> str:
+    bucket = self.client.storage.from_(self.bucket)
+    bucket.upload(filename, data, {"content-type": content_type, "upsert": True})
+    return bucket.get_public_url(filename)
+
+  def _find_sync(self, filename: str) -> str | None:
+    bucket = self.client.storage.from_(self.bucket)
+    if not bucket.exists(filename):
+      return None
+    return bucket.get_public_url(filename)
+
+  def _list_sync(self, limit: int, before: RecordKey | None, user_id: str | None) -> list[dict]:
+    query = self.client.table(self.table).select("*")
+    if user_id is not None:
+      # Served by the (user_id, created_at desc, id desc) index on the table.
+      query = query.eq("user_id", user_id)
+    if before is not None:
+      created_at, record_id = before[0].isoformat(), before[1]
+      query = query.or_(
+        f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{record_id}")'
+      )
+    response = query.order("created_at", desc=True).order("id", desc=True).limit(limit).execute()
+    return response.data or []
@@ -1,56 +1,139 @@
 from __future__ import annotations
 
+import json
+from contextlib import AsyncExitStack
+from typing import Any, AsyncIterator
+
 import httpx
 
+from .http_pool import LLM, UpstreamHttpPool
 from ..services.errors import TextGenerationError
 
 
 class LLMTextClient:
   """Generic LLM text generation client."""
 
-  def __init__(self, endpoint: str, api_key: str):
+  def __init__(self, endpoint: str, api_key: str, http_pool: UpstreamHttpPool | None = None):
     self.endpoint = endpoint
     self.api_key = api_key
+    self.http_pool = http_pool
 
   async def generate_description(self, object_name: str, category: str, context: str | None = None) -> str:
+    payload, headers = self._request(object_name, category, context)
+
+    try:
+      if self.http_pool is not None:
+        response = await self.http_pool.get(LLM).post(self.endpoint, json=payload, headers=headers)
+      else:
+        async with httpx.AsyncClient(timeout=12.0) as client:
+          response = await client.post(self.endpoint, json=payload, headers=headers)
+      response.raise_for_status()
+    except httpx.HTTPStatusError as exc:
+      raise _status_error(exc.response.status_code) from exc
+    except httpx.TimeoutException as exc:
+      raise TextGenerationError("timeout", "文案生成超时", status_code=504) from exc
+
+    text = _extract_text(response.json())
+    if text is None:
+      raise TextGenerationError("invalid_response", "文案服务响应不可用", status_code=502)
+    return text.strip()
+
+  async def stream_description(
+    self, object_name: str, category: str, context: str | None = None
+  ) -> AsyncIterator[str]:
+    """Yield text deltas from an OpenAI-style SSE stream (`choices[0].delta.content`).
+
+    Upstreams that ignore `stream` and answer with plain JSON yield their whole
+    text once. Closing the iterator early closes the upstream connection, which
+    stops generation.
+    """
+    payload, headers = self._request(object_name, category, context)
+    payload["stream"] = True
+    headers["Accept"] = "text/event-stream"
+
+    async with AsyncExitStack() as stack:
+      if self.http_pool is not None:
+        client = self.http_pool.get(LLM)
+      else:
+        client = await stack.enter_async_context(httpx.AsyncClient(timeout=12.0))
+      try:
+        response = await stack.enter_async_context(client.stream("POST", self.endpoint, json=payload, headers=headers))
+        if response.status_code >= 400:
+          raise _status_error(response.status_code)
+
+        if not response.headers.get("content-type", "").startswith("text/event-stream"):
+          text = _extract_text(json.loads(await response.aread()))
+          if text is None:
+            raise TextGenerationError("invalid_response", "文案服务响应不可用", status_code=502)
+          yield text
+          return
+
+        async for line in response.aiter_lines():
+          if not line.startswith("data:"):
+            continue
+          data = line[5:].strip()
+          if data == "[DONE]":
+            return
+          try:
+            delta = _extract_delta(json.loads(data))
+          except ValueError as exc:
+            raise TextGenerationError("invalid_response", "文案服务响应不可用", status_code=502) from exc
+          if delta:
+            yield delta
+      except httpx.TimeoutException as exc:
+        raise TextGenerationError("timeout", "文案生成超时", status_code=504) from exc
+
+  def _request(self, object_name: str, category: str, context: str | None) -> tuple[dict[str, Any], dict[str, str]]:
     if not self.endpoint or not self.api_key:
       raise TextGenerationError("llm_config", "未配置文案服务", status_code=500)
 
-    payload = {
+    payload: dict[str, Any] = {
       "object_name": object_name,
       "category": category,
       "context": context,
       "tone": "stardew",
     }
     headers = {"Authorization": f"Bearer {self.api_key}"}
+    return payload, headers
+
+
+def _status_error(status: int) -> TextGenerationError:
+  if status == 401:
+    return TextGenerationError("unauthorized", "文案服务认证失败", status_code=401)
+  if status == 429:
+    return TextGenerationError("rate_limited", "文案服务繁忙，请稍后再试", status_code=429)
+  return TextGenerationError("llm_error", "文案服务返回错误", status_code=status)
+
+
+def _extract_text(data: Any) -> str | None:
+  # Support a few common schema shapes to stay flexible.
+  if not isinstance(data, dict):
+    return None
+  if "description" in data and isinstance(data["description"], str):
+    return data["description"]
+  if "text" in data and isinstance(data["text"], str):
+    return data["text"]
+  choices = data.get("choices")
+  if choices and isinstance(choices, list):
+    first = choices[0]
+    if isinstance(first, dict):
+      message = first.get("message", {}) if isinstance(first.get("message"), dict) else {}
+      content = message.get("content")
+      if isinstance(content, str):
+        return content
+  return None
 
-    async with httpx.AsyncClient(timeout=12.0) as client:
-      try:
-        response = await client.post(self.endpoint, json=payload, headers=headers)
-        response.raise_for_status()
-      except httpx.HTTPStatusError as exc:
-        status = exc.response.status_code
-        if status == 401:
-          raise TextGenerationError("unauthorized", "文案服务认证失败", status_code=401) from exc
-        if status == 429:
-          raise TextGenerationError("rate_limited", "文案服务繁忙，请稍后再试", status_code=429) from exc
-        raise TextGenerationError("llm_error", "文案服务返回错误", status_code=status) from exc
-      except httpx.TimeoutException as exc:
-        raise TextGenerationError("timeout", "文案生成超时", status_code=504) from exc
 
-    data = response.json()
-    # Support a few common schema shapes to stay flexible.
-    if "description" in data and isinstance(data["description"], str):
-      return data["description"].strip()
-    if "text" in data and isinstance(data["text"], str):
-      return data["text"].strip()
-    choices = data.get("choices")
-    if choices and isinstance(choices, list):
-      first = choices[0]
-      if isinstance(first, dict):
-        message = first.get("message", {}) if isinstance(first.get("message"), dict) else {}
-        content = message.get("content")
-        if isinstance(content, str):
-          return content.strip()
-
-    raise TextGenerationError("invalid_response", "文案服务响应不可用", status_code=502)
+def _extract_delta(data: Any) -> str | None:
+  if not isinstance(data, dict):
+    return None
+  choices = data.get("choices")
+  if choices and isinstance(choices, list) and isinstance(choices[0], dict):
+    first = choices[0]
+    delta = first.get("delta") if isinstance(first.get("delta"), dict) else {}
+    content = delta.get("content", first.get("text"))
+    return content if isinstance(content, str) else None
+  for field in ("delta", "text", "description"):
+    if isinstance(data.get(field), str):
+      return data[field]
+  return None
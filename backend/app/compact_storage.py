@@ -0,0 +1,20 @@
+"""Offline compaction of the local artwork record log.
+
+Usage (from `backend/`, with the server stopped): python -m app.compact_storage [storage_dir]
+"""
+import sys
+from pathlib import Path
+
+from .clients.storage_client import LocalStorageClient
+from .config import get_settings
+
+
+def main(argv: list[str]) -> int:
+  base_dir = Path(argv[0]) if argv else get_settings().local_storage_dir
+  kept = LocalStorageClient(base_dir).compact()
+  print(f"compacted {base_dir / 'records.jsonl'}: {kept} records")
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main(sys.argv[1:]))
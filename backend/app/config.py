@@ -1,35 +1,108 @@
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from .models.artwork import EncodingProfileName
+
 
 class Settings(BaseSettings):
   """Application settings loaded from environment."""
 
   azure_cv_endpoint: Optional[str] = None
   azure_cv_key: Optional[str] = None
+  azure_cv_timeout: float = 10.0
 
   aliyun_access_key_id: Optional[str] = None
   aliyun_access_key_secret: Optional[str] = None
   aliyun_region: str = "cn-shanghai"
   aliyun_endpoint: str = "objectdet.cn-shanghai.aliyuncs.com"
+  aliyun_max_workers: int = 4
+
+  detect_upload_max_edge: int = 1600
+  detect_upload_jpeg_quality: int = 85
+  detect_upload_reencode_min_bytes: int = 1_500_000
+
+  detect_hedge_enabled: bool = True
+  detect_hedge_percentile: float = 95.0
+  detect_hedge_min_delay: float = 0.3
+  detect_hedge_default_delay: float = 1.5
+  detect_latency_window: int = 200
+  detect_latency_min_samples: int = 20
+  detect_max_error_rate: float = 0.5
+
+  detect_cache_enabled: bool = True
+  detect_cache_max_entries: int = 512
+  detect_cache_ttl_seconds: float = 600.0
 
   image_gen_endpoint: Optional[str] = None
   image_gen_key: Optional[str] = None
   image_gen_model: str = "gemini-3-pro-image-preview"
+  image_gen_timeout: float = 15.0
+  image_gen_latency_budget: float = 4.0
+  image_gen_cache_max_entries: int = 128
+  image_gen_cache_ttl_seconds: float = 3600.0
+  image_gen_webp_quality: int = 90
+  image_gen_webp_method: int = 4
+
+  image_job_backend: Literal["memory", "sqlite"] = "memory"
+  image_job_sqlite_path: Path = Path("backend/storage/jobs.sqlite3")
+  image_job_workers: int = 2
+  image_job_max_queued: int = 100
+  image_job_result_ttl_seconds: float = 3600.0
+  image_job_callback_timeout: float = 5.0
+  image_job_stale_seconds: float = 600.0
+  # Hosts job callbacks may be sent to; ".example.com" also allows subdomains. Empty disables callbacks.
+  image_job_callback_hosts: list[str] = []
+
+  pixel_art_palette: bool = True
+  pixel_art_dither: bool = False
+  pixel_art_outline: bool = False
+
+  artwork_encoding_profile: EncodingProfileName = "png"
 
   text_gen_endpoint: Optional[str] = None
   text_gen_key: Optional[str] = None
+  text_gen_timeout: float = 12.0
+  text_cache_enabled: bool = True
+  text_cache_max_entries: int = 2048
+  text_cache_ttl_seconds: float = 3600.0
+  text_cache_variants: int = 3
+
+  upstream_http2: bool = True
+  upstream_max_connections: int = 20
+  upstream_max_keepalive_connections: int = 10
+  upstream_keepalive_expiry: float = 30.0
+  upstream_connect_timeout: float = 5.0
+  upstream_max_attempts: int = 3
+  upstream_retry_base_delay: float = 0.2
+  upstream_retry_max_delay: float = 2.0
+  upstream_breaker_failure_threshold: int = 5
+  upstream_breaker_reset_seconds: float = 10.0
+  upstream_concurrency_initial: int = 8
+  upstream_concurrency_min: int = 1
+  upstream_concurrency_queue_timeout: float = 2.0
 
   supabase_url: Optional[str] = None
   supabase_key: Optional[str] = None
   supabase_bucket: str = "artworks"
   supabase_table: str = "artworks"
+  supabase_max_workers: int = 4
 
   local_storage_dir: Path = Path("backend/storage")
 
+  image_worker_processes: int = 2
+  image_worker_max_queue: int = 32
+
+  batch_concurrency: int = 8
+
+  metrics_enabled: bool = True
+  server_timing_enabled: bool = False
+
+  upload_max_bytes: int = 20 * 1024 * 1024
+  upload_spool_bytes: int = 1024 * 1024
+
   model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
 
   @property
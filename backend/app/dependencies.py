@@ -1,9 +1,13 @@
 from functools import lru_cache
 
+from .clients.http_pool import UpstreamHttpPool
+from .clients.job_store import JobStore, MemoryJobStore, SQLiteJobStore
 from .config import Settings, get_settings
 from .services.artwork_service import ArtworkService
 from .services.detection_service import DetectionService
+from .services.executors import ImageWorkerPool
 from .services.image_gen_service import ImageGenerationService
+from .services.job_queue import JobQueue
 from .services.text_service import TextService
 
 
@@ -11,21 +15,53 @@ def get_settings_dep() -> Settings:
   return get_settings()
 
 
+@lru_cache(maxsize=1)
+def get_http_pool() -> UpstreamHttpPool:
+  return UpstreamHttpPool(get_settings())
+
+
+@lru_cache(maxsize=1)
+def get_image_worker_pool() -> ImageWorkerPool:
+  settings = get_settings()
+  return ImageWorkerPool("image-worker", settings.image_worker_processes, settings.image_worker_max_queue)
+
+
 @lru_cache(maxsize=1)
 def get_detection_service() -> DetectionService:
-  return DetectionService(get_settings())
+  return DetectionService(get_settings(), get_http_pool(), get_image_worker_pool())
 
 
 @lru_cache(maxsize=1)
 def get_text_service() -> TextService:
-  return TextService(get_settings())
+  return TextService(get_settings(), get_http_pool())
 
 
 @lru_cache(maxsize=1)
 def get_artwork_service() -> ArtworkService:
-  return ArtworkService(get_settings())
+  return ArtworkService(get_settings(), get_image_worker_pool())
 
 
 @lru_cache(maxsize=1)
 def get_image_gen_service() -> ImageGenerationService:
-  return ImageGenerationService(get_settings())
+  return ImageGenerationService(get_settings(), get_http_pool(), get_image_worker_pool())
+
+
+@lru_cache(maxsize=1)
+def get_job_queue() -> JobQueue:
+  settings = get_settings()
+  store: JobStore
+  if settings.image_job_backend == "sqlite":
+    store = SQLiteJobStore(settings.image_job_sqlite_path)
+  else:
+    store = MemoryJobStore()
+  return JobQueue(
+    store,
+    get_image_gen_service(),
+    get_http_pool(),
+    workers=settings.image_job_workers,
+    max_queued=settings.image_job_max_queued,
+    result_ttl=settings.image_job_result_ttl_seconds,
+    callback_timeout=settings.image_job_callback_timeout,
+    stale_after=settings.image_job_stale_seconds,
+    callback_hosts=settings.image_job_callback_hosts,
+  )
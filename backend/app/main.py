@@ -1,18 +1,65 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 
 from .config import get_settings
-from .routers import artworks, detect, health, text_gen, image_gen
+from .dependencies import (
+  get_artwork_service,
+  get_detection_service,
+  get_http_pool,
+  get_image_gen_service,
+  get_image_worker_pool,
+  get_job_queue,
+)
+from .routers import artworks, detect, health, metrics, text_gen, image_gen
+from .services.errors import WorkerPoolBusyError
+from .services.metrics import MetricsMiddleware
+from .services.timing import ServerTimingMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+  http_pool = get_http_pool()
+  http_pool.start()
+  image_workers = get_image_worker_pool()
+  image_workers.start()
+  job_queue = get_job_queue()
+  job_queue.start()
+  try:
+    yield
+  finally:
+    await job_queue.stop()
+    await get_image_gen_service().aclose()
+    await http_pool.aclose()
+    image_workers.shutdown()
+    get_detection_service().close()
+    get_artwork_service().close()
 
 
 def create_app() -> FastAPI:
   settings = get_settings()
-  app = FastAPI(title="Memory Bank Backend", version="0.1.0")
+  app = FastAPI(title="Memory Bank Backend", version="0.1.0", lifespan=lifespan)
+
+  @app.exception_handler(WorkerPoolBusyError)
+  async def image_workers_busy(request: Request, exc: WorkerPoolBusyError) -> JSONResponse:
+    return JSONResponse(
+      status_code=exc.status_code,
+      content={"detail": {"code": exc.code, "message": exc.message}},
+      headers={"Retry-After": "1"},
+    )
 
   app.include_router(health.router)
   app.include_router(detect.router)
   app.include_router(text_gen.router)
   app.include_router(image_gen.router)
   app.include_router(artworks.router)
+  if settings.metrics_enabled:
+    app.include_router(metrics.router)
+    app.add_middleware(MetricsMiddleware)
+  if settings.server_timing_enabled:
+    app.add_middleware(ServerTimingMiddleware)
 
   @app.get("/config/storage")
   async def storage_mode() -> dict[str, str]:
@@ -1,19 +1,31 @@
 from datetime import datetime
+from typing import Literal
 
 from pydantic import BaseModel, ConfigDict, Field
 
 from .common import ArtworkRecord, LabelPayload, NormalizedBounds
 
+# Keys of `image_service.ENCODING_PROFILES`.
+EncodingProfileName = Literal["png", "png-fast", "png-optimized", "webp-lossless", "webp", "avif"]
+
+
+class SaveArtworkMetadata(BaseModel):
+  """Everything needed to save an artwork except the image itself (used by binary uploads)."""
 
-class SaveArtworkRequest(BaseModel):
   model_config = ConfigDict(extra="forbid")
 
   user_id: str
-  base_image: str = Field(description="Base64 encoded pixel-style image (data URL allowed)")
   label: LabelPayload
   box_bounds: NormalizedBounds | None = Field(
     default=None, description="Normalized bounds of the selected object to mirror preview layout"
   )
+  encoding_profile: EncodingProfileName | None = Field(
+    default=None, description="Output encoding of the stored artwork; defaults to ARTWORK_ENCODING_PROFILE"
+  )
+
+
+class SaveArtworkRequest(SaveArtworkMetadata):
+  base_image: str = Field(description="Base64 encoded pixel-style image (data URL allowed)")
 
 
 class SaveArtworkResponse(BaseModel):
@@ -29,3 +41,4 @@ class ArtworksResponse(BaseModel):
   model_config = ConfigDict(extra="forbid")
 
   items: list[ArtworkRecord]
+  next_cursor: str | None = Field(default=None, description="Opaque cursor for the next page; null on the last page")
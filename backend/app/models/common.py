@@ -65,3 +65,14 @@ class ArtworkRecord(BaseModel):
   user_id: str
   url: str
   created_at: datetime
+
+
+BATCH_MAX_ITEMS = 100
+
+
+class BatchItemError(BaseModel):
+  model_config = ConfigDict(extra="forbid")
+
+  code: str
+  message: str
+  status_code: int
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, ConfigDict, Field
 
-from .common import DetectionBox, ImageSize
+from .common import BATCH_MAX_ITEMS, BatchItemError, DetectionBox, ImageSize
 
 
 class DetectRequest(BaseModel):
@@ -8,6 +8,7 @@ class DetectRequest(BaseModel):
 
   image_base64: str
   max_results: int = Field(default=5, ge=1, le=20)
+  use_cache: bool = Field(default=True, description="Set false to bypass the detection result cache")
 
 
 class DetectResponse(BaseModel):
@@ -15,3 +16,23 @@ class DetectResponse(BaseModel):
 
   boxes: list[DetectionBox]
   image_size: ImageSize
+
+
+class DetectBatchRequest(BaseModel):
+  model_config = ConfigDict(extra="forbid")
+
+  items: list[DetectRequest] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+
+
+class DetectBatchResult(BaseModel):
+  model_config = ConfigDict(extra="forbid")
+
+  index: int = Field(description="Position of the item in the request")
+  result: DetectResponse | None = None
+  error: BatchItemError | None = None
+
+
+class DetectBatchResponse(BaseModel):
+  model_config = ConfigDict(extra="forbid")
+
+  results: list[DetectBatchResult]
@@ -1,4 +1,7 @@
-from pydantic import BaseModel, ConfigDict, Field
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel, ConfigDict, Field, HttpUrl
 
 
 class ImageGenRequest(BaseModel):
@@ -13,3 +16,30 @@ class ImageGenResponse(BaseModel):
   model_config = ConfigDict(extra="forbid")
 
   image_base64: str
+
+
+class ImageJobRequest(ImageGenRequest):
+  priority: int = Field(default=0, ge=0, le=9, description="Higher priorities run first; FIFO within a priority")
+  callback_url: HttpUrl | None = Field(
+    default=None, description="POSTed the job (same body as the status endpoint) once it finishes"
+  )
+
+
+class ImageJobError(BaseModel):
+  model_config = ConfigDict(extra="forbid")
+
+  code: str
+  message: str
+
+
+class ImageJobResponse(BaseModel):
+  model_config = ConfigDict(extra="forbid")
+
+  id: str
+  status: Literal["queued", "running", "succeeded", "failed"]
+  priority: int
+  created_at: datetime
+  updated_at: datetime
+  expires_at: datetime | None = Field(default=None, description="When a finished job's result is dropped")
+  image_base64: str | None = Field(default=None, description="Data URL of the result once succeeded")
+  error: ImageJobError | None = None
@@ -1,5 +1,7 @@
 from pydantic import BaseModel, ConfigDict, Field
 
+from .common import BATCH_MAX_ITEMS, BatchItemError
+
 
 class TextRequest(BaseModel):
   model_config = ConfigDict(extra="forbid")
@@ -14,3 +16,23 @@ class TextResponse(BaseModel):
   model_config = ConfigDict(extra="forbid")
 
   description: str
+
+
+class TextBatchRequest(BaseModel):
+  model_config = ConfigDict(extra="forbid")
+
+  items: list[TextRequest] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+
+
+class TextBatchResult(BaseModel):
+  model_config = ConfigDict(extra="forbid")
+
+  index: int = Field(description="Position of the item in the request")
+  result: TextResponse | None = None
+  error: BatchItemError | None = None
+
+
+class TextBatchResponse(BaseModel):
+  model_config = ConfigDict(extra="forbid")
+
+  results: list[TextBatchResult]
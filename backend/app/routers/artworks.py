@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 
-from ..dependencies import get_artwork_service
-from ..models.artwork import ArtworksResponse, SaveArtworkRequest, SaveArtworkResponse
+from ..config import Settings
+from ..dependencies import get_artwork_service, get_settings_dep
+from ..models.artwork import ArtworksResponse, SaveArtworkMetadata, SaveArtworkRequest, SaveArtworkResponse
 from ..services.artwork_service import ArtworkService
-from ..services.errors import ImageGenerationError, StorageError
+from ..services.errors import ImageGenerationError, StorageError, UploadError
+from ..services.uploads import IMAGE_UPLOAD_OPENAPI, read_image_upload
 
 router = APIRouter()
 
@@ -20,8 +24,60 @@ async def save_artwork(
     raise HTTPException(status_code=502, detail={"code": exc.code, "message": exc.message}) from exc
 
 
+SAVE_ARTWORK_UPLOAD_OPENAPI = {
+  "requestBody": {
+    "required": True,
+    "content": {
+      "multipart/form-data": {
+        "schema": {
+          "type": "object",
+          "properties": {
+            "image": {"type": "string", "format": "binary"},
+            "metadata": {"type": "string", "description": "SaveArtworkMetadata as JSON"},
+          },
+          "required": ["image", "metadata"],
+        }
+      },
+      **IMAGE_UPLOAD_OPENAPI["requestBody"]["content"],
+    },
+  }
+}
+
+
+@router.post("/save-artwork/upload", response_model=SaveArtworkResponse, openapi_extra=SAVE_ARTWORK_UPLOAD_OPENAPI)
+async def save_artwork_upload(
+  request: Request,
+  metadata: str | None = Query(None, description="SaveArtworkMetadata as JSON, for raw image/* bodies"),
+  service: ArtworkService = Depends(get_artwork_service),
+  settings: Settings = Depends(get_settings_dep),
+) -> SaveArtworkResponse:
+  """Binary variant of /save-artwork: multipart `image` + `metadata` parts, or raw body + `metadata` query."""
+  try:
+    upload = await read_image_upload(request, settings.upload_max_bytes, settings.upload_spool_bytes)
+    raw_metadata = upload.fields.get("metadata", metadata)
+    if raw_metadata is None:
+      raise UploadError("missing_metadata", "缺少 metadata 字段", status_code=400)
+    try:
+      payload = SaveArtworkMetadata.model_validate_json(raw_metadata)
+    except ValidationError as exc:
+      raise RequestValidationError(exc.errors(include_url=False)) from exc
+    return await service.save_artwork_bytes(upload.data, payload)
+  except UploadError as exc:
+    raise HTTPException(status_code=exc.status_code, detail={"code": exc.code, "message": exc.message}) from exc
+  except ImageGenerationError as exc:
+    raise HTTPException(status_code=400, detail={"code": exc.code, "message": exc.message}) from exc
+  except StorageError as exc:
+    raise HTTPException(status_code=502, detail={"code": exc.code, "message": exc.message}) from exc
+
+
 @router.get("/artworks", response_model=ArtworksResponse)
 async def list_artworks(
-  limit: int = Query(20, ge=1, le=50), service: ArtworkService = Depends(get_artwork_service)
+  limit: int = Query(20, ge=1, le=50),
+  cursor: str | None = Query(None, description="Opaque next_cursor from the previous page"),
+  user_id: str | None = Query(None, description="Only list artworks saved by this user"),
+  service: ArtworkService = Depends(get_artwork_service),
 ) -> ArtworksResponse:
-  return await service.list_artworks(limit)
+  try:
+    return await service.list_artworks(limit, cursor, user_id)
+  except StorageError as exc:
+    raise HTTPException(status_code=exc.status_code or 502, detail={"code": exc.code, "message": exc.message}) from exc
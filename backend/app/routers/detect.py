@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 
-from ..dependencies import get_detection_service
-from ..models.detection import DetectRequest, DetectResponse
+from ..config import Settings
+from ..dependencies import get_detection_service, get_settings_dep
+from ..models.detection import DetectBatchRequest, DetectBatchResponse, DetectBatchResult, DetectRequest, DetectResponse
+from ..services.batch import NDJSON_MEDIA_TYPE, ndjson_lines, run_batch, wants_ndjson
 from ..services.detection_service import DetectionService
-from ..services.errors import DetectionError, ImageGenerationError
+from ..services.errors import DetectionError, ImageGenerationError, UploadError
+from ..services.uploads import IMAGE_UPLOAD_OPENAPI, read_image_upload
 from ..services.utils import decode_base64_image
 
 router = APIRouter()
@@ -15,8 +19,55 @@ async def detect_objects(
 ) -> DetectResponse:
   try:
     image_bytes = decode_base64_image(payload.image_base64)
-    return await service.detect(image_bytes, payload.max_results)
+    return await service.detect(image_bytes, payload.max_results, use_cache=payload.use_cache)
   except ImageGenerationError as exc:
     raise HTTPException(status_code=400, detail={"code": exc.code, "message": exc.message}) from exc
   except DetectionError as exc:
     raise HTTPException(status_code=exc.status_code or 502, detail={"code": exc.code, "message": exc.message}) from exc
+
+
+@router.post("/detect/upload", response_model=DetectResponse, openapi_extra=IMAGE_UPLOAD_OPENAPI)
+async def detect_objects_upload(
+  request: Request,
+  max_results: int = Query(5, ge=1, le=20),
+  use_cache: bool = Query(True),
+  service: DetectionService = Depends(get_detection_service),
+  settings: Settings = Depends(get_settings_dep),
+) -> DetectResponse:
+  """Binary variant of /detect: raw `image/*` body or multipart `image` part."""
+  try:
+    upload = await read_image_upload(request, settings.upload_max_bytes, settings.upload_spool_bytes)
+    return await service.detect(upload.data, max_results, use_cache=use_cache)
+  except UploadError as exc:
+    raise HTTPException(status_code=exc.status_code, detail={"code": exc.code, "message": exc.message}) from exc
+  except DetectionError as exc:
+    raise HTTPException(status_code=exc.status_code or 502, detail={"code": exc.code, "message": exc.message}) from exc
+
+
+@router.post(
+  "/detect/batch",
+  response_model=DetectBatchResponse,
+  responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+)
+async def detect_objects_batch(
+  payload: DetectBatchRequest,
+  accept: str | None = Header(None),
+  service: DetectionService = Depends(get_detection_service),
+  settings: Settings = Depends(get_settings_dep),
+) -> DetectBatchResponse | StreamingResponse:
+  """Detect objects in many images; `Accept: application/x-ndjson` streams one result per line as each finishes."""
+
+  async def detect_one(item: DetectRequest) -> DetectResponse:
+    try:
+      image_bytes = decode_base64_image(item.image_base64)
+    except ImageGenerationError as exc:
+      raise DetectionError(exc.code, exc.message, status_code=400) from exc
+    return await service.detect(image_bytes, item.max_results, use_cache=item.use_cache)
+
+  results = (
+    DetectBatchResult(index=index, result=result, error=error)
+    async for index, result, error in run_batch(payload.items, detect_one, settings.batch_concurrency)
+  )
+  if wants_ndjson(accept):
+    return StreamingResponse(ndjson_lines(results), media_type=NDJSON_MEDIA_TYPE)
+  return DetectBatchResponse(results=sorted([result async for result in results], key=lambda result: result.index))
@@ -1,4 +1,9 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+
+from ..clients.http_pool import UpstreamHttpPool
+from ..dependencies import get_detection_service, get_http_pool, get_text_service
+from ..services.detection_service import DetectionService
+from ..services.text_service import TextService
 
 router = APIRouter()
 
@@ -6,3 +11,27 @@ router = APIRouter()
 @router.get("/health")
 async def health_check() -> dict[str, str]:
   return {"status": "ok"}
+
+
+@router.get("/health/caches")
+async def cache_stats(
+  detection: DetectionService = Depends(get_detection_service),
+  text: TextService = Depends(get_text_service),
+) -> dict[str, dict[str, float]]:
+  """Size and hit ratio of the in-memory result caches."""
+  return {
+    "detect": detection.cache.stats() if detection.cache is not None else {"size": 0},
+    "text": text.cache_stats(),
+  }
+
+
+@router.get("/health/providers")
+async def provider_stats(detection: DetectionService = Depends(get_detection_service)) -> dict[str, object]:
+  """Rolling latency, error rate and hedge counts for the detection providers."""
+  return detection.router.stats()
+
+
+@router.get("/health/upstreams")
+async def upstream_stats(http_pool: UpstreamHttpPool = Depends(get_http_pool)) -> dict[str, dict[str, float | str]]:
+  """Circuit breaker state, adaptive concurrency limit and retry counters per upstream."""
+  return http_pool.stats()
@@ -1,18 +1,92 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 
-from ..dependencies import get_image_gen_service
-from ..models.image_gen import ImageGenRequest, ImageGenResponse
-from ..services.errors import ImageGenerationError
+from ..config import Settings
+from ..dependencies import get_image_gen_service, get_job_queue, get_settings_dep
+from ..models.image_gen import ImageGenRequest, ImageGenResponse, ImageJobRequest, ImageJobResponse
+from ..services.errors import ImageGenerationError, JobQueueFullError, UploadError
 from ..services.image_gen_service import ImageGenerationService
+from ..services.job_queue import JobQueue, job_response
+from ..services.uploads import IMAGE_UPLOAD_OPENAPI, read_image_upload
+from ..services.utils import decode_base64_image, negotiate_image_type
 
 router = APIRouter()
 
+# `Accept: image/png`, `image/webp` or `image/webp;lossless=1` returns raw bytes instead of JSON.
+BINARY_RESPONSES = {200: {"content": {"image/png": {}, "image/webp": {}}}}
 
-@router.post("/generate-image", response_model=ImageGenResponse)
+
+async def _generate_response(
+  service: ImageGenerationService, image_bytes: bytes, prompt: str | None, block_size: int, accept: str | None
+) -> ImageGenResponse | Response:
+  mime_type, lossless = negotiate_image_type(accept)
+  if mime_type is None:
+    return await service.generate_from_bytes(image_bytes, prompt, block_size)
+  generated = await service.generate_image(image_bytes, prompt, block_size, mime_type=mime_type, lossless=lossless)
+  return Response(content=generated.data, media_type=generated.mime_type, headers={"Vary": "Accept"})
+
+
+@router.post("/generate-image", response_model=ImageGenResponse, responses=BINARY_RESPONSES)
 async def generate_image(
-  payload: ImageGenRequest, service: ImageGenerationService = Depends(get_image_gen_service)
-) -> ImageGenResponse:
+  payload: ImageGenRequest,
+  accept: str | None = Header(None),
+  service: ImageGenerationService = Depends(get_image_gen_service),
+) -> ImageGenResponse | Response:
+  try:
+    image_bytes = decode_base64_image(payload.image_base64)
+    return await _generate_response(service, image_bytes, payload.prompt, payload.block_size, accept)
+  except ImageGenerationError as exc:
+    raise HTTPException(status_code=exc.status_code or 502, detail={"code": exc.code, "message": exc.message}) from exc
+
+
+@router.post(
+  "/generate-image/upload",
+  response_model=ImageGenResponse,
+  responses=BINARY_RESPONSES,
+  openapi_extra=IMAGE_UPLOAD_OPENAPI,
+)
+async def generate_image_upload(
+  request: Request,
+  prompt: str | None = Query(None, description="Optional style prompt"),
+  block_size: int = Query(10, ge=2, le=64, description="Fallback pixel block size"),
+  accept: str | None = Header(None),
+  service: ImageGenerationService = Depends(get_image_gen_service),
+  settings: Settings = Depends(get_settings_dep),
+) -> ImageGenResponse | Response:
+  """Binary variant of /generate-image: raw `image/*` body or multipart `image` part."""
   try:
-    return await service.generate(payload)
+    upload = await read_image_upload(request, settings.upload_max_bytes, settings.upload_spool_bytes)
+    return await _generate_response(service, upload.data, upload.fields.get("prompt", prompt), block_size, accept)
+  except UploadError as exc:
+    raise HTTPException(status_code=exc.status_code, detail={"code": exc.code, "message": exc.message}) from exc
   except ImageGenerationError as exc:
     raise HTTPException(status_code=exc.status_code or 502, detail={"code": exc.code, "message": exc.message}) from exc
+
+
+@router.post("/generate-image/jobs", response_model=ImageJobResponse, status_code=202)
+async def submit_image_job(
+  payload: ImageJobRequest,
+  request: Request,
+  response: Response,
+  queue: JobQueue = Depends(get_job_queue),
+) -> ImageJobResponse:
+  """Queue a generation and return at once; poll the `Location` (or wait for `callback_url`)."""
+  try:
+    image_bytes = decode_base64_image(payload.image_base64)
+    callback_url = str(payload.callback_url) if payload.callback_url else None
+    job = await queue.submit(image_bytes, payload.prompt, payload.block_size, payload.priority, callback_url)
+  except ImageGenerationError as exc:
+    raise HTTPException(status_code=exc.status_code or 400, detail={"code": exc.code, "message": exc.message}) from exc
+  except JobQueueFullError as exc:
+    raise HTTPException(
+      status_code=exc.status_code, detail={"code": exc.code, "message": exc.message}, headers={"Retry-After": "5"}
+    ) from exc
+  response.headers["Location"] = str(request.url_for("get_image_job", job_id=job.id))
+  return job_response(job)
+
+
+@router.get("/generate-image/jobs/{job_id}", response_model=ImageJobResponse)
+async def get_image_job(job_id: str, queue: JobQueue = Depends(get_job_queue)) -> ImageJobResponse:
+  job = await queue.get(job_id)
+  if job is None:
+    raise HTTPException(status_code=404, detail={"code": "job_not_found", "message": "任务不存在或已过期"})
+  return job_response(job)
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, Response
+
+from ..clients.http_pool import UpstreamHttpPool
+from ..dependencies import (
+  get_artwork_service,
+  get_detection_service,
+  get_http_pool,
+  get_image_gen_service,
+  get_image_worker_pool,
+  get_job_queue,
+  get_text_service,
+)
+from ..services.artwork_service import ArtworkService
+from ..services.detection_service import DetectionService
+from ..services.executors import ImageWorkerPool
+from ..services.image_gen_service import ImageGenerationService
+from ..services.job_queue import JobQueue
+from ..services.metrics import METRICS_MEDIA_TYPE, StatsCollector, render
+from ..services.text_service import TextService
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(
+  http_pool: UpstreamHttpPool = Depends(get_http_pool),
+  image_workers: ImageWorkerPool = Depends(get_image_worker_pool),
+  detection: DetectionService = Depends(get_detection_service),
+  text: TextService = Depends(get_text_service),
+  image_gen: ImageGenerationService = Depends(get_image_gen_service),
+  artworks: ArtworkService = Depends(get_artwork_service),
+  job_queue: JobQueue = Depends(get_job_queue),
+) -> Response:
+  """Prometheus text exposition: request/upstream histograms plus the services' own counters as gauges."""
+  pools = [detection.aliyun_executor, getattr(artworks.storage_client, "executor", None)]
+  collector = StatsCollector()
+  collector.add("upstream", http_pool.stats, label="upstream")
+  collector.add("image_workers", image_workers.stats)
+  collector.add("blocking_pool", lambda: {pool.name: pool.stats() for pool in pools if pool is not None}, label="pool")
+  collector.add(
+    "cache",
+    lambda: {
+      "detect": detection.cache.stats() if detection.cache is not None else {"size": 0},
+      "text": text.cache_stats(),
+      "image_gen": image_gen.remote_cache.stats(),
+    },
+    label="cache",
+  )
+  collector.add("detect_router", detection.router.stats)
+  collector.add("detect_provider", lambda: detection.router.stats()["providers"], label="provider")
+  collector.add("image_gen", lambda: {"late_results": image_gen.late_results})
+  collector.add("job_queue", job_queue.stats)
+  return Response(content=render(collector), media_type=METRICS_MEDIA_TYPE)
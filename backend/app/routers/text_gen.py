@@ -1,16 +1,70 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from typing import AsyncIterator
 
-from ..dependencies import get_text_service
-from ..models.text import TextRequest, TextResponse
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
+
+from ..config import Settings
+from ..dependencies import get_settings_dep, get_text_service
+from ..models.text import TextBatchRequest, TextBatchResponse, TextBatchResult, TextRequest, TextResponse
+from ..services.batch import NDJSON_MEDIA_TYPE, ndjson_lines, run_batch, wants_ndjson
 from ..services.errors import TextGenerationError
 from ..services.text_service import TextService
 
 router = APIRouter()
 
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+def _sse(data: dict[str, str], event: str | None = None) -> bytes:
+  prefix = f"event: {event}\n" if event else ""
+  return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
 
-@router.post("/generate-text", response_model=TextResponse)
-async def generate_text(payload: TextRequest, service: TextService = Depends(get_text_service)) -> TextResponse:
+async def _stream_events(service: TextService, payload: TextRequest) -> AsyncIterator[bytes]:
+  # `delta` events carry text as it arrives; the final `done` event repeats the full description.
+  description = ""
+  async for piece in service.stream_description(payload):
+    description += piece
+    yield _sse({"delta": piece})
+  yield _sse({"description": description}, event="done")
+
+
+@router.post("/generate-text", response_model=TextResponse, responses={200: {"content": {SSE_MEDIA_TYPE: {}}}})
+async def generate_text(
+  payload: TextRequest,
+  accept: str | None = Header(None),
+  service: TextService = Depends(get_text_service),
+) -> TextResponse | StreamingResponse:
+  """`Accept: text/event-stream` streams the description as Server-Sent Events."""
+  if accept and SSE_MEDIA_TYPE in accept.lower():
+    return StreamingResponse(
+      _stream_events(service, payload),
+      media_type=SSE_MEDIA_TYPE,
+      headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
   try:
     return await service.generate_description(payload)
   except TextGenerationError as exc:
     raise HTTPException(status_code=exc.status_code or 502, detail={"code": exc.code, "message": exc.message}) from exc
+
+
+@router.post(
+  "/generate-text/batch",
+  response_model=TextBatchResponse,
+  responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+)
+async def generate_text_batch(
+  payload: TextBatchRequest,
+  accept: str | None = Header(None),
+  service: TextService = Depends(get_text_service),
+  settings: Settings = Depends(get_settings_dep),
+) -> TextBatchResponse | StreamingResponse:
+  """Generate many descriptions; `Accept: application/x-ndjson` streams one result per line as each finishes."""
+  results = (
+    TextBatchResult(index=index, result=result, error=error)
+    async for index, result, error in run_batch(payload.items, service.generate_description, settings.batch_concurrency)
+  )
+  if wants_ndjson(accept):
+    return StreamingResponse(ndjson_lines(results), media_type=NDJSON_MEDIA_TYPE)
+  return TextBatchResponse(results=sorted([result async for result in results], key=lambda result: result.index))
@@ -3,40 +3,83 @@ from __future__ import annotations
 import hashlib
 from datetime import datetime, timezone
 
-from ..clients.storage_client import LocalStorageClient, SupabaseStorageClient
+from ..clients.storage_client import LocalStorageClient, SupabaseStorageClient, record_key
 from ..config import Settings
-from ..models.artwork import ArtworksResponse, SaveArtworkRequest, SaveArtworkResponse
+from ..models.artwork import ArtworksResponse, SaveArtworkMetadata, SaveArtworkRequest, SaveArtworkResponse
 from ..models.common import ArtworkRecord
-from .image_service import ImageService
-from .utils import decode_base64_image
+from . import image_tasks
+from .executors import ImageWorkerPool
+from .image_service import get_encoding_profile
+from .metrics import observe_image_bytes
+from .timing import record, stage
+from .utils import decode_base64_image, decode_cursor, encode_cursor
 
 
 class ArtworkService:
   """Handles artwork composition and persistence."""
 
-  def __init__(self, settings: Settings):
+  def __init__(self, settings: Settings, image_workers: ImageWorkerPool | None = None):
     self.settings = settings
-    self.image_service = ImageService()
+    self.image_workers = image_workers or ImageWorkerPool("image-worker", 0, settings.image_worker_max_queue)
     self.storage_client = (
       LocalStorageClient(settings.local_storage_dir)
       if settings.use_local_storage
-      else SupabaseStorageClient(settings.supabase_url or "", settings.supabase_key or "", settings.supabase_bucket, settings.supabase_table)
+      else SupabaseStorageClient(
+        settings.supabase_url or "",
+        settings.supabase_key or "",
+        settings.supabase_bucket,
+        settings.supabase_table,
+        max_workers=settings.supabase_max_workers,
+      )
     )
 
   async def save_artwork(self, payload: SaveArtworkRequest) -> SaveArtworkResponse:
     base_image_bytes = decode_base64_image(payload.base_image)
-    composed = self.image_service.compose(base_image_bytes, payload.label, payload.box_bounds)
+    return await self.save_artwork_bytes(base_image_bytes, payload)
 
-    checksum = hashlib.sha256(composed).hexdigest()
-    filename = f"artwork-{checksum}.png"
-    url = await self.storage_client.upload_image(filename, composed)
+  async def save_artwork_bytes(self, base_image_bytes: bytes, payload: SaveArtworkMetadata) -> SaveArtworkResponse:
+    profile = get_encoding_profile(payload.encoding_profile or self.settings.artwork_encoding_profile)
+    observe_image_bytes("artwork_input", len(base_image_bytes))
+    # `image_worker` is the whole round trip; `compose` and `encode` are the worker's share of it.
+    with stage("image_worker"):
+      composed, worker_stages = await self.image_workers.run(
+        image_tasks.compose_artwork,
+        base_image_bytes,
+        payload.label.model_dump(),
+        payload.box_bounds.model_dump() if payload.box_bounds is not None else None,
+        profile.name,
+      )
+    record(worker_stages)
+
+    observe_image_bytes("artwork_output", len(composed))
+    with stage("sha256"):
+      checksum = hashlib.sha256(composed).hexdigest()
+    filename = f"artwork-{checksum}.{profile.extension}"
+    # Files are content-addressed, so an existing blob is byte-identical; skip the upload.
+    with stage("find_image"):
+      url = await self.storage_client.find_image(filename)
+    if url is None:
+      with stage("upload_image"):
+        url = await self.storage_client.upload_image(filename, composed, profile.mime_type)
 
     record_id = checksum[:16]
-    record = ArtworkRecord(id=record_id, user_id=payload.user_id, url=url, created_at=datetime.now(timezone.utc))
-    await self.storage_client.save_record(record)
+    artwork = ArtworkRecord(id=record_id, user_id=payload.user_id, url=url, created_at=datetime.now(timezone.utc))
+    with stage("save_record"):
+      await self.storage_client.save_record(artwork)
+
+    return SaveArtworkResponse(id=record_id, url=url, created_at=artwork.created_at, checksum=checksum)
 
-    return SaveArtworkResponse(id=record_id, url=url, created_at=record.created_at, checksum=checksum)
+  def close(self) -> None:
+    self.storage_client.close()
 
-  async def list_artworks(self, limit: int = 20) -> ArtworksResponse:
-    items = await self.storage_client.list_records(limit)
-    return ArtworksResponse(items=items)
+  async def list_artworks(
+    self, limit: int = 20, cursor: str | None = None, user_id: str | None = None
+  ) -> ArtworksResponse:
+    before = decode_cursor(cursor) if cursor else None
+    # Fetch one extra row to learn whether another page exists.
+    items = await self.storage_client.list_records(limit + 1, before, user_id)
+    next_cursor = None
+    if len(items) > limit:
+      items = items[:limit]
+      next_cursor = encode_cursor(*record_key(items[-1]))
+    return ArtworksResponse(items=items, next_cursor=next_cursor)
@@ -0,0 +1,52 @@
+"""Bounded-concurrency fan-out for the batch endpoints."""
+from __future__ import annotations
+
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Sequence, TypeVar
+
+from pydantic import BaseModel
+
+from ..models.common import BatchItemError
+from .errors import ServiceError
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def wants_ndjson(accept: str | None) -> bool:
+  return bool(accept) and NDJSON_MEDIA_TYPE in accept.lower()
+
+
+async def run_batch(
+  items: Sequence[T], worker: Callable[[T], Awaitable[R]], concurrency: int
+) -> AsyncIterator[tuple[int, R | None, BatchItemError | None]]:
+  """Run `worker` over `items` with at most `concurrency` in flight; yield `(index, result, error)` as each finishes.
+
+  A failing item is reported as a `BatchItemError` and never aborts the batch.
+  Closing the iterator early (e.g. the client went away) cancels unfinished items.
+  """
+  semaphore = asyncio.Semaphore(max(1, concurrency))
+
+  async def guarded(index: int, item: T) -> tuple[int, R | None, BatchItemError | None]:
+    async with semaphore:
+      try:
+        return index, await worker(item), None
+      except ServiceError as exc:
+        return index, None, BatchItemError(code=exc.code, message=exc.message, status_code=exc.status_code)
+      except Exception:  # pragma: no cover - defensive; one bad item must not sink the batch
+        return index, None, BatchItemError(code="internal_error", message="处理失败", status_code=500)
+
+  tasks = [asyncio.ensure_future(guarded(index, item)) for index, item in enumerate(items)]
+  try:
+    for finished in asyncio.as_completed(tasks):
+      yield await finished
+  finally:
+    for task in tasks:
+      task.cancel()
+
+
+async def ndjson_lines(results: AsyncIterator[BaseModel]) -> AsyncIterator[bytes]:
+  async for result in results:
+    yield result.model_dump_json().encode("utf-8") + b"\n"
@@ -0,0 +1,69 @@
+"""In-memory LRU caches with time-to-live expiry."""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, TypeVar
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+  """Bounded LRU map whose entries expire `ttl_seconds` after insertion."""
+
+  def __init__(self, max_entries: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+    self.max_entries = max(1, max_entries)
+    self.ttl_seconds = ttl_seconds
+    self._clock = clock
+    self._entries: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  def get(self, key: Hashable, usable: Callable[[V], bool] | None = None) -> V | None:
+    """Return a live entry, counting a hit; a value failing `usable` is left in place and counts as a miss."""
+    entry = self._entries.get(key)
+    if entry is None:
+      self.misses += 1
+      return None
+    expires_at, value = entry
+    if expires_at <= self._clock():
+      del self._entries[key]
+      self.misses += 1
+      return None
+    if usable is not None and not usable(value):
+      self.misses += 1
+      return None
+    self._entries.move_to_end(key)
+    self.hits += 1
+    return value
+
+  def peek(self, key: Hashable) -> V | None:
+    """Like `get`, but without touching LRU order or hit/miss counters."""
+    entry = self._entries.get(key)
+    if entry is None or entry[0] <= self._clock():
+      return None
+    return entry[1]
+
+  def set(self, key: Hashable, value: V) -> None:
+    self._entries[key] = (self._clock() + self.ttl_seconds, value)
+    self._entries.move_to_end(key)
+    while len(self._entries) > self.max_entries:
+      self._entries.popitem(last=False)
+      self.evictions += 1
+
+  def clear(self) -> None:
+    self._entries.clear()
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  def stats(self) -> dict[str, float]:
+    lookups = self.hits + self.misses
+    return {
+      "size": len(self._entries),
+      "hits": self.hits,
+      "misses": self.misses,
+      "evictions": self.evictions,
+      "hit_ratio": self.hits / lookups if lookups else 0.0,
+    }
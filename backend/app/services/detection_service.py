@@ -1,50 +1,125 @@
 from __future__ import annotations
 
-from io import BytesIO
+import hashlib
 from typing import List
 
-from PIL import Image
-
 from ..clients.detection_client import AliyunDetectionClient, AzureDetectionClient
+from ..clients.http_pool import UpstreamHttpPool
 from ..config import Settings
 from ..models.common import DetectionBox, ImageSize, NormalizedBounds
 from ..models.detection import DetectResponse
+from . import image_tasks
+from .cache import TTLCache
 from .errors import DetectionError
+from .metrics import count_fallback, observe_image_bytes
+from .executors import BlockingCallPool, ImageWorkerPool
+from .provider_router import DetectionProvider, HedgedDetectionRouter
+from .singleflight import SingleFlight
+from .timing import stage
 from .utils import clamp
 
 
 class DetectionService:
   """Handles object detection with Azure CV or deterministic fallback."""
 
-  def __init__(self, settings: Settings):
+  def __init__(
+    self, settings: Settings, http_pool: UpstreamHttpPool | None = None, image_workers: ImageWorkerPool | None = None
+  ):
     self.settings = settings
+    self.http_pool = http_pool
+    self.image_workers = image_workers or ImageWorkerPool("image-worker", 0, settings.image_worker_max_queue)
+    self.aliyun_executor = BlockingCallPool("aliyun-detect", settings.aliyun_max_workers, upstream="aliyun")
+    self._aliyun_client: AliyunDetectionClient | None = None
+    self.cache: TTLCache[DetectResponse] | None = (
+      TTLCache(settings.detect_cache_max_entries, settings.detect_cache_ttl_seconds)
+      if settings.detect_cache_enabled
+      else None
+    )
+    self.inflight: SingleFlight[DetectResponse] = SingleFlight()
+    self.router = HedgedDetectionRouter(
+      self._configured_providers(),
+      hedge_enabled=settings.detect_hedge_enabled,
+      hedge_percentile=settings.detect_hedge_percentile,
+      min_hedge_delay=settings.detect_hedge_min_delay,
+      default_hedge_delay=settings.detect_hedge_default_delay,
+      window=settings.detect_latency_window,
+      min_samples=settings.detect_latency_min_samples,
+      max_error_rate=settings.detect_max_error_rate,
+    )
 
-  async def detect(self, image_bytes: bytes, max_results: int) -> DetectResponse:
-    try:
-      image = Image.open(BytesIO(image_bytes))
-    except Exception as exc:  # pragma: no cover - defensive
-      raise DetectionError("invalid_image", "无法读取图片", status_code=400) from exc
+  async def detect(self, image_bytes: bytes, max_results: int, use_cache: bool = True) -> DetectResponse:
+    key = (hashlib.sha256(image_bytes).hexdigest(), max_results)
+    if use_cache and self.cache is not None:
+      cached = self.cache.get(key)
+      if cached is not None:
+        return cached
 
-    width, height = image.size
+    return await self.inflight.run(key, lambda: self._detect_and_store(key, image_bytes, max_results))
 
-    if self.settings.aliyun_access_key_id and self.settings.aliyun_access_key_secret:
-      client = AliyunDetectionClient(
-        self.settings.aliyun_access_key_id,
-        self.settings.aliyun_access_key_secret,
-        self.settings.aliyun_region,
-        self.settings.aliyun_endpoint,
+  async def _detect_and_store(self, key: tuple[str, int], image_bytes: bytes, max_results: int) -> DetectResponse:
+    result = await self._detect_uncached(image_bytes, max_results)
+    if self.cache is not None:
+      self.cache.set(key, result)
+    return result
+
+  async def _detect_uncached(self, image_bytes: bytes, max_results: int) -> DetectResponse:
+    use_cloud = bool(self.router.providers)
+    observe_image_bytes("detect_input", len(image_bytes))
+    with stage("prepare_image"):
+      width, height, upload_bytes, sent_width, sent_height = await self.image_workers.run(
+        image_tasks.prepare_detection_image,
+        image_bytes,
+        use_cloud,
+        self.settings.detect_upload_max_edge,
+        self.settings.detect_upload_jpeg_quality,
+        self.settings.detect_upload_reencode_min_bytes,
       )
-      boxes = await client.detect(image_bytes, width, height, max_results)
-    elif self.settings.azure_cv_endpoint and self.settings.azure_cv_key:
-      client = AzureDetectionClient(self.settings.azure_cv_endpoint, self.settings.azure_cv_key)
-      boxes = await client.detect(image_bytes, width, height, max_results)
-      if not boxes:
-        raise DetectionError("no_objects", "未识别到物体", status_code=422)
+
+    if use_cloud:
+      observe_image_bytes("detect_upload", len(upload_bytes))
+      boxes = await self.router.detect(upload_bytes, sent_width, sent_height, max_results)
     else:
+      count_fallback("detect_default_boxes")
       boxes = self._fallback_boxes(width, height, max_results)
 
     return DetectResponse(boxes=boxes, image_size=ImageSize(width=width, height=height))
 
+  def _configured_providers(self) -> list[DetectionProvider]:
+    """Cloud providers with credentials, in preference order (Aliyun first)."""
+    providers = []
+    if self.settings.aliyun_access_key_id and self.settings.aliyun_access_key_secret:
+      providers.append(DetectionProvider("aliyun", self._detect_aliyun))
+    if self.settings.azure_cv_endpoint and self.settings.azure_cv_key:
+      providers.append(DetectionProvider("azure", self._detect_azure))
+    return providers
+
+  async def _detect_aliyun(self, image_bytes: bytes, width: int, height: int, max_results: int) -> List[DetectionBox]:
+    with stage("aliyun"):
+      return await self._get_aliyun_client().detect(image_bytes, width, height, max_results)
+
+  async def _detect_azure(self, image_bytes: bytes, width: int, height: int, max_results: int) -> List[DetectionBox]:
+    client = AzureDetectionClient(self.settings.azure_cv_endpoint or "", self.settings.azure_cv_key or "", self.http_pool)
+    with stage("azure"):
+      boxes = await client.detect(image_bytes, width, height, max_results)
+    if not boxes:
+      raise DetectionError("no_objects", "未识别到物体", status_code=422)
+    return boxes
+
+  def close(self) -> None:
+    self.aliyun_executor.shutdown()
+
+  def _get_aliyun_client(self) -> AliyunDetectionClient:
+    """Build the Aliyun SDK client once and reuse it for every request."""
+    if self._aliyun_client is None:
+      self._aliyun_client = AliyunDetectionClient(
+        self.settings.aliyun_access_key_id or "",
+        self.settings.aliyun_access_key_secret or "",
+        self.settings.aliyun_region,
+        self.settings.aliyun_endpoint,
+        executor=self.aliyun_executor,
+      )
+    return self._aliyun_client
+
   def _fallback_boxes(self, width: int, height: int, max_results: int) -> List[DetectionBox]:
     aspect = width / height if height else 1.0
     if aspect >= 1:
@@ -5,6 +5,10 @@ class ServiceError(Exception):
     self.status_code = status_code
     self.message = message
 
+  def __reduce__(self):
+    # Keeps errors raised inside image worker processes picklable.
+    return (type(self), (self.code, self.message, self.status_code))
+
 
 class DetectionError(ServiceError):
   pass
@@ -20,3 +24,15 @@ class ImageGenerationError(ServiceError):
 
 class StorageError(ServiceError):
   pass
+
+
+class UploadError(ServiceError):
+  pass
+
+
+class WorkerPoolBusyError(ServiceError):
+  pass
+
+
+class JobQueueFullError(ServiceError):
+  pass
@@ -0,0 +1,155 @@
+"""Dedicated executors for blocking work that must not share the default thread limiter."""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, TypeVar
+
+import anyio
+
+from . import image_tasks
+from .errors import WorkerPoolBusyError
+from .metrics import observe_upstream
+
+T = TypeVar("T")
+
+
+class BlockingCallPool:
+  """Bounded thread pool for sync SDK calls, with queue-depth counters.
+
+  With `upstream` set, each call's run time and outcome is recorded as an
+  upstream request for metrics.
+  """
+
+  def __init__(self, name: str, max_workers: int, upstream: str | None = None):
+    self.name = name
+    self.upstream = upstream
+    self.max_workers = max(1, max_workers)
+    self._executor: ThreadPoolExecutor | None = None
+    self._lock = threading.Lock()
+    self._queued = 0
+    self._active = 0
+    self._completed = 0
+    self._max_queued = 0
+
+  async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run `func` on the pool and await its result without blocking the event loop."""
+    with self._lock:
+      self._queued += 1
+      self._max_queued = max(self._max_queued, self._queued)
+    if self._executor is None:
+      self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+    future = self._executor.submit(partial(self._invoke, func, *args, **kwargs))
+    future.add_done_callback(self._on_done)
+    return await asyncio.wrap_future(future)
+
+  def _invoke(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    with self._lock:
+      self._queued -= 1
+      self._active += 1
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+      result = func(*args, **kwargs)
+      outcome = "ok"
+      return result
+    finally:
+      if self.upstream is not None:
+        observe_upstream(self.upstream, outcome, time.perf_counter() - started)
+      with self._lock:
+        self._active -= 1
+        self._completed += 1
+
+  def _on_done(self, future: Future[Any]) -> None:
+    # Calls cancelled before a worker picked them up never reach `_invoke`.
+    if future.cancelled():
+      with self._lock:
+        self._queued -= 1
+
+  def stats(self) -> dict[str, int]:
+    with self._lock:
+      return {
+        "max_workers": self.max_workers,
+        "queued": self._queued,
+        "active": self._active,
+        "completed": self._completed,
+        "max_queued": self._max_queued,
+      }
+
+  def shutdown(self) -> None:
+    executor, self._executor = self._executor, None
+    if executor is not None:
+      executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ImageWorkerPool:
+  """Process pool for CPU-bound Pillow/NumPy work with a bounded backlog.
+
+  Tasks must be top-level functions over picklable arguments (see `image_tasks`).
+  With `processes=0` tasks run on worker threads instead, which keeps the event
+  loop free without spawning processes (used by tests and tiny deployments).
+  """
+
+  def __init__(self, name: str, processes: int, max_queue: int):
+    self.name = name
+    self.processes = max(0, processes)
+    self.max_queue = max(0, max_queue)
+    self._executor: ProcessPoolExecutor | None = None
+    self._pending = 0
+    self._completed = 0
+    self._rejected = 0
+    self._max_pending = 0
+
+  def start(self) -> None:
+    """Spawn the workers and let each one import codecs and build its lookup tables."""
+    if self.processes == 0:
+      return
+    executor = self._ensure_executor()
+    for _ in range(self.processes):
+      executor.submit(image_tasks.warm_up)
+
+  async def run(self, func: Callable[..., T], *args: Any) -> T:
+    """Run `func(*args)` off the event loop; raise WorkerPoolBusyError when the backlog is full."""
+    if self._pending >= max(1, self.processes) + self.max_queue:
+      self._rejected += 1
+      raise WorkerPoolBusyError("image_workers_busy", "图像处理繁忙，请稍后重试", status_code=503)
+    self._pending += 1
+    self._max_pending = max(self._max_pending, self._pending)
+    try:
+      if self.processes == 0:
+        return await anyio.to_thread.run_sync(partial(func, *args))
+      try:
+        return await asyncio.wrap_future(self._ensure_executor().submit(func, *args))
+      except BrokenProcessPool as exc:
+        # A worker died (e.g. OOM on a huge image); replace the pool for later calls.
+        self._executor = None
+        raise WorkerPoolBusyError("image_workers_crashed", "图像处理进程异常退出", status_code=503) from exc
+    finally:
+      self._pending -= 1
+      self._completed += 1
+
+  def _ensure_executor(self) -> ProcessPoolExecutor:
+    if self._executor is None:
+      # "spawn" avoids forking a process that already runs the event loop and SDK threads.
+      self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"))
+    return self._executor
+
+  def stats(self) -> dict[str, int]:
+    return {
+      "processes": self.processes,
+      "max_queue": self.max_queue,
+      "pending": self._pending,
+      "completed": self._completed,
+      "rejected": self._rejected,
+      "max_pending": self._max_pending,
+    }
+
+  def shutdown(self) -> None:
+    executor, self._executor = self._executor, None
+    if executor is not None:
+      executor.shutdown(wait=False, cancel_futures=True)
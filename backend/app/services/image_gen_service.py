@@ -1,38 +1,165 @@
 from __future__ import annotations
 
+import asyncio
 import base64
-from io import BytesIO
+import hashlib
+from dataclasses import dataclass
 
 import httpx
-from PIL import Image
 
+from ..clients.http_pool import GEMINI, UpstreamHttpPool
 from ..config import Settings
 from ..models.image_gen import ImageGenRequest, ImageGenResponse
+from . import image_tasks
+from .cache import TTLCache
 from .errors import ImageGenerationError
+from .executors import ImageWorkerPool
+from .metrics import count_fallback, observe_image_bytes
+from .singleflight import SingleFlight
+from .timing import stage
 from .utils import decode_base64_image
 
 
+@dataclass(frozen=True)
+class GeneratedImage:
+  """Encoded image bytes plus their MIME type."""
+
+  data: bytes
+  mime_type: str = "image/png"
+
+  def to_data_url(self) -> str:
+    return f"data:{self.mime_type};base64," + base64.b64encode(self.data).decode("utf-8")
+
+
 class ImageGenerationService:
   """Generates pixel-style images; uses remote model if配置，否则本地像素化兜底."""
 
-  def __init__(self, settings: Settings):
+  def __init__(
+    self, settings: Settings, http_pool: UpstreamHttpPool | None = None, image_workers: ImageWorkerPool | None = None
+  ):
     self.settings = settings
+    self.http_pool = http_pool
+    self.image_workers = image_workers or ImageWorkerPool("image-worker", 0, settings.image_worker_max_queue)
+    self.inflight: SingleFlight[GeneratedImage] = SingleFlight()
+    # Remote results keyed by (image sha256, prompt), including ones that arrived after the budget ran out.
+    self.remote_cache: TTLCache[GeneratedImage] = TTLCache(
+      settings.image_gen_cache_max_entries, settings.image_gen_cache_ttl_seconds
+    )
+    self._remote_calls: dict[tuple[str, str | None], asyncio.Task[GeneratedImage]] = {}
+    # Remote calls a request gave up on (answered locally); their results count as late.
+    self._abandoned: set[tuple[str, str | None]] = set()
+    self.late_results = 0
 
   async def generate(self, payload: ImageGenRequest) -> ImageGenResponse:
     image_bytes = decode_base64_image(payload.image_base64)
-
-    if self.settings.image_gen_endpoint and self.settings.image_gen_key:
+    return await self.generate_from_bytes(image_bytes, payload.prompt, payload.block_size)
+
+  async def generate_from_bytes(self, image_bytes: bytes, prompt: str | None = None, block_size: int = 10) -> ImageGenResponse:
+    generated = await self.generate_image(image_bytes, prompt, block_size)
+    return ImageGenResponse(image_base64=generated.to_data_url())
+
+  async def generate_image(
+    self,
+    image_bytes: bytes,
+    prompt: str | None = None,
+    block_size: int = 10,
+    mime_type: str | None = None,
+    lossless: bool = False,
+    wait_for_remote: bool = False,
+  ) -> GeneratedImage:
+    """Generate and return raw encoded bytes, re-encoded to `mime_type` when given.
+
+    `wait_for_remote` ignores the latency budget and waits for the remote model
+    (local pixelation only if it fails), for callers that don't answer in-request.
+    """
+    observe_image_bytes("generate_input", len(image_bytes))
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    generated = await self.inflight.run(
+      (digest, prompt, block_size, wait_for_remote),
+      lambda: self._generate(digest, image_bytes, prompt, block_size, wait_for_remote),
+    )
+    observe_image_bytes("generate_output", len(generated.data))
+    if mime_type is None or (mime_type == generated.mime_type and not lossless):
+      return generated
+    with stage("encode"):
+      data = await self.image_workers.run(
+        image_tasks.encode_image,
+        generated.data,
+        mime_type,
+        lossless,
+        self.settings.image_gen_webp_quality,
+        self.settings.image_gen_webp_method,
+      )
+    return GeneratedImage(data=data, mime_type=mime_type)
+
+  async def _generate(
+    self, digest: str, image_bytes: bytes, prompt: str | None, block_size: int, wait_for_remote: bool = False
+  ) -> GeneratedImage:
+    if not (self.settings.image_gen_endpoint and self.settings.image_gen_key):
+      count_fallback("image_local_pixelation")
+      return GeneratedImage(data=await self._pixelate_local(image_bytes, block_size))
+
+    cached = self.remote_cache.get((digest, prompt))
+    if cached is not None:
+      return cached
+
+    remote = self._remote_call(digest, image_bytes, prompt)
+    budget = 0 if wait_for_remote else self.settings.image_gen_latency_budget
+    if budget <= 0:
       try:
-        generated = await self._call_remote_model(image_bytes, payload)
-        return ImageGenResponse(image_base64=generated)
+        # Timed here, not inside the shared task: callers that join it record their own wait.
+        with stage("remote_model"):
+          return await asyncio.shield(remote)
       except ImageGenerationError:
         # fall back to local pixelation
-        pass
-
-    fallback = self._pixelate_local(image_bytes, payload.block_size)
-    return ImageGenResponse(image_base64=fallback)
+        count_fallback("image_local_pixelation")
+        return GeneratedImage(data=await self._pixelate_local(image_bytes, block_size))
 
-  async def _call_remote_model(self, image_bytes: bytes, payload: ImageGenRequest) -> str:
+    # Pixelate speculatively so a slow model costs at most `budget` seconds.
+    local = asyncio.ensure_future(self._pixelate_local(image_bytes, block_size))
+    try:
+      with stage("remote_model"):
+        done, _ = await asyncio.wait({remote}, timeout=budget)
+      if done and remote.exception() is None:
+        local.cancel()
+        return remote.result()
+      # Remote failed or is late; a late result still lands in the cache for the next request.
+      if not done:
+        self._abandoned.add((digest, prompt))
+      count_fallback("image_local_pixelation")
+      return GeneratedImage(data=await local)
+    except BaseException:
+      local.cancel()
+      raise
+
+  def _remote_call(self, digest: str, image_bytes: bytes, prompt: str | None) -> asyncio.Task[GeneratedImage]:
+    """Start (or join) the remote call for this image; it runs to completion even if nobody waits."""
+    key = (digest, prompt)
+    task = self._remote_calls.get(key)
+    if task is None:
+      task = asyncio.ensure_future(self._fetch_remote(key, image_bytes, prompt))
+      self._remote_calls[key] = task
+      task.add_done_callback(lambda done: self._remote_calls.pop(key, None))
+      task.add_done_callback(lambda done: self._abandoned.discard(key))
+      task.add_done_callback(lambda done: done.cancelled() or done.exception())  # mark errors as retrieved
+    return task
+
+  async def _fetch_remote(self, key: tuple[str, str | None], image_bytes: bytes, prompt: str | None) -> GeneratedImage:
+    generated = await self._call_remote_model(image_bytes, prompt)
+    result = GeneratedImage(data=decode_base64_image(generated), mime_type=_data_url_mime(generated))
+    self.remote_cache.set(key, result)
+    if key in self._abandoned:
+      self.late_results += 1
+    return result
+
+  async def aclose(self) -> None:
+    """Cancel background remote calls before the HTTP pool they use is closed."""
+    tasks = list(self._remote_calls.values())
+    for task in tasks:
+      task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+  async def _call_remote_model(self, image_bytes: bytes, prompt: str | None) -> str:
     endpoint = self.settings.image_gen_endpoint
     api_key = self.settings.image_gen_key
     model = self.settings.image_gen_model or "gemini-3-pro-image-preview"
@@ -49,7 +176,7 @@ class ImageGenerationService:
                 "data": base64.b64encode(image_bytes).decode("utf-8"),
               }
             },
-            {"text": payload.prompt or "Convert this photo into a Stardew Valley pixel art style."},
+            {"text": prompt or "Convert this photo into a Stardew Valley pixel art style."},
           ]
         }
       ],
@@ -58,8 +185,11 @@ class ImageGenerationService:
 
     params = {"key": api_key}
     try:
-      async with httpx.AsyncClient(timeout=15.0) as client:
-        response = await client.post(endpoint, headers=headers, params=params, json=body)
+      if self.http_pool is not None:
+        response = await self.http_pool.get(GEMINI).post(endpoint, headers=headers, params=params, json=body)
+      else:
+        async with httpx.AsyncClient(timeout=15.0) as client:
+          response = await client.post(endpoint, headers=headers, params=params, json=body)
       response.raise_for_status()
     except httpx.HTTPStatusError as exc:
       status = exc.response.status_code
@@ -90,18 +220,19 @@ class ImageGenerationService:
 
     raise ImageGenerationError("invalid_response", "生图响应不可用", status_code=502)
 
-  def _pixelate_local(self, image_bytes: bytes, block_size: int) -> str:
-    try:
-      image = Image.open(BytesIO(image_bytes)).convert("RGB")
-    except Exception as exc:  # pragma: no cover - defensive
-      raise ImageGenerationError("invalid_image", "无法读取图像") from exc
-
-    block = max(2, min(block_size, 64))
-    small_w = max(1, image.width // block)
-    small_h = max(1, image.height // block)
-    small = image.resize((small_w, small_h), resample=Image.NEAREST)
-    pixelated = small.resize((image.width, image.height), resample=Image.NEAREST)
-
-    buffer = BytesIO()
-    pixelated.save(buffer, format="PNG")
-    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("utf-8")
+  async def _pixelate_local(self, image_bytes: bytes, block_size: int) -> bytes:
+    with stage("pixelate"):
+      return await self.image_workers.run(
+        image_tasks.pixelate_image,
+        image_bytes,
+        block_size,
+        self.settings.pixel_art_palette,
+        self.settings.pixel_art_dither,
+        self.settings.pixel_art_outline,
+      )
+
+
+def _data_url_mime(data: str) -> str:
+  if data.startswith("data:") and ";base64," in data:
+    return data[5 : data.index(";base64,")]
+  return "image/png"
@@ -1,20 +1,159 @@
 from __future__ import annotations
 
+import math
+from dataclasses import dataclass
+from functools import lru_cache
 from io import BytesIO
+from typing import Any
 
 from PIL import Image, ImageDraw, ImageFont
 
 from ..models.common import LabelPayload, NormalizedBounds, TimePayload
+from .errors import ImageGenerationError
 from .utils import clamp, format_time_label, wrap_text
 
+TAG_BASE_WIDTH = 320
+TAG_BASE_HEIGHT = 210
+TAG_FRAME_COLOR = (196, 119, 24, 255)
+TAG_FILL_COLOR = (255, 230, 179, 240)
+TAG_DIVIDER_COLOR = (180, 104, 16, 255)
+
+CHIP_MARGIN = 12
+TIME_CHIP_SIZE = (180, 74)
+TIME_CHIP_OUTLINE = (120, 82, 44, 255)
+CLOCK_RADIUS = 24
+COIN_CHIP_SIZE = (140, 32)
+
+
+@dataclass(frozen=True)
+class EncodingProfile:
+  """How a composed artwork is written out: Pillow format, options and storage naming."""
+
+  name: str
+  format: str
+  mime_type: str
+  extension: str
+  options: dict[str, Any]
+
+
+ENCODING_PROFILES: dict[str, EncodingProfile] = {
+  profile.name: profile
+  for profile in (
+    EncodingProfile("png", "PNG", "image/png", "png", {}),
+    EncodingProfile("png-fast", "PNG", "image/png", "png", {"compress_level": 1}),
+    EncodingProfile("png-optimized", "PNG", "image/png", "png", {"optimize": True}),
+    EncodingProfile("webp-lossless", "WEBP", "image/webp", "webp", {"lossless": True, "method": 4}),
+    EncodingProfile("webp", "WEBP", "image/webp", "webp", {"quality": 90, "method": 4}),
+    EncodingProfile("avif", "AVIF", "image/avif", "avif", {"quality": 80, "speed": 6}),
+  )
+}
+
+
+def get_encoding_profile(name: str) -> EncodingProfile:
+  profile = ENCODING_PROFILES.get(name)
+  if profile is None:
+    raise ImageGenerationError("unsupported_encoding", f"未知的编码配置：{name}")
+  Image.init()
+  if profile.format not in Image.SAVE:
+    # AVIF needs Pillow >= 11.3 built with libavif (or pillow-avif-plugin).
+    raise ImageGenerationError("unsupported_encoding", f"当前环境不支持 {profile.format} 编码")
+  return profile
+
+
+@dataclass(frozen=True)
+class TextLayout:
+  """Wrapped lines of a text block with their measured pixel widths."""
+
+  lines: tuple[str, ...]
+  widths: tuple[float, ...]
+
+  @property
+  def width(self) -> float:
+    return max(self.widths, default=0.0)
+
+
+@lru_cache(maxsize=1024)
+def layout_text(text: str, limit: int, font: ImageFont.ImageFont | ImageFont.FreeTypeFont) -> TextLayout:
+  """Wrap and measure `text` once per `(text, limit, font)`."""
+  lines = tuple(wrap_text(text, limit=limit))
+  return TextLayout(lines=lines, widths=tuple(font.getlength(line) for line in lines))
+
+
+@lru_cache(maxsize=64)
+def tag_chrome(scale: float) -> Image.Image:
+  """Rounded tag frame with both dividers, rendered once per tag scale."""
+  width = int(TAG_BASE_WIDTH * scale)
+  height = int(TAG_BASE_HEIGHT * scale)
+  sprite = Image.new("RGBA", (width + 1, height + 1), (0, 0, 0, 0))
+  draw = ImageDraw.Draw(sprite)
+  draw.rounded_rectangle([0, 0, width, height], radius=int(12 * scale), fill=TAG_FILL_COLOR, outline=TAG_FRAME_COLOR, width=3)
+
+  padding = 12 * scale
+  first_divider = padding + 18 * scale
+  second_divider = first_divider + 22 * scale
+  draw.line([(padding, first_divider), (width - padding, first_divider)], fill=TAG_DIVIDER_COLOR, width=1)
+  draw.line([(padding, second_divider), (width - padding, second_divider)], fill=TAG_DIVIDER_COLOR, width=3)
+  return sprite
+
+
+@lru_cache(maxsize=1)
+def time_chip_chrome() -> Image.Image:
+  """Wood panel and empty clock face; text and hands are drawn per artwork."""
+  width, height = TIME_CHIP_SIZE
+  sprite = Image.new("RGBA", (width + 1, height + 1), (0, 0, 0, 0))
+  draw = ImageDraw.Draw(sprite)
+  draw.rounded_rectangle([0, 0, width, height], radius=10, fill=(206, 162, 112, 235), outline=TIME_CHIP_OUTLINE, width=2)
+  cx, cy = width - 36, height / 2
+  draw.ellipse(
+    [cx - CLOCK_RADIUS, cy - CLOCK_RADIUS, cx + CLOCK_RADIUS, cy + CLOCK_RADIUS],
+    outline=TIME_CHIP_OUTLINE,
+    fill=(239, 211, 170, 255),
+    width=2,
+  )
+  return sprite
+
+
+@lru_cache(maxsize=4)
+def coin_chip(font: ImageFont.ImageFont | ImageFont.FreeTypeFont) -> Image.Image:
+  """The fully static coin counter."""
+  width, height = COIN_CHIP_SIZE
+  sprite = Image.new("RGBA", (width + 1, height + 1), (0, 0, 0, 0))
+  draw = ImageDraw.Draw(sprite)
+  draw.rounded_rectangle([0, 0, width, height], radius=8, fill=(234, 188, 76, 240), outline=(162, 108, 28, 255), width=2)
+  draw.text((12, 8), "88888888", fill=(84, 52, 10, 255), font=font)
+  return sprite
+
+
+def _blit(canvas: Image.Image, sprite: Image.Image, x: int, y: int) -> None:
+  # alpha_composite rejects negative offsets, which happen when chrome is larger than the photo.
+  left, top = max(0, -x), max(0, -y)
+  if left >= sprite.width or top >= sprite.height:
+    return
+  if left or top:
+    sprite = sprite.crop((left, top, sprite.width, sprite.height))
+  canvas.alpha_composite(sprite, dest=(max(0, x), max(0, y)))
+
 
 class ImageService:
-  """Composes the final artwork (tag + time + coin) on top of the pixel image."""
+  """Composes the final artwork (tag + time + coin) on top of the pixel image.
+
+  Static chrome (tag frame, time panel, clock face, coin chip) is rendered once
+  into RGBA sprites and alpha-composited; only text and clock hands are drawn per call.
+  """
 
   def __init__(self) -> None:
     self.font = ImageFont.load_default()
 
-  def compose(self, base_image_bytes: bytes, label: LabelPayload, box_bounds: NormalizedBounds | None) -> bytes:
+  def compose(
+    self,
+    base_image_bytes: bytes,
+    label: LabelPayload,
+    box_bounds: NormalizedBounds | None,
+    profile: EncodingProfile = ENCODING_PROFILES["png"],
+  ) -> bytes:
+    return self.encode(self.render(base_image_bytes, label, box_bounds), profile)
+
+  def render(self, base_image_bytes: bytes, label: LabelPayload, box_bounds: NormalizedBounds | None) -> Image.Image:
     base = Image.open(BytesIO(base_image_bytes)).convert("RGBA")
     canvas = base.copy()
 
@@ -24,49 +163,39 @@ class ImageService:
     self._draw_tag(canvas, label)
     self._draw_time_chip(canvas, label.time)
     self._draw_coin(canvas)
+    return canvas
 
+  @staticmethod
+  def encode(canvas: Image.Image, profile: EncodingProfile = ENCODING_PROFILES["png"]) -> bytes:
     output = BytesIO()
-    canvas.save(output, format="PNG")
+    canvas.save(output, format=profile.format, **profile.options)
     return output.getvalue()
 
   def _draw_tag(self, canvas: Image.Image, label: LabelPayload) -> None:
-    draw = ImageDraw.Draw(canvas)
-    base_width = 320
-    base_height = 210
-    scale = clamp(label.tag_scale, 0.6, 2.0)
-    tag_width = int(base_width * scale)
-    tag_height = int(base_height * scale)
+    # Quantize so slider values share sprites; 0.01 is below one pixel at base size.
+    scale = round(clamp(label.tag_scale, 0.6, 2.0), 2)
+    tag_width = int(TAG_BASE_WIDTH * scale)
+    tag_height = int(TAG_BASE_HEIGHT * scale)
 
     x_center = clamp(label.tag_position.x_percent, 0.05, 0.95) * canvas.width
     y_center = clamp(label.tag_position.y_percent, 0.05, 0.95) * canvas.height
-    x0 = clamp(x_center - tag_width / 2, 0, canvas.width - tag_width)
-    y0 = clamp(y_center - tag_height / 2, 0, canvas.height - tag_height)
-    x1 = x0 + tag_width
-    y1 = y0 + tag_height
-
-    frame_color = (196, 119, 24, 255)
-    fill_color = (255, 230, 179, 240)
-    divider_color = (180, 104, 16, 255)
-
-    draw.rounded_rectangle([x0, y0, x1, y1], radius=int(12 * scale), fill=fill_color, outline=frame_color, width=3)
+    x0 = round(clamp(x_center - tag_width / 2, 0, canvas.width - tag_width))
+    y0 = round(clamp(y_center - tag_height / 2, 0, canvas.height - tag_height))
+    _blit(canvas, tag_chrome(scale), x0, y0)
 
+    draw = ImageDraw.Draw(canvas)
     padding = 12 * scale
     text_x = x0 + padding
     current_y = y0 + padding
 
-    draw.text((text_x, current_y), label.name or "未命名物品", fill=frame_color, font=self.font)
-    current_y += 18 * scale
-    draw.line([(text_x, current_y), (x1 - padding, current_y)], fill=divider_color, width=1)
-
-    current_y += 8 * scale
+    draw.text((text_x, current_y), label.name or "未命名物品", fill=TAG_FRAME_COLOR, font=self.font)
+    current_y += 26 * scale
     draw.text((text_x, current_y), label.category or "类别", fill=(110, 58, 12, 255), font=self.font)
-    current_y += 14 * scale
-    draw.line([(text_x, current_y), (x1 - padding, current_y)], fill=divider_color, width=3)
+    current_y += 24 * scale
 
-    current_y += 10 * scale
-    body_width = x1 - padding - text_x
+    body_width = tag_width - 2 * padding
     description = label.description or "在这里写下物品的故事。"
-    for line in wrap_text(description, limit=int(body_width / (7 * scale))):
+    for line in layout_text(description, int(body_width / (7 * scale)), self.font).lines:
       draw.text((text_x, current_y), line, fill=(92, 50, 10, 255), font=self.font)
       current_y += 14 * scale
 
@@ -78,59 +207,32 @@ class ImageService:
       draw.text((text_x + body_width * 0.5, current_y), health_text, fill=(141, 26, 26, 255), font=self.font)
 
   def _draw_time_chip(self, canvas: Image.Image, time: TimePayload) -> None:
-    draw = ImageDraw.Draw(canvas)
-    margin = 12
-    box_width = 180
-    box_height = 74
-
-    x1 = canvas.width - margin
-    x0 = x1 - box_width
-    y0 = margin
-    y1 = y0 + box_height
-
-    wood = (206, 162, 112, 235)
-    outline = (120, 82, 44, 255)
-
-    draw.rounded_rectangle([x0, y0, x1, y1], radius=10, fill=wood, outline=outline, width=2)
+    box_width, box_height = TIME_CHIP_SIZE
+    x0 = canvas.width - CHIP_MARGIN - box_width
+    y0 = CHIP_MARGIN
+    _blit(canvas, time_chip_chrome(), x0, y0)
 
+    draw = ImageDraw.Draw(canvas)
     text_x = x0 + 12
     top_y = y0 + 10
     draw.text((text_x, top_y), f"{time.month}月{time.day}日", fill=(64, 38, 12, 255), font=self.font)
     draw.text((text_x, top_y + 18), format_time_label(time.hour, time.minute), fill=(64, 38, 12, 255), font=self.font)
 
-    center_x = x1 - 36
+    center_x = x0 + box_width - 36
     center_y = y0 + box_height / 2
-    radius = 24
-    draw.ellipse([center_x - radius, center_y - radius, center_x + radius, center_y + radius], outline=outline, fill=(239, 211, 170, 255), width=2)
-
     minute_angle = (time.minute / 60) * 360
     hour_angle = ((time.hour % 12) / 12) * 360 + (time.minute / 60) * 30
-    self._draw_hand(draw, center_x, center_y, radius * 0.9, minute_angle, outline)
-    self._draw_hand(draw, center_x, center_y, radius * 0.65, hour_angle, outline)
-    draw.ellipse([center_x - 2, center_y - 2, center_x + 2, center_y + 2], fill=outline)
+    self._draw_hand(draw, center_x, center_y, CLOCK_RADIUS * 0.9, minute_angle, TIME_CHIP_OUTLINE)
+    self._draw_hand(draw, center_x, center_y, CLOCK_RADIUS * 0.65, hour_angle, TIME_CHIP_OUTLINE)
+    draw.ellipse([center_x - 2, center_y - 2, center_x + 2, center_y + 2], fill=TIME_CHIP_OUTLINE)
 
   def _draw_hand(self, draw: ImageDraw.ImageDraw, cx: float, cy: float, length: float, angle_deg: float, color: tuple[int, int, int, int]) -> None:
-    import math
-
     radians = math.radians(angle_deg - 90)  # start from top
     x = cx + length * math.cos(radians)
     y = cy + length * math.sin(radians)
     draw.line([(cx, cy), (x, y)], fill=color, width=2)
 
   def _draw_coin(self, canvas: Image.Image) -> None:
-    draw = ImageDraw.Draw(canvas)
-    box_width = 140
-    box_height = 32
-    margin = 12
-    top_offset = margin + 74 + 10
-
-    x1 = canvas.width - margin
-    x0 = x1 - box_width
-    y0 = top_offset
-    y1 = y0 + box_height
-
-    fill = (234, 188, 76, 240)
-    outline = (162, 108, 28, 255)
-
-    draw.rounded_rectangle([x0, y0, x1, y1], radius=8, fill=fill, outline=outline, width=2)
-    draw.text((x0 + 12, y0 + 8), "88888888", fill=(84, 52, 10, 255), font=self.font)
+    x0 = canvas.width - CHIP_MARGIN - COIN_CHIP_SIZE[0]
+    y0 = CHIP_MARGIN + TIME_CHIP_SIZE[1] + 10
+    _blit(canvas, coin_chip(self.font), x0, y0)
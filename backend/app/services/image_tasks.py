@@ -0,0 +1,116 @@
+"""CPU-bound image operations executed on the image worker pool.
+
+Every task is a top-level function that takes and returns bytes, ints and plain
+dicts so it can cross a process boundary. Per-process state (the compose
+sprite caches, the palette lookup table) is built by `warm_up` or on first use.
+"""
+from __future__ import annotations
+
+import os
+import time
+from functools import lru_cache
+from io import BytesIO
+from typing import Any
+
+from PIL import Image
+
+from ..models.common import LabelPayload, NormalizedBounds
+from .errors import DetectionError, ImageGenerationError
+from .image_service import ENCODING_PROFILES, ImageService
+from .pixel_art import palette_lut, pixelate
+
+
+@lru_cache(maxsize=1)
+def _image_service() -> ImageService:
+  return ImageService()
+
+
+def warm_up() -> int:
+  """Import codecs and build lookup tables before the first real request."""
+  Image.init()
+  palette_lut()
+  _image_service()
+  return os.getpid()
+
+
+def compose_artwork(
+  base_image_bytes: bytes, label: dict[str, Any], box_bounds: dict[str, Any] | None, profile_name: str
+) -> tuple[bytes, dict[str, float]]:
+  """Return the encoded artwork and the seconds spent in `compose` and `encode` (for Server-Timing)."""
+  started = time.perf_counter()
+  bounds = NormalizedBounds.model_validate(box_bounds) if box_bounds is not None else None
+  service = _image_service()
+  canvas = service.render(base_image_bytes, LabelPayload.model_validate(label), bounds)
+  rendered = time.perf_counter()
+  data = service.encode(canvas, ENCODING_PROFILES[profile_name])
+  return data, {"compose": rendered - started, "encode": time.perf_counter() - rendered}
+
+
+def pixelate_image(image_bytes: bytes, block_size: int, palette: bool, dither: bool, outline_edges: bool) -> bytes:
+  try:
+    image = Image.open(BytesIO(image_bytes)).convert("RGB")
+  except Exception as exc:  # pragma: no cover - defensive
+    raise ImageGenerationError("invalid_image", "无法读取图像") from exc
+
+  block = max(2, min(block_size, 64))
+  pixelated = pixelate(image, block, palette=palette, dither=dither, outline_edges=outline_edges)
+
+  buffer = BytesIO()
+  pixelated.save(buffer, format="PNG")
+  return buffer.getvalue()
+
+
+def encode_image(data: bytes, mime_type: str, lossless: bool, webp_quality: int, webp_method: int) -> bytes:
+  """Re-encode an image as PNG or WebP for /generate-image binary responses."""
+  try:
+    image = Image.open(BytesIO(data))
+    image.load()
+  except Exception as exc:  # pragma: no cover - defensive
+    raise ImageGenerationError("invalid_image", "无法读取图像") from exc
+
+  buffer = BytesIO()
+  if mime_type == "image/webp":
+    if lossless:
+      image.save(buffer, format="WEBP", lossless=True, method=webp_method)
+    else:
+      image.save(buffer, format="WEBP", quality=webp_quality, method=webp_method)
+  else:
+    image.save(buffer, format="PNG")
+  return buffer.getvalue()
+
+
+def prepare_detection_image(
+  image_bytes: bytes, reencode: bool, max_edge: int, jpeg_quality: int, reencode_min_bytes: int
+) -> tuple[int, int, bytes, int, int]:
+  """Probe the photo and shrink/re-encode the copy sent to cloud detectors.
+
+  Returns `(width, height, upload_bytes, sent_width, sent_height)`. Providers
+  report boxes in the sent image's pixels, and boxes are normalized against that
+  size, so normalized results match the original image. With `reencode=False`
+  only the size is probed and the original bytes are returned.
+  """
+  try:
+    image = Image.open(BytesIO(image_bytes))
+  except Exception as exc:  # pragma: no cover - defensive
+    raise DetectionError("invalid_image", "无法读取图片", status_code=400) from exc
+
+  width, height = image.size
+  oversized = max_edge > 0 and max(width, height) > max_edge
+  if not reencode or (not oversized and len(image_bytes) <= reencode_min_bytes):
+    return width, height, image_bytes, width, height
+
+  if oversized:
+    scale = max_edge / max(width, height)
+    target = (max(1, round(width * scale)), max(1, round(height * scale)))
+    # Lets the JPEG decoder downscale during decode (DCT scaling) instead of after.
+    image.draft("RGB", target)
+    resized = image.convert("RGB").resize(target, resample=Image.BILINEAR, reducing_gap=2.0)
+  else:
+    resized = image.convert("RGB")
+
+  buffer = BytesIO()
+  resized.save(buffer, format="JPEG", quality=jpeg_quality)
+  encoded = buffer.getvalue()
+  if not oversized and len(encoded) >= len(image_bytes):
+    return width, height, image_bytes, width, height
+  return width, height, encoded, resized.width, resized.height
@@ -0,0 +1,209 @@
+"""Asynchronous image generation jobs: submit now, poll (or get called back) later."""
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from collections.abc import Iterable
+from dataclasses import replace
+from datetime import datetime, timezone
+
+import httpx
+
+from ..clients.http_pool import CALLBACK, UpstreamHttpPool
+from ..clients.job_store import FAILED, QUEUED, SUCCEEDED, JobRecord, JobStore
+from ..models.image_gen import ImageJobError, ImageJobResponse
+from .errors import ImageGenerationError, JobQueueFullError, ServiceError
+from .image_gen_service import GeneratedImage, ImageGenerationService
+
+
+class JobQueue:
+  """In-process workers draining a `JobStore`, highest priority first.
+
+  At most `max_queued` jobs may wait; finished jobs (and their results) are
+  kept for `result_ttl` seconds. Workers wake on submit and otherwise poll the
+  store every `poll_interval`, so jobs added by another process sharing a
+  SQLite store are picked up too. Jobs interrupted by `stop()` go back to the
+  queue; jobs left `running` by a crashed process are re-queued once they have
+  been claimed for longer than `stale_after` seconds.
+  """
+
+  def __init__(
+    self,
+    store: JobStore,
+    service: ImageGenerationService,
+    http_pool: UpstreamHttpPool | None = None,
+    *,
+    workers: int = 2,
+    max_queued: int = 100,
+    result_ttl: float = 3600.0,
+    callback_timeout: float = 5.0,
+    stale_after: float = 600.0,
+    callback_hosts: Iterable[str] = (),
+    poll_interval: float = 1.0,
+  ):
+    self.store = store
+    self.service = service
+    self.http_pool = http_pool
+    self.callback_hosts = tuple(host.lower() for host in callback_hosts)
+    self.workers = max(1, workers)
+    self.max_queued = max_queued
+    self.result_ttl = result_ttl
+    self.callback_timeout = callback_timeout
+    self.stale_after = stale_after
+    self.poll_interval = poll_interval
+    self._tasks: list[asyncio.Task[None]] = []
+    self._wakeup: asyncio.Event | None = None
+    self._next_purge = 0.0
+    self.completed = 0
+    self.failed = 0
+    self.callback_errors = 0
+
+  def start(self) -> None:
+    if self._tasks:
+      return
+    self._wakeup = asyncio.Event()
+    self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+  async def stop(self) -> None:
+    """Cancel the workers; jobs they were running are re-queued before the store closes."""
+    tasks, self._tasks = self._tasks, []
+    for task in tasks:
+      task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    self.store.close()
+
+  async def submit(
+    self,
+    image_bytes: bytes,
+    prompt: str | None = None,
+    block_size: int = 10,
+    priority: int = 0,
+    callback_url: str | None = None,
+  ) -> JobRecord:
+    if callback_url is not None and not self.callback_allowed(callback_url):
+      raise ImageGenerationError("callback_not_allowed", "回调地址不在允许列表中", status_code=400)
+    if await self.store.count_queued() >= self.max_queued:
+      raise JobQueueFullError("job_queue_full", "生图任务排队已满，请稍后再试", status_code=503)
+    now = time.time()
+    job = JobRecord(
+      id=uuid.uuid4().hex,
+      status=QUEUED,
+      priority=priority,
+      created_at=now,
+      updated_at=now,
+      image=image_bytes,
+      prompt=prompt,
+      block_size=block_size,
+      callback_url=callback_url,
+    )
+    await self.store.add(job)
+    if self._wakeup is not None:
+      self._wakeup.set()
+    return job
+
+  def callback_allowed(self, url: str) -> bool:
+    """Only http(s) URLs whose host is allowlisted, so callbacks can't reach internal addresses."""
+    parsed = httpx.URL(url)
+    host = parsed.host.lower()
+    if parsed.scheme not in ("http", "https") or not host:
+      return False
+    return any(host == allowed or (allowed.startswith(".") and host.endswith(allowed)) for allowed in self.callback_hosts)
+
+  async def get(self, job_id: str) -> JobRecord | None:
+    job = await self.store.get(job_id)
+    if job is None or (job.expires_at is not None and job.expires_at <= time.time()):
+      return None
+    return job
+
+  async def _work(self) -> None:
+    assert self._wakeup is not None
+    while True:
+      now = time.time()
+      if now >= self._next_purge:
+        self._next_purge = now + min(60.0, self.result_ttl)
+        await self.store.purge_expired(now)
+        await self.store.requeue_stale(now - self.stale_after, now)
+
+      self._wakeup.clear()
+      job = await self.store.claim_next(now)
+      if job is None:
+        try:
+          await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+        except asyncio.TimeoutError:
+          pass
+        continue
+      await self._run(job)
+
+  async def _run(self, job: JobRecord) -> None:
+    try:
+      # Nobody is waiting on the response, so skip the latency budget and wait for the real model.
+      generated: GeneratedImage = await self.service.generate_image(
+        job.image, job.prompt, job.block_size, wait_for_remote=True
+      )
+      finished = replace(job, status=SUCCEEDED, result=generated.data, mime_type=generated.mime_type)
+      self.completed += 1
+    except ServiceError as exc:
+      finished = replace(job, status=FAILED, error_code=exc.code, error_message=exc.message)
+      self.failed += 1
+    except asyncio.CancelledError:
+      # Shutting down mid-job: hand it back so the next start (or another process) runs it.
+      await self.store.update(replace(job, status=QUEUED, updated_at=time.time()))
+      raise
+    except Exception:  # pragma: no cover - defensive; one bad job must not stop a worker
+      finished = replace(job, status=FAILED, error_code="internal_error", error_message="处理失败")
+      self.failed += 1
+
+    now = time.time()
+    # The source image is no longer needed once the job is done.
+    finished = replace(finished, image=b"", updated_at=now, expires_at=now + self.result_ttl)
+    await self.store.update(finished)
+    if finished.callback_url:
+      await self._notify(finished)
+
+  async def _notify(self, job: JobRecord) -> None:
+    if not self.callback_allowed(job.callback_url):
+      # The allowlist may have shrunk since the job was queued.
+      self.callback_errors += 1
+      return
+    body = job_response(job).model_dump(mode="json")
+    try:
+      if self.http_pool is not None:
+        response = await self.http_pool.get(CALLBACK).post(job.callback_url, json=body)
+      else:
+        async with httpx.AsyncClient(timeout=self.callback_timeout) as client:
+          response = await client.post(job.callback_url, json=body)
+      response.raise_for_status()
+    except httpx.HTTPError:
+      # Callbacks are best effort; the result can still be polled until it expires.
+      self.callback_errors += 1
+
+  def stats(self) -> dict[str, int]:
+    return {
+      "workers": len(self._tasks),
+      "max_queued": self.max_queued,
+      "completed": self.completed,
+      "failed": self.failed,
+      "callback_errors": self.callback_errors,
+    }
+
+
+def job_response(job: JobRecord) -> ImageJobResponse:
+  image_base64 = None
+  if job.status == SUCCEEDED and job.result is not None:
+    image_base64 = GeneratedImage(data=job.result, mime_type=job.mime_type or "image/png").to_data_url()
+  error = ImageJobError(code=job.error_code, message=job.error_message or "") if job.error_code else None
+  return ImageJobResponse(
+    id=job.id,
+    status=job.status,
+    priority=job.priority,
+    created_at=_utc(job.created_at),
+    updated_at=_utc(job.updated_at),
+    expires_at=_utc(job.expires_at) if job.expires_at is not None else None,
+    image_base64=image_base64,
+    error=error,
+  )
+
+
+def _utc(timestamp: float) -> datetime:
+  return datetime.fromtimestamp(timestamp, tz=timezone.utc)
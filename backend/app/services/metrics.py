@@ -0,0 +1,146 @@
+"""Prometheus metrics: request and upstream latency, fallbacks and image sizes.
+
+Histograms and counters live in a module-level registry and are updated
+in-line (a lock and a bucket search per observation). The existing `stats()`
+dicts (pools, caches, breakers, providers) are turned into gauges at scrape
+time by `StatsCollector`, so they cost nothing between scrapes.
+"""
+from __future__ import annotations
+
+import time
+from typing import Callable, Iterator, Mapping
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+REGISTRY = CollectorRegistry(auto_describe=True)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0)
+BYTE_BUCKETS = tuple(float(4**power * 1024) for power in range(1, 9))  # 4 KiB .. 64 MiB
+
+HTTP_REQUEST_SECONDS = Histogram(
+  "http_request_duration_seconds",
+  "Time from request start to the last response byte.",
+  ("router", "route", "method", "status"),
+  buckets=LATENCY_BUCKETS,
+  registry=REGISTRY,
+)
+UPSTREAM_REQUEST_SECONDS = Histogram(
+  "upstream_request_duration_seconds",
+  "Latency of calls to upstream providers by outcome (retries count as separate calls).",
+  ("upstream", "outcome"),
+  buckets=LATENCY_BUCKETS,
+  registry=REGISTRY,
+)
+FALLBACKS = Counter(
+  "fallbacks_total",
+  "Answers served by a local fallback instead of the upstream model.",
+  ("kind",),
+  registry=REGISTRY,
+)
+IMAGE_BYTES = Histogram(
+  "image_bytes",
+  "Size of images received, sent upstream and produced.",
+  ("kind",),
+  buckets=BYTE_BUCKETS,
+  registry=REGISTRY,
+)
+
+METRICS_MEDIA_TYPE = CONTENT_TYPE_LATEST
+
+
+def observe_upstream(upstream: str, outcome: str, seconds: float) -> None:
+  UPSTREAM_REQUEST_SECONDS.labels(upstream, outcome).observe(seconds)
+
+
+def count_fallback(kind: str) -> None:
+  FALLBACKS.labels(kind).inc()
+
+
+def observe_image_bytes(kind: str, size: int) -> None:
+  IMAGE_BYTES.labels(kind).observe(size)
+
+
+StatsSource = Callable[[], Mapping[str, object]]
+
+
+class StatsCollector:
+  """Expose `stats()` dicts as gauges named `<prefix>_<key>`.
+
+  With a `label`, the dict maps label values to per-item stats (e.g. one entry
+  per upstream). Numbers become gauge values; strings (like a breaker state)
+  become a `<prefix>_<key>{<key>="<value>"} 1` series; anything else is skipped.
+  """
+
+  def __init__(self) -> None:
+    self._sources: list[tuple[str, str | None, StatsSource]] = []
+
+  def add(self, prefix: str, source: StatsSource, label: str | None = None) -> None:
+    self._sources.append((prefix, label, source))
+
+  def collect(self) -> Iterator[GaugeMetricFamily]:
+    families: dict[str, GaugeMetricFamily] = {}
+    for prefix, label, source in self._sources:
+      stats = source()
+      rows = stats.items() if label else [(None, stats)]
+      for item, values in rows:
+        if not isinstance(values, Mapping):
+          continue
+        for key, value in values.items():
+          name = f"{prefix}_{key}"
+          labels = [label] if label else []
+          label_values = [str(item)] if label else []
+          if isinstance(value, str):
+            labels, label_values, value = labels + [key], label_values + [value], 1
+          elif not isinstance(value, (int, float)):
+            continue
+          family = families.get(name)
+          if family is None:
+            family = families[name] = GaugeMetricFamily(name, f"{prefix} {key}", labels=labels)
+          family.add_metric(label_values, float(value))
+    yield from families.values()
+
+
+def render(collector: StatsCollector | None = None) -> bytes:
+  output = generate_latest(REGISTRY)
+  if collector is not None:
+    scrape = CollectorRegistry(auto_describe=False)
+    scrape.register(collector)
+    output += generate_latest(scrape)
+  return output
+
+
+class MetricsMiddleware:
+  """Pure ASGI middleware timing every HTTP request until its last body chunk.
+
+  Requests are labelled with the router module of the matched endpoint and
+  the route's path template, so label cardinality stays bounded.
+  """
+
+  def __init__(self, app):
+    self.app = app
+
+  async def __call__(self, scope, receive, send) -> None:
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+
+    started = time.perf_counter()
+    status = 500
+
+    async def send_wrapper(message) -> None:
+      nonlocal status
+      if message["type"] == "http.response.start":
+        status = message["status"]
+      await send(message)
+
+    try:
+      await self.app(scope, receive, send_wrapper)
+    finally:
+      route = scope.get("route")
+      endpoint = getattr(route, "endpoint", None)
+      if endpoint is not None:
+        router, path = endpoint.__module__.rsplit(".", 1)[-1], getattr(route, "path", "unknown")
+      else:
+        router, path = "none", "unmatched"
+      HTTP_REQUEST_SECONDS.labels(router, path, scope["method"], str(status)).observe(time.perf_counter() - started)
@@ -0,0 +1,176 @@
+"""Latency-aware, hedged routing across interchangeable detection providers."""
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Sequence
+
+from ..models.common import DetectionBox
+from .errors import DetectionError
+
+DetectFn = Callable[[bytes, int, int, int], Awaitable[list[DetectionBox]]]
+
+
+@dataclass(frozen=True)
+class DetectionProvider:
+  name: str
+  detect: DetectFn
+
+
+class LatencyTracker:
+  """Rolling window of call latencies and outcomes for one provider."""
+
+  def __init__(self, window: int):
+    self._samples: deque[tuple[float, bool]] = deque(maxlen=max(1, window))
+
+  def record(self, seconds: float, ok: bool) -> None:
+    self._samples.append((seconds, ok))
+
+  def __len__(self) -> int:
+    return len(self._samples)
+
+  def percentile(self, pct: float) -> float | None:
+    """Nearest-rank percentile over successful calls, or None without samples."""
+    latencies = sorted(seconds for seconds, ok in self._samples if ok)
+    if not latencies:
+      return None
+    rank = max(1, math.ceil(pct / 100 * len(latencies)))
+    return latencies[min(rank, len(latencies)) - 1]
+
+  def error_rate(self) -> float:
+    if not self._samples:
+      return 0.0
+    return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+  def stats(self) -> dict[str, float | None]:
+    return {
+      "samples": len(self._samples),
+      "p50": self.percentile(50),
+      "p95": self.percentile(95),
+      "error_rate": self.error_rate(),
+    }
+
+
+class HedgedDetectionRouter:
+  """Send each detection to the best provider and hedge to the next one when it is slow.
+
+  Providers are ranked by health (error rate under `max_error_rate`), then by
+  rolling p50 once they have `min_samples`, then by configured order. If the
+  primary hasn't answered after its `hedge_percentile` latency (clamped to
+  `min_hedge_delay`, or `default_hedge_delay` before enough samples), the
+  runner-up is started too; the first success wins and the other is cancelled.
+  Failures fail over to the next provider immediately.
+  """
+
+  def __init__(
+    self,
+    providers: Sequence[DetectionProvider],
+    *,
+    hedge_enabled: bool = True,
+    hedge_percentile: float = 95.0,
+    min_hedge_delay: float = 0.3,
+    default_hedge_delay: float = 1.5,
+    window: int = 200,
+    min_samples: int = 20,
+    max_error_rate: float = 0.5,
+    clock: Callable[[], float] = time.perf_counter,
+  ):
+    self.providers = list(providers)
+    self.hedge_enabled = hedge_enabled
+    self.hedge_percentile = hedge_percentile
+    self.min_hedge_delay = min_hedge_delay
+    self.default_hedge_delay = default_hedge_delay
+    self.min_samples = min_samples
+    self.max_error_rate = max_error_rate
+    self._clock = clock
+    self.trackers = {provider.name: LatencyTracker(window) for provider in self.providers}
+    self.hedges = 0
+    self.hedge_wins = 0
+
+  def ranked(self) -> list[DetectionProvider]:
+    def score(item: tuple[int, DetectionProvider]) -> tuple[bool, float, int]:
+      order, provider = item
+      tracker = self.trackers[provider.name]
+      warmed = len(tracker) >= self.min_samples
+      unhealthy = warmed and tracker.error_rate() > self.max_error_rate
+      p50 = tracker.percentile(50) if warmed else None
+      return unhealthy, p50 if p50 is not None else math.inf, order
+
+    return [provider for _, provider in sorted(enumerate(self.providers), key=score)]
+
+  def hedge_delay(self, provider: DetectionProvider) -> float:
+    tracker = self.trackers[provider.name]
+    threshold = tracker.percentile(self.hedge_percentile) if len(tracker) >= self.min_samples else None
+    if threshold is None:
+      return self.default_hedge_delay
+    return max(self.min_hedge_delay, threshold)
+
+  async def detect(self, image_bytes: bytes, width: int, height: int, max_results: int) -> list[DetectionBox]:
+    if not self.providers:
+      raise DetectionError("no_provider", "未配置检测服务", status_code=500)
+
+    queue = self.ranked()
+    running: dict[asyncio.Task[list[DetectionBox]], DetectionProvider] = {}
+    last_error: BaseException | None = None
+
+    def launch() -> None:
+      provider = queue.pop(0)
+      task = asyncio.ensure_future(self._timed(provider, image_bytes, width, height, max_results))
+      running[task] = provider
+
+    launch()
+    primary = next(iter(running))
+    try:
+      while running:
+        can_hedge = self.hedge_enabled and queue and len(running) == 1 and primary in running
+        timeout = self.hedge_delay(running[primary]) if can_hedge else None
+        done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+          self.hedges += 1
+          launch()
+          continue
+        for task in done:
+          running.pop(task)
+          if task.exception() is None:
+            if task is not primary:
+              self.hedge_wins += 1
+            return task.result()
+          last_error = task.exception()
+        if not running and queue:
+          # Fail over right away instead of waiting out a hedge delay.
+          launch()
+    finally:
+      for task in running:
+        task.cancel()
+
+    raise last_error or DetectionError("detect_failed", "检测服务均不可用", status_code=502)
+
+  async def _timed(
+    self, provider: DetectionProvider, image_bytes: bytes, width: int, height: int, max_results: int
+  ) -> list[DetectionBox]:
+    started = self._clock()
+    try:
+      boxes = await provider.detect(image_bytes, width, height, max_results)
+    except DetectionError as exc:
+      # Answers like no_objects (422) say nothing about provider health; 5xx, timeouts and throttling do.
+      healthy = exc.status_code < 500 and exc.status_code not in (408, 429)
+      self.trackers[provider.name].record(self._clock() - started, ok=healthy)
+      raise
+    except asyncio.CancelledError:
+      raise
+    except Exception:
+      self.trackers[provider.name].record(self._clock() - started, ok=False)
+      raise
+    self.trackers[provider.name].record(self._clock() - started, ok=True)
+    return boxes
+
+  def stats(self) -> dict[str, object]:
+    return {
+      "order": [provider.name for provider in self.ranked()],
+      "hedges": self.hedges,
+      "hedge_wins": self.hedge_wins,
+      "providers": {name: tracker.stats() for name, tracker in self.trackers.items()},
+    }
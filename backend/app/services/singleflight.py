@@ -0,0 +1,48 @@
+"""Coalesce concurrent identical upstream calls into one in-flight task."""
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+from .timing import stage
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+  """Share one in-flight call per key between every concurrent caller.
+
+  Errors are delivered to every waiter. A waiter that gets cancelled only stops
+  waiting; the shared call keeps running for the others.
+  """
+
+  def __init__(self) -> None:
+    self._inflight: dict[Hashable, asyncio.Task[T]] = {}
+    self.calls = 0
+    self.coalesced = 0
+
+  async def run(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+    task = self._inflight.get(key)
+    if task is None:
+      self.calls += 1
+      task = asyncio.ensure_future(factory())
+      self._inflight[key] = task
+      task.add_done_callback(lambda done, key=key: self._forget(key, done))
+      return await asyncio.shield(task)
+    self.coalesced += 1
+    # The shared call's stages are timed in the request that started it.
+    with stage("coalesced_wait"):
+      return await asyncio.shield(task)
+
+  def _forget(self, key: Hashable, task: asyncio.Task[T]) -> None:
+    if self._inflight.get(key) is task:
+      del self._inflight[key]
+    # Retrieve the outcome so an error nobody awaited is not logged as "never retrieved".
+    if not task.cancelled():
+      task.exception()
+
+  def __len__(self) -> int:
+    return len(self._inflight)
+
+  def stats(self) -> dict[str, int]:
+    return {"inflight": len(self._inflight), "calls": self.calls, "coalesced": self.coalesced}
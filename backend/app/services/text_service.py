@@ -1,37 +1,140 @@
 from __future__ import annotations
 
+import random
+from contextlib import aclosing
+from typing import AsyncIterator
+
+from ..clients.http_pool import UpstreamHttpPool
 from ..clients.text_client import LLMTextClient
 from ..config import Settings
 from ..models.text import TextRequest, TextResponse
+from .cache import TTLCache
 from .errors import TextGenerationError
+from .metrics import count_fallback
+from .singleflight import SingleFlight
 
 
 class TextService:
   """Generates Stardew-toned descriptions with LLM + safe fallback."""
 
-  def __init__(self, settings: Settings):
+  def __init__(self, settings: Settings, http_pool: UpstreamHttpPool | None = None):
     self.settings = settings
     self.client = (
-      LLMTextClient(settings.text_gen_endpoint, settings.text_gen_key)
+      LLMTextClient(settings.text_gen_endpoint, settings.text_gen_key, http_pool)
       if settings.text_gen_endpoint and settings.text_gen_key
       else None
     )
+    self.inflight: SingleFlight[TextResponse] = SingleFlight()
+    # Several trimmed LLM descriptions per normalized request, so repeats don't all read the same.
+    self.cache: TTLCache[tuple[str, ...]] | None = (
+      TTLCache(settings.text_cache_max_entries, settings.text_cache_ttl_seconds)
+      if settings.text_cache_enabled and self.client is not None
+      else None
+    )
+    self.cache_variants = max(1, settings.text_cache_variants)
+    self.served_from_cache = 0
+    self.llm_calls = 0
+    self.llm_failures = 0
 
   async def generate_description(self, request: TextRequest) -> TextResponse:
     object_name = request.object_name or "这件物品"
     category = request.category or "杂物"
     context = request.context
+    key = _normalize_key(object_name, category, context, request.tone)
+    if self.cache is not None:
+      # Until a key has collected enough variants, lookups are misses and keep asking the LLM for a new one.
+      variants = self.cache.get(key, usable=self._complete)
+      if variants:
+        self.served_from_cache += 1
+        return TextResponse(description=random.choice(variants))
+    return await self.inflight.run(key, lambda: self._generate(key, object_name, category, context))
+
+  async def stream_description(self, request: TextRequest) -> AsyncIterator[str]:
+    """Yield the description in pieces as the LLM produces it, stopping after two sentences.
+
+    Cached variants and the template fallback arrive as a single piece. If the
+    upstream fails before producing any text, the template is sent instead.
+    """
+    object_name = request.object_name or "这件物品"
+    category = request.category or "杂物"
+    context = request.context
+    key = _normalize_key(object_name, category, context, request.tone)
+    if self.cache is not None:
+      variants = self.cache.get(key, usable=self._complete)
+      if variants:
+        self.served_from_cache += 1
+        yield random.choice(variants)
+        return
 
+    if self.client:
+      trimmer = SentenceTrimmer(limit=2)
+      failed = False
+      try:
+        # aclosing() closes the upstream response on break, so generation stops at the second "。".
+        async with aclosing(self.client.stream_description(object_name, category, context)) as deltas:
+          async for delta in deltas:
+            piece = trimmer.feed(delta)
+            if piece:
+              yield piece
+            if trimmer.done:
+              break
+      except TextGenerationError:
+        self.llm_failures += 1
+        if not trimmer.text:
+          count_fallback("text_template")
+          yield self._template_description(object_name, category, context)
+          return
+        failed = True
+      tail = trimmer.finish()
+      if tail:
+        yield tail
+      if trimmer.text:
+        # A description cut short by an upstream error is sent but not cached.
+        if not failed:
+          self.llm_calls += 1
+          self._remember(key, trimmer.text)
+        return
+
+    count_fallback("text_template")
+    yield self._template_description(object_name, category, context)
+
+  def cache_stats(self) -> dict[str, float]:
+    stats: dict[str, float] = self.cache.stats() if self.cache is not None else {"size": 0}
+    served = self.served_from_cache + self.llm_calls + self.llm_failures
+    stats.update(
+      served_from_cache=self.served_from_cache,
+      llm_calls=self.llm_calls,
+      llm_failures=self.llm_failures,
+      # Share of descriptions answered without an upstream call; the cache's own `hit_ratio` is per lookup.
+      served_ratio=self.served_from_cache / served if served else 0.0,
+    )
+    return stats
+
+  async def _generate(self, key: tuple[str, ...], object_name: str, category: str, context: str | None) -> TextResponse:
     if self.client:
       try:
         text = await self.client.generate_description(object_name, category, context)
-        return TextResponse(description=self._trim_to_two_sentences(text))
+        self.llm_calls += 1
+        description = self._trim_to_two_sentences(text)
+        self._remember(key, description)
+        return TextResponse(description=description)
       except TextGenerationError:
         # Fallback to template on any upstream failure (429/timeout/invalid response)
-        pass
+        self.llm_failures += 1
 
+    count_fallback("text_template")
     return TextResponse(description=self._template_description(object_name, category, context))
 
+  def _complete(self, variants: tuple[str, ...]) -> bool:
+    return len(variants) >= self.cache_variants
+
+  def _remember(self, key: tuple[str, ...], description: str) -> None:
+    if self.cache is None:
+      return
+    # Repeats are kept too, so a deterministic model still fills the key and stops being called.
+    variants = self.cache.peek(key) or ()
+    self.cache.set(key, (variants + (description,))[-self.cache_variants :])
+
   def _template_description(self, object_name: str, category: str, context: str | None) -> str:
     hint = "像是从谷仓里翻出的旧物" if category in ("杂物", "家具") else "带着刚晒过的暖意"
     context_note = f" 关于{context}" if context else ""
@@ -47,3 +150,50 @@ class TextService:
     if not first_two.endswith("。"):
       first_two += "。"
     return first_two
+
+
+def _normalize_key(object_name: str, category: str, context: str | None, tone: str) -> tuple[str, ...]:
+  """Collapse whitespace and case so trivially different requests share cached variants."""
+  return tuple(" ".join(value.split()).casefold() for value in (object_name, category, context or "", tone))
+
+
+class SentenceTrimmer:
+  """Incremental counterpart of `TextService._trim_to_two_sentences` for streamed text."""
+
+  def __init__(self, limit: int = 2):
+    self.limit = limit
+    self.sentences = 0
+    self.text = ""
+    self._segment = ""
+
+  @property
+  def done(self) -> bool:
+    return self.sentences >= self.limit
+
+  def feed(self, delta: str) -> str:
+    """Accept a delta and return the part of it that belongs in the output."""
+    out = []
+    for char in delta.replace("\n", " "):
+      if self.done:
+        break
+      if char == "。":
+        # Empty sentences ("。。") are dropped, as in the non-streaming trim.
+        if self._segment.strip():
+          out.append(char)
+          self.sentences += 1
+          self._segment = ""
+        continue
+      if not self.text and not out and char.isspace():
+        continue
+      out.append(char)
+      self._segment += char
+    piece = "".join(out)
+    self.text += piece
+    return piece
+
+  def finish(self) -> str:
+    """Close an unterminated last sentence with "。"."""
+    if self.text and not self.text.endswith("。"):
+      self.text += "。"
+      return "。"
+    return ""
@@ -0,0 +1,125 @@
+"""Per-request stage timers, reported as a `Server-Timing` header and log fields.
+
+`ServerTimingMiddleware` keeps a `StageTimings` for the current request in a
+context variable; services wrap their stages in `with stage("sha256"):` or
+`record()` durations measured elsewhere (e.g. inside an image worker process).
+Tasks spawned by the request copy the context, so hedged or batched work lands
+in the same timings; concurrent stages add up and may exceed the total.
+
+Without the middleware (SERVER_TIMING_ENABLED=false) `stage()` costs one
+ContextVar lookup and returns a shared no-op.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from contextvars import ContextVar
+from typing import Mapping
+
+logger = logging.getLogger("app.server_timing")
+
+_current: ContextVar[StageTimings | None] = ContextVar("stage_timings", default=None)
+
+
+class StageTimings:
+  def __init__(self) -> None:
+    self.durations: dict[str, float] = {}
+
+  def add(self, name: str, seconds: float) -> None:
+    self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+  def header_value(self, total: float) -> str:
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.durations.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class _Stage:
+  __slots__ = ("_timings", "_name", "_started")
+
+  def __init__(self, timings: StageTimings, name: str):
+    self._timings = timings
+    self._name = name
+    self._started = 0.0
+
+  def __enter__(self) -> _Stage:
+    self._started = time.perf_counter()
+    return self
+
+  def __exit__(self, *exc_info: object) -> None:
+    self._timings.add(self._name, time.perf_counter() - self._started)
+
+
+class _NoStage:
+  __slots__ = ()
+
+  def __enter__(self) -> _NoStage:
+    return self
+
+  def __exit__(self, *exc_info: object) -> None:
+    return None
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name: str) -> _Stage | _NoStage:
+  """Time the enclosed block as `name` when the request is being timed."""
+  timings = _current.get()
+  return _NO_STAGE if timings is None else _Stage(timings, name)
+
+
+def record(stages: Mapping[str, float]) -> None:
+  """Add durations measured elsewhere, e.g. returned by an image worker task."""
+  timings = _current.get()
+  if timings is not None:
+    for name, seconds in stages.items():
+      timings.add(name, seconds)
+
+
+class ServerTimingMiddleware:
+  """Pure ASGI middleware adding `Server-Timing` and logging stage durations.
+
+  The header goes out with the response start, so streamed bodies report the
+  time to first byte; the log line is written once the response is complete.
+  """
+
+  def __init__(self, app):
+    self.app = app
+
+  async def __call__(self, scope, receive, send) -> None:
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+
+    timings = StageTimings()
+    token = _current.set(timings)
+    started = time.perf_counter()
+    status = 500
+
+    async def send_wrapper(message) -> None:
+      nonlocal status
+      if message["type"] == "http.response.start":
+        status = message["status"]
+        header = timings.header_value(time.perf_counter() - started).encode("latin-1")
+        message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+      await send(message)
+
+    try:
+      await self.app(scope, receive, send_wrapper)
+    finally:
+      _current.reset(token)
+      if timings.durations:
+        logger.info(
+          "%s %s %s",
+          scope["method"],
+          scope["path"],
+          status,
+          extra={
+            "http_method": scope["method"],
+            "http_path": scope["path"],
+            "http_status": status,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            "stages_ms": {name: round(seconds * 1000, 1) for name, seconds in timings.durations.items()},
+          },
+        )
@@ -0,0 +1,102 @@
+"""Read raw `image/*` bodies or multipart file parts into bytes with a size cap."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+from starlette.requests import Request
+
+from .errors import UploadError
+
+# Request body docs for endpoints that read the body themselves.
+IMAGE_UPLOAD_OPENAPI = {
+  "requestBody": {
+    "required": True,
+    "content": {
+      "image/*": {"schema": {"type": "string", "format": "binary"}},
+      "multipart/form-data": {
+        "schema": {
+          "type": "object",
+          "properties": {"image": {"type": "string", "format": "binary"}},
+          "required": ["image"],
+        }
+      },
+    },
+  }
+}
+
+
+@dataclass
+class ImageUpload:
+  data: bytes
+  content_type: str
+  fields: dict[str, str] = field(default_factory=dict)
+
+
+async def read_image_upload(
+  request: Request, max_bytes: int, spool_bytes: int, file_field: str = "image"
+) -> ImageUpload:
+  """Read the request image, rejecting bodies over the cap while they stream in.
+
+  Accepts either a raw `image/*` (or `application/octet-stream`) body, or a
+  `multipart/form-data` body whose `file_field` part holds the image. Other
+  multipart text fields are returned in `ImageUpload.fields`. Raw bodies are
+  capped at `max_bytes`; multipart bodies at `max_bytes + spool_bytes` on the
+  wire (framing and text fields), with parts over `spool_bytes` spooled to disk.
+  """
+  content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+  multipart = content_type == "multipart/form-data"
+  # Multipart framing and text fields get `spool_bytes` of slack; a raw body is the image itself.
+  wire_limit = max_bytes + spool_bytes if multipart else max_bytes
+  declared = request.headers.get("content-length")
+  if declared and declared.isdigit() and int(declared) > wire_limit:
+    # Refused unread.
+    raise UploadError("image_too_large", "图片过大", status_code=413)
+
+  if multipart:
+    return await _read_multipart(request, max_bytes, spool_bytes, file_field)
+  if content_type.startswith("image/") or content_type == "application/octet-stream":
+    data = b"".join([chunk async for chunk in _capped(request.stream(), max_bytes)])
+    if not data:
+      raise UploadError("empty_image", "图片内容为空", status_code=400)
+    return ImageUpload(data=data, content_type=content_type)
+  raise UploadError("unsupported_media_type", "仅支持 image/* 或 multipart/form-data 上传", status_code=415)
+
+
+async def _capped(stream: AsyncIterator[bytes], limit: int) -> AsyncIterator[bytes]:
+  """Pass chunks through, failing as soon as more than `limit` bytes arrived (chunked bodies included)."""
+  received = 0
+  async for chunk in stream:
+    received += len(chunk)
+    if received > limit:
+      raise UploadError("image_too_large", "图片过大", status_code=413)
+    yield chunk
+
+
+async def _read_multipart(request: Request, max_bytes: int, spool_bytes: int, file_field: str) -> ImageUpload:
+  parser = MultiPartParser(
+    request.headers, _capped(request.stream(), max_bytes + spool_bytes), max_files=1, max_fields=16
+  )
+  parser.spool_max_size = spool_bytes
+  try:
+    form = await parser.parse()
+  except MultiPartException as exc:
+    raise UploadError("invalid_multipart", "无法解析上传表单", status_code=400) from exc
+
+  try:
+    upload = form.get(file_field)
+    if not isinstance(upload, UploadFile):
+      raise UploadError("missing_image", f"缺少文件字段 {file_field}", status_code=400)
+    if upload.size is not None and upload.size > max_bytes:
+      raise UploadError("image_too_large", "图片过大", status_code=413)
+    data = await upload.read(max_bytes + 1)
+    if len(data) > max_bytes:
+      raise UploadError("image_too_large", "图片过大", status_code=413)
+    if not data:
+      raise UploadError("empty_image", "图片内容为空", status_code=400)
+    fields = {key: value for key, value in form.multi_items() if isinstance(value, str)}
+    return ImageUpload(data=data, content_type=upload.content_type or "application/octet-stream", fields=fields)
+  finally:
+    await form.close()
@@ -1,20 +1,85 @@
 import base64
+import binascii
+import json
+from datetime import datetime
 
-from ..services.errors import ImageGenerationError
+from ..services.errors import ImageGenerationError, StorageError
+from ..services.timing import stage
 
 
 def decode_base64_image(data: str) -> bytes:
   """Decode a base64 string or data URL into raw bytes."""
   try:
-    if "base64," in data:
-      _, encoded = data.split("base64,", maxsplit=1)
-    else:
-      encoded = data
-    return base64.b64decode(encoded)
+    with stage("decode"):
+      if "base64," in data:
+        _, encoded = data.split("base64,", maxsplit=1)
+      else:
+        encoded = data
+      return base64.b64decode(encoded)
   except Exception as exc:  # pragma: no cover - defensive
     raise ImageGenerationError("invalid_image", "无法解析图像内容") from exc
 
 
+def encode_cursor(created_at: datetime, record_id: str) -> str:
+  """Encode a (created_at, id) keyset position as an opaque URL-safe cursor."""
+  raw = json.dumps([created_at.isoformat(), record_id], separators=(",", ":")).encode("utf-8")
+  return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+  try:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    created_at, record_id = json.loads(base64.urlsafe_b64decode(padded))
+    parsed = datetime.fromisoformat(created_at)
+  except (binascii.Error, ValueError, TypeError) as exc:
+    raise StorageError("invalid_cursor", "分页游标无效", status_code=400) from exc
+  if parsed.tzinfo is None:
+    # Record keys are tz-aware; a naive value can't be compared with them.
+    raise StorageError("invalid_cursor", "分页游标无效", status_code=400)
+  return parsed, str(record_id)
+
+
+NEGOTIABLE_IMAGE_TYPES = ("application/json", "image/png", "image/webp")
+
+
+def negotiate_image_type(accept: str | None) -> tuple[str | None, bool]:
+  """Choose a response type from an Accept header.
+
+  Returns `(mime_type, lossless)`; `mime_type` is None when JSON should be sent
+  (no header, `*/*`, or JSON preferred). `image/webp;lossless=1` requests
+  lossless WebP. Ties favour JSON, then PNG, to stay backward compatible.
+  """
+  if not accept:
+    return None, False
+
+  best_type, best_q, lossless = "application/json", -1.0, False
+  ranges = []
+  for entry in accept.split(","):
+    media, *params = [part.strip() for part in entry.split(";")]
+    options = dict(param.split("=", 1) for param in params if "=" in param)
+    try:
+      q = float(options.get("q", 1))
+    except ValueError:
+      q = 0.0
+    ranges.append((media.lower(), q, options))
+
+  for candidate in NEGOTIABLE_IMAGE_TYPES:
+    family = candidate.split("/")[0] + "/*"
+    matches = [r for r in ranges if r[0] == candidate] or [r for r in ranges if r[0] == family] or [
+      r for r in ranges if r[0] == "*/*"
+    ]
+    if not matches:
+      continue
+    media, q, options = max(matches, key=lambda r: r[1])
+    if q > best_q:
+      best_type, best_q = candidate, q
+      lossless = media == "image/webp" and options.get("lossless", "").lower() in ("1", "true")
+
+  if best_q <= 0 or best_type == "application/json":
+    return None, False
+  return best_type, lossless
+
+
 def clamp(value: float, min_value: float, max_value: float) -> float:
   return max(min_value, min(value, max_value))
 
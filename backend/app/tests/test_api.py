@@ -11,10 +11,14 @@ from ..config import get_settings
 from ..dependencies import (
   get_artwork_service,
   get_detection_service,
+  get_http_pool,
   get_image_gen_service,
+  get_image_worker_pool,
+  get_job_queue,
   get_text_service,
 )
 from ..main import create_app
+from ..models.common import DetectionBox, NormalizedBounds
 from ..services.errors import DetectionError
 
 
@@ -31,13 +35,18 @@ def client(tmp_path):
   os.environ["LOCAL_STORAGE_DIR"] = str(storage_dir)
   os.environ.pop("IMAGE_GEN_ENDPOINT", None)
   os.environ.pop("IMAGE_GEN_KEY", None)
+  # image work runs on threads here; the process pool is covered by its own test
+  os.environ["IMAGE_WORKER_PROCESSES"] = "0"
 
   # reset cached singletons to use the temp storage dir
   get_settings.cache_clear()
+  get_http_pool.cache_clear()
+  get_image_worker_pool.cache_clear()
   get_detection_service.cache_clear()
   get_text_service.cache_clear()
   get_artwork_service.cache_clear()
   get_image_gen_service.cache_clear()
+  get_job_queue.cache_clear()
 
   app = create_app()
   test_client = TestClient(app)
@@ -51,6 +60,16 @@ def test_health(client: TestClient):
   assert response.json() == {"status": "ok"}
 
 
+def test_http_pool_lifespan_reuses_and_closes_clients(client: TestClient):
+  pool = get_http_pool()
+  with client:
+    azure = pool.get("azure")
+    assert pool.get("azure") is azure
+    assert pool.get("llm") is not azure
+    assert not azure.is_closed
+  assert azure.is_closed
+
+
 def test_detect_fallback_boxes(client: TestClient):
   img_b64 = _make_base64_image()
   response = client.post("/detect", json={"image_base64": img_b64, "max_results": 3})
@@ -66,7 +85,7 @@ def test_detect_fallback_boxes(client: TestClient):
 
 def test_detect_error_mapping(client: TestClient):
   class FailingDetectionService:
-    async def detect(self, image_bytes, max_results):
+    async def detect(self, image_bytes, max_results, use_cache=True):
       raise DetectionError("unauthorized", "invalid key", status_code=401)
 
   client.app.dependency_overrides[get_detection_service] = lambda: FailingDetectionService()
@@ -122,6 +141,16 @@ def test_save_artwork_deterministic(client: TestClient):
     "box_bounds": {"x": 0.2, "y": 0.1, "width": 0.4, "height": 0.3},
   }
 
+  storage = get_artwork_service().storage_client
+  uploads = []
+  original_upload = storage.upload_image
+
+  async def counting_upload(filename, data, content_type="image/png"):
+    uploads.append(filename)
+    return await original_upload(filename, data, content_type)
+
+  storage.upload_image = counting_upload
+
   first = client.post("/save-artwork", json=payload)
   second = client.post("/save-artwork", json=payload)
 
@@ -132,6 +161,8 @@ def test_save_artwork_deterministic(client: TestClient):
   second_data = second.json()
 
   assert first_data["checksum"] == second_data["checksum"]
+  assert second_data["url"] == first_data["url"]
+  assert len(uploads) == 1
   filename = f"artwork-{first_data['checksum']}.png"
   stored_path = client.storage_dir / "images" / filename
   assert stored_path.exists()
@@ -148,3 +179,1158 @@ def test_save_artwork_deterministic(client: TestClient):
   items = list_response.json()["items"]
   assert len(items) >= 1
   assert items[0]["url"] == first_data["url"]
+
+
+def test_aliyun_client_reused_on_dedicated_pool(client: TestClient, monkeypatch):
+  from ..services import detection_service as detection_module
+
+  built = []
+
+  class FakeAliyunClient:
+    def __init__(self, access_key, access_secret, region, endpoint, executor=None):
+      built.append(self)
+      self.executor = executor
+
+    async def detect(self, image_bytes, image_width, image_height, max_results):
+      bounds = NormalizedBounds(x=0.1, y=0.1, width=0.5, height=0.5)
+      return await self.executor.run(lambda: [DetectionBox(id="cup", label="cup", bounds=bounds)])
+
+  monkeypatch.setattr(detection_module, "AliyunDetectionClient", FakeAliyunClient)
+  monkeypatch.setenv("ALIYUN_ACCESS_KEY_ID", "id")
+  monkeypatch.setenv("ALIYUN_ACCESS_KEY_SECRET", "secret")
+  get_settings.cache_clear()
+  get_detection_service.cache_clear()
+
+  img_b64 = _make_base64_image()
+  for _ in range(3):
+    response = client.post("/detect", json={"image_base64": img_b64, "max_results": 2, "use_cache": False})
+    assert response.status_code == 200
+
+  service = get_detection_service()
+  assert len(built) == 1
+  stats = service.aliyun_executor.stats()
+  assert stats["completed"] == 3
+  assert stats["queued"] == 0 and stats["active"] == 0
+  service.close()
+
+
+def test_detect_cache_hits_skip_detection(client: TestClient, monkeypatch):
+  service = get_detection_service()
+  calls = []
+  original = service._detect_uncached
+
+  async def counting(image_bytes, max_results):
+    calls.append(max_results)
+    return await original(image_bytes, max_results)
+
+  monkeypatch.setattr(service, "_detect_uncached", counting)
+  img_b64 = _make_base64_image()
+
+  first = client.post("/detect", json={"image_base64": img_b64, "max_results": 3})
+  second = client.post("/detect", json={"image_base64": img_b64, "max_results": 3})
+  assert first.json() == second.json()
+  assert calls == [3]
+
+  client.post("/detect", json={"image_base64": img_b64, "max_results": 2})
+  client.post("/detect", json={"image_base64": img_b64, "max_results": 3, "use_cache": False})
+  assert calls == [3, 2, 3]
+  assert service.cache.stats()["hits"] == 1
+
+
+def test_ttl_cache_expires_and_evicts_lru():
+  from ..services.cache import TTLCache
+
+  now = [0.0]
+  cache: TTLCache[str] = TTLCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+  cache.set("a", "A")
+  cache.set("b", "B")
+  assert cache.get("a") == "A"
+  cache.set("c", "C")
+  assert cache.get("b") is None
+  assert cache.stats()["evictions"] == 1
+
+  now[0] = 11.0
+  assert cache.get("a") is None
+  assert len(cache) == 1
+
+
+def test_single_flight_shares_results_errors_and_survives_cancel():
+  import asyncio
+
+  from ..services.singleflight import SingleFlight
+
+  async def scenario():
+    flight: SingleFlight[str] = SingleFlight()
+    started = []
+    release = asyncio.Event()
+
+    async def upstream():
+      started.append(1)
+      await release.wait()
+      return "done"
+
+    waiters = [asyncio.create_task(flight.run("k", upstream)) for _ in range(3)]
+    await asyncio.sleep(0)
+    waiters[0].cancel()
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters[1:])
+    assert results == ["done", "done"]
+    assert started == [1]
+    assert flight.stats() == {"inflight": 0, "calls": 1, "coalesced": 2}
+
+    async def failing():
+      await asyncio.sleep(0)
+      raise DetectionError("rate_limited", "busy", status_code=429)
+
+    outcomes = await asyncio.gather(flight.run("e", failing), flight.run("e", failing), return_exceptions=True)
+    assert all(isinstance(item, DetectionError) for item in outcomes)
+    assert flight.calls == 2
+
+  asyncio.run(scenario())
+
+
+def test_local_storage_append_log_recovers_and_compacts(tmp_path):
+  import asyncio
+  import json
+  from datetime import datetime, timezone
+
+  from ..clients.storage_client import LocalStorageClient
+  from ..models.common import ArtworkRecord
+
+  legacy = [{"id": "old", "user_id": "u", "url": "local://artworks/old.png", "created_at": "2024-01-01T00:00:00+00:00"}]
+  (tmp_path / "records.json").write_text(json.dumps(legacy), encoding="utf-8")
+
+  storage = LocalStorageClient(tmp_path)
+  record = ArtworkRecord(id="new", user_id="u", url="local://artworks/new.png", created_at=datetime.now(timezone.utc))
+  asyncio.run(storage.save_record(record))
+
+  log = tmp_path / "records.jsonl"
+  with log.open("ab") as handle:
+    handle.write(b'{"id": "torn", "user_')
+
+  reloaded = LocalStorageClient(tmp_path)
+  assert [r.id for r in asyncio.run(reloaded.list_records())] == ["new", "old"]
+  assert log.read_bytes().endswith(b"\n")
+
+  with log.open("a", encoding="utf-8") as handle:
+    handle.write("not json\n")
+  assert reloaded.compact() == 2
+  assert len(log.read_text(encoding="utf-8").splitlines()) == 2
+
+
+def test_artworks_cursor_pagination(client: TestClient):
+  import asyncio
+  from datetime import datetime, timedelta, timezone
+
+  from ..models.common import ArtworkRecord
+
+  storage = get_artwork_service().storage_client
+  start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+  for index in range(5):
+    record = ArtworkRecord(
+      id=f"art-{index}", user_id="u", url=f"local://artworks/{index}.png", created_at=start + timedelta(minutes=index)
+    )
+    asyncio.run(storage.save_record(record))
+
+  seen = []
+  cursor = None
+  while True:
+    params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+    data = client.get("/artworks", params=params).json()
+    seen.extend(item["id"] for item in data["items"])
+    cursor = data["next_cursor"]
+    if cursor is None:
+      break
+
+  assert seen == ["art-4", "art-3", "art-2", "art-1", "art-0"]
+  assert client.get("/artworks", params={"cursor": "@@bad"}).status_code == 400
+  naive = base64.urlsafe_b64encode(b'["2024-01-01T00:00:00","x"]').decode().rstrip("=")
+  assert client.get("/artworks", params={"cursor": naive}).json()["detail"]["code"] == "invalid_cursor"
+
+
+def test_artworks_filtered_by_user(client: TestClient):
+  import asyncio
+  from datetime import datetime, timedelta, timezone
+
+  from ..models.common import ArtworkRecord
+
+  storage = get_artwork_service().storage_client
+  start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+  for index in range(6):
+    user = "alice" if index % 2 == 0 else "bob"
+    record = ArtworkRecord(
+      id=f"art-{index}", user_id=user, url=f"local://artworks/{index}.png", created_at=start + timedelta(minutes=index)
+    )
+    asyncio.run(storage.save_record(record))
+
+  first = client.get("/artworks", params={"user_id": "alice", "limit": 2}).json()
+  assert [item["id"] for item in first["items"]] == ["art-4", "art-2"]
+  rest = client.get("/artworks", params={"user_id": "alice", "limit": 2, "cursor": first["next_cursor"]}).json()
+  assert [item["id"] for item in rest["items"]] == ["art-0"]
+  assert rest["next_cursor"] is None
+  assert client.get("/artworks", params={"user_id": "nobody"}).json()["items"] == []
+
+
+def test_supabase_storage_does_not_block_event_loop():
+  import asyncio
+  import time
+  from datetime import datetime, timezone
+
+  from ..clients.storage_client import SupabaseStorageClient
+  from ..models.common import ArtworkRecord
+
+  inserted = []
+
+  class SlowBucket:
+    def upload(self, filename, data, options):
+      time.sleep(0.2)
+
+    def get_public_url(self, filename):
+      return f"https://stand-in/{filename}"
+
+  class Insert:
+    def __init__(self, rows):
+      self.rows = rows
+
+    def execute(self):
+      inserted.append(self.rows)
+
+  class StandInSupabase:
+    class storage:
+      @staticmethod
+      def from_(bucket):
+        return SlowBucket()
+
+    def table(self, name):
+      return type("Table", (), {"insert": lambda _self, rows: Insert(rows)})()
+
+  storage = SupabaseStorageClient("", "", "artworks", "artworks", client=StandInSupabase())
+
+  async def scenario():
+    ticks = 0
+
+    async def ticker():
+      nonlocal ticks
+      while True:
+        await asyncio.sleep(0.01)
+        ticks += 1
+
+    ticking = asyncio.create_task(ticker())
+    url = await storage.upload_image("a.png", b"data")
+    ticking.cancel()
+    assert url == "https://stand-in/a.png"
+    assert ticks >= 5
+
+    now = datetime.now(timezone.utc)
+    records = [ArtworkRecord(id=f"r{i}", user_id="u", url="x", created_at=now) for i in range(3)]
+    await storage.save_records(records)
+    assert len(inserted) == 1 and len(inserted[0]) == 3
+
+  asyncio.run(scenario())
+  storage.close()
+
+
+def test_supabase_find_image_looks_up_once_and_memoizes():
+  import asyncio
+
+  from ..clients.storage_client import SupabaseStorageClient
+
+  uploads = []
+  lookups = []
+  # Stored by an earlier process (or another instance); not in this client's memo.
+  in_bucket = {"artwork-old.png"}
+
+  class Bucket:
+    def upload(self, filename, data, options):
+      assert options["upsert"] is True
+      uploads.append(filename)
+      in_bucket.add(filename)
+
+    def get_public_url(self, filename):
+      return f"https://stand-in/{filename}"
+
+    def exists(self, filename):
+      lookups.append(filename)
+      return filename in in_bucket
+
+  class StandInSupabase:
+    class storage:
+      @staticmethod
+      def from_(bucket):
+        return Bucket()
+
+  storage = SupabaseStorageClient("", "", "artworks", "artworks", client=StandInSupabase())
+
+  async def scenario():
+    assert await storage.find_image("artwork-abc.png") is None  # miss
+    url = await storage.upload_image("artwork-abc.png", b"data")
+    assert url == "https://stand-in/artwork-abc.png"
+    assert await storage.find_image("artwork-abc.png") == url  # memoized, no second upload
+    assert lookups == ["artwork-abc.png"]
+
+    # Stored but not yet memoized: one lookup instead of an upload, then memoized.
+    old = "https://stand-in/artwork-old.png"
+    assert await storage.find_image("artwork-old.png") == old
+    assert await storage.find_image("artwork-old.png") == old
+    assert lookups == ["artwork-abc.png", "artwork-old.png"]
+    assert uploads == ["artwork-abc.png"]
+
+  asyncio.run(scenario())
+  storage.close()
+
+
+def _make_png_bytes(color=(180, 120, 80), size=(64, 48)) -> bytes:
+  return base64.b64decode(_make_base64_image(color, size).split(",", 1)[1])
+
+
+def test_binary_upload_endpoints(client: TestClient, monkeypatch):
+  png = _make_png_bytes()
+
+  raw = client.post("/detect/upload?max_results=2", content=png, headers={"Content-Type": "image/png"})
+  assert raw.status_code == 200
+  assert raw.json()["image_size"] == {"width": 64, "height": 48}
+
+  multipart = client.post("/detect/upload", files={"image": ("photo.png", png, "image/png")})
+  assert multipart.status_code == 200
+
+  generated = client.post("/generate-image/upload?block_size=8", content=png, headers={"Content-Type": "image/png"})
+  assert generated.json()["image_base64"].startswith("data:image/png;base64,")
+
+  assert client.post("/detect/upload", content=b"{}", headers={"Content-Type": "application/json"}).status_code == 415
+
+  monkeypatch.setattr(get_settings(), "upload_max_bytes", 32)
+  monkeypatch.setattr(get_settings(), "upload_spool_bytes", 16)
+  too_large = client.post("/detect/upload", content=png, headers={"Content-Type": "image/png"})
+  assert too_large.status_code == 413
+  assert too_large.json()["detail"]["code"] == "image_too_large"
+
+
+def test_uploads_stop_reading_chunked_bodies_at_the_cap():
+  import asyncio
+
+  from starlette.requests import Request
+
+  from ..services.errors import UploadError
+  from ..services.uploads import read_image_upload
+
+  png = _make_png_bytes()
+  boundary = "upload-boundary"
+  form_body = (
+    f"--{boundary}\r\nContent-Disposition: form-data; name=\"image\"; filename=\"p.png\"\r\n"
+    "Content-Type: image/png\r\n\r\n"
+  ).encode() + png + f"\r\n--{boundary}--\r\n".encode()
+
+  async def upload(body: bytes, content_type: str, declared: int | None = None) -> tuple[str, int, int]:
+    # Chunked unless `declared`: without a Content-Length only the streaming cap can stop it.
+    chunks = [body[start : start + 8] for start in range(0, len(body), 8)]
+    pulled = 0
+
+    async def receive():
+      nonlocal pulled
+      pulled += 1
+      return {"type": "http.request", "body": chunks[pulled - 1], "more_body": pulled < len(chunks)}
+
+    headers = [(b"content-type", content_type.encode())]
+    if declared is not None:
+      headers.append((b"content-length", str(declared).encode()))
+    scope = {"type": "http", "method": "POST", "headers": headers}
+    try:
+      await read_image_upload(Request(scope, receive), max_bytes=32, spool_bytes=16)
+    except UploadError as exc:
+      return exc.code, pulled, len(chunks)
+    return "accepted", pulled, len(chunks)
+
+  for body, content_type in ((png, "image/png"), (form_body, f"multipart/form-data; boundary={boundary}")):
+    code, pulled, total = asyncio.run(upload(body, content_type))
+    assert code == "image_too_large"
+    assert pulled <= 7 < total  # stopped right after 48 bytes instead of reading the whole body
+
+  # A declared raw body over the image cap is refused unread; only multipart gets the framing slack.
+  assert asyncio.run(upload(png[:40], "image/png", declared=40))[:2] == ("image_too_large", 0)
+  assert asyncio.run(upload(png[:24], "image/png", declared=24))[:2] == ("accepted", 3)
+
+
+def test_save_artwork_multipart_matches_json(client: TestClient):
+  import json
+
+  png = _make_png_bytes()
+  metadata = {
+    "user_id": "user-1",
+    "label": {
+      "name": "咖啡杯",
+      "category": "杂物",
+      "description": "还留着一点余温。",
+      "energy": 10,
+      "health": 5,
+      "time": {"hour": 9, "minute": 5, "month": 6, "day": 1},
+      "tag_position": {"x_percent": 0.5, "y_percent": 0.5},
+    },
+  }
+
+  json_response = client.post("/save-artwork", json={**metadata, "base_image": _make_base64_image()})
+  upload_response = client.post(
+    "/save-artwork/upload",
+    files={"image": ("artwork.png", png, "image/png")},
+    data={"metadata": json.dumps(metadata)},
+  )
+  assert upload_response.status_code == 200
+  assert upload_response.json()["checksum"] == json_response.json()["checksum"]
+
+  invalid = client.post(
+    "/save-artwork/upload", files={"image": ("artwork.png", png, "image/png")}, data={"metadata": "{}"}
+  )
+  assert invalid.status_code == 422
+
+
+def test_image_generation_binary_response_modes(client: TestClient):
+  img_b64 = _make_base64_image()
+  body = {"image_base64": img_b64, "block_size": 8}
+
+  as_json = client.post("/generate-image", json=body, headers={"Accept": "application/json"})
+  png_from_json = base64.b64decode(as_json.json()["image_base64"].split(",", 1)[1])
+
+  png = client.post("/generate-image", json=body, headers={"Accept": "image/png"})
+  assert png.headers["content-type"] == "image/png"
+  assert png.content == png_from_json
+
+  webp = client.post("/generate-image", json=body, headers={"Accept": "image/webp"})
+  lossless = client.post("/generate-image", json=body, headers={"Accept": "image/webp;lossless=1"})
+  for response in (webp, lossless):
+    assert response.headers["content-type"] == "image/webp"
+    with Image.open(BytesIO(response.content)) as img:
+      assert img.format == "WEBP" and img.size == (64, 48)
+
+  with Image.open(BytesIO(lossless.content)) as img, Image.open(BytesIO(png.content)) as reference:
+    assert img.convert("RGB").tobytes() == reference.convert("RGB").tobytes()
+
+
+def test_detect_downscales_before_cloud_upload(client: TestClient, monkeypatch):
+  import httpx
+
+  monkeypatch.setenv("AZURE_CV_ENDPOINT", "https://azure.stand-in")
+  monkeypatch.setenv("AZURE_CV_KEY", "key")
+  monkeypatch.setenv("DETECT_UPLOAD_MAX_EDGE", "800")
+  get_settings.cache_clear()
+  get_detection_service.cache_clear()
+
+  sent = []
+
+  def handler(request: httpx.Request) -> httpx.Response:
+    sent.append(request.content)
+    with Image.open(BytesIO(request.content)) as img:
+      w, h = img.size
+    rect = {"x": w // 4, "y": h // 4, "w": w // 2, "h": h // 2}
+    return httpx.Response(200, json={"objects": [{"object": "cup", "confidence": 0.9, "rectangle": rect}]})
+
+  get_http_pool()._clients["azure"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+  img_b64 = _make_base64_image(size=(2000, 1500))
+  response = client.post("/detect", json={"image_base64": img_b64, "max_results": 1})
+  assert response.status_code == 200
+  data = response.json()
+  assert data["image_size"] == {"width": 2000, "height": 1500}
+  assert data["boxes"][0]["bounds"] == {"x": 0.25, "y": 0.25, "width": 0.5, "height": 0.5}
+
+  with Image.open(BytesIO(sent[0])) as img:
+    assert img.format == "JPEG"
+    assert img.size == (800, 600)
+
+
+def test_pixel_art_engine_blocks_and_palette():
+  import numpy as np
+
+  from ..services.pixel_art import STARDEW_PALETTE, block_average, pixelate
+
+  pixels = np.zeros((4, 4, 3), dtype=np.uint8)
+  pixels[:2, :2] = 100
+  pixels[:2, 2:] = [0, 200, 0]
+  averaged = block_average(pixels, 2)
+  assert averaged.shape == (2, 2, 3)
+  assert averaged[0, 0].tolist() == [100, 100, 100]
+  assert averaged[1, 1].tolist() == [0, 0, 0]
+
+  gradient = np.linspace(0, 255, 90 * 60 * 3, dtype=np.float32).reshape(60, 90, 3).astype(np.uint8)
+  source = Image.fromarray(gradient)
+  palette = {tuple(color) for color in STARDEW_PALETTE}
+  for options in ({}, {"dither": True}, {"outline_edges": True}):
+    result = pixelate(source, 6, **options)
+    assert result.size == source.size
+    colors = {tuple(color) for color in np.asarray(result).reshape(-1, 3).tolist()}
+    assert colors <= palette
+
+  tiles = np.asarray(pixelate(source, 6)).reshape(10, 6, 15, 6, 3)
+  assert (tiles == tiles[:, :1, :, :1]).all()
+
+
+def test_compose_reuses_chrome_sprites_and_text_layouts():
+  from ..models.common import LabelPayload
+  from ..services import image_service as compose_module
+
+  for cache in (compose_module.layout_text, compose_module.tag_chrome, compose_module.time_chip_chrome):
+    cache.cache_clear()
+
+  service = compose_module.ImageService()
+  buf = BytesIO()
+  Image.new("RGB", (800, 600), (40, 90, 160)).save(buf, format="PNG")
+  label = {
+    "name": "铜壶",
+    "category": "物品",
+    "description": "一只被擦得发亮的铜壶。" * 4,
+    "energy": 0,
+    "health": 0,
+    "time": {"hour": 15, "minute": 45, "month": 7, "day": 2},
+    "tag_position": {"x_percent": 0.3, "y_percent": 0.7},
+    "tag_scale": 1.2,
+  }
+
+  first = service.compose(buf.getvalue(), LabelPayload.model_validate(label), None)
+  second = service.compose(buf.getvalue(), LabelPayload.model_validate(label), None)
+  later = service.compose(buf.getvalue(), LabelPayload.model_validate({**label, "time": {**label["time"], "minute": 10}}), None)
+
+  assert first == second
+  assert later != first
+  assert compose_module.tag_chrome.cache_info().hits == 2
+  assert compose_module.time_chip_chrome.cache_info().hits == 2
+  assert compose_module.layout_text.cache_info().hits == 2
+  with Image.open(BytesIO(first)) as img:
+    assert img.size == (800, 600)
+    assert img.getpixel((799 - 12 - 90, 12 + 37))[:3] != (40, 90, 160)
+
+
+def test_save_artwork_encoding_profiles(client: TestClient):
+  payload = {
+    "user_id": "user-enc",
+    "base_image": _make_base64_image(size=(96, 64)),
+    "label": {
+      "name": "木椅",
+      "category": "物品",
+      "description": "结实的小木椅。",
+      "energy": 0,
+      "health": 0,
+      "time": {"hour": 9, "minute": 5, "month": 5, "day": 1},
+      "tag_position": {"x_percent": 0.5, "y_percent": 0.5},
+    },
+  }
+
+  png = client.post("/save-artwork", json=payload)
+  webp = client.post("/save-artwork", json={**payload, "encoding_profile": "webp-lossless"})
+  fast = client.post("/save-artwork", json={**payload, "encoding_profile": "png-fast"})
+  assert png.status_code == webp.status_code == fast.status_code == 200
+
+  assert webp.json()["url"].endswith(".webp")
+  with Image.open(client.storage_dir / "images" / f"artwork-{webp.json()['checksum']}.webp") as img:
+    assert img.format == "WEBP"
+    assert img.size == (96, 64)
+
+  with Image.open(client.storage_dir / "images" / f"artwork-{png.json()['checksum']}.png") as a, Image.open(
+    client.storage_dir / "images" / f"artwork-{fast.json()['checksum']}.png"
+  ) as b:
+    assert a.tobytes() == b.tobytes()
+
+  assert client.post("/save-artwork", json={**payload, "encoding_profile": "gif"}).status_code == 422
+
+
+def test_image_worker_pool_runs_tasks_in_processes_and_bounds_backlog():
+  import asyncio
+
+  from ..services import image_tasks
+  from ..services.errors import ImageGenerationError, WorkerPoolBusyError
+  from ..services.executors import ImageWorkerPool
+
+  pool = ImageWorkerPool("test-images", processes=1, max_queue=0)
+  pool.start()
+  png = _make_png_bytes(size=(120, 80))
+
+  async def scenario():
+    first, second = await asyncio.gather(
+      pool.run(image_tasks.pixelate_image, png, 8, True, False, False),
+      pool.run(image_tasks.pixelate_image, png, 8, True, False, False),
+      return_exceptions=True,
+    )
+    with Image.open(BytesIO(first)) as img:
+      assert img.size == (120, 80)
+    assert isinstance(second, WorkerPoolBusyError) and second.status_code == 503
+
+    size = await pool.run(image_tasks.prepare_detection_image, png, False, 1600, 85, 1_500_000)
+    assert size[:2] == (120, 80) and size[2] == png
+
+    with pytest.raises(ImageGenerationError) as excinfo:
+      await pool.run(image_tasks.pixelate_image, b"not an image", 8, True, False, False)
+    assert excinfo.value.code == "invalid_image"
+
+  try:
+    asyncio.run(scenario())
+  finally:
+    pool.shutdown()
+  assert pool.stats()["rejected"] == 1
+
+
+def test_batch_endpoints_bound_concurrency_and_report_item_errors(client: TestClient, monkeypatch):
+  import asyncio
+  import json
+
+  monkeypatch.setattr(get_settings(), "batch_concurrency", 2)
+  service = get_detection_service()
+  original = service._detect_uncached
+  active = peak = 0
+
+  async def tracking(image_bytes, max_results):
+    nonlocal active, peak
+    active += 1
+    peak = max(peak, active)
+    await asyncio.sleep(0.01)
+    active -= 1
+    return await original(image_bytes, max_results)
+
+  monkeypatch.setattr(service, "_detect_uncached", tracking)
+  items = [{"image_base64": _make_base64_image(color=(i * 40, 80, 80)), "max_results": 1} for i in range(5)]
+  items.insert(2, {"image_base64": "data:image/png;base64,@@@"})
+
+  response = client.post("/detect/batch", json={"items": items})
+  assert response.status_code == 200
+  results = response.json()["results"]
+  assert [r["index"] for r in results] == list(range(6))
+  assert results[2]["result"] is None and results[2]["error"]["status_code"] == 400
+  assert all(len(r["result"]["boxes"]) == 1 for i, r in enumerate(results) if i != 2)
+  assert peak == 2
+
+  streamed = client.post(
+    "/generate-text/batch",
+    json={"items": [{"object_name": "铜壶"}, {"object_name": "木椅", "category": "家具"}]},
+    headers={"Accept": "application/x-ndjson"},
+  )
+  assert streamed.headers["content-type"].startswith("application/x-ndjson")
+  lines = [json.loads(line) for line in streamed.text.splitlines()]
+  assert sorted(line["index"] for line in lines) == [0, 1]
+  assert "木椅" in next(line for line in lines if line["index"] == 1)["result"]["description"]
+
+  assert client.post("/generate-text/batch", json={"items": []}).status_code == 422
+
+
+def test_text_generation_cache_serves_variants_without_llm(client: TestClient, monkeypatch):
+  import httpx
+
+  monkeypatch.setenv("TEXT_GEN_ENDPOINT", "https://llm.stand-in/v1")
+  monkeypatch.setenv("TEXT_GEN_KEY", "key")
+  monkeypatch.setenv("TEXT_CACHE_VARIANTS", "2")
+  get_settings.cache_clear()
+  get_text_service.cache_clear()
+
+  calls = []
+
+  def handler(request: httpx.Request) -> httpx.Response:
+    calls.append(request)
+    if "茶壶" in request.content.decode():
+      return httpx.Response(400, json={"error": "bad request"})
+    return httpx.Response(200, json={"description": f"第{len(calls)}个咖啡杯故事。"})
+
+  get_http_pool()._clients["llm"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+  seen = set()
+  for name in ("咖啡杯", " 咖啡杯 ", "咖啡杯", "咖啡杯", "咖啡杯"):
+    response = client.post("/generate-text", json={"object_name": name, "category": "杂物"})
+    assert response.status_code == 200
+    seen.add(response.json()["description"])
+
+  assert len(calls) == 2
+  assert seen == {"第1个咖啡杯故事。", "第2个咖啡杯故事。"}
+
+  stats = client.get("/health/caches").json()["text"]
+  assert stats["llm_calls"] == 2 and stats["served_from_cache"] == 3
+  assert stats["served_ratio"] == 0.6
+  # A key still collecting variants is a miss, not a hit.
+  assert stats["hits"] == 3 and stats["misses"] == 2 and stats["hit_ratio"] == 0.6
+
+  # A failed upstream call falls back to the template and is not counted as an LLM call.
+  response = client.post("/generate-text", json={"object_name": "茶壶", "category": "杂物"})
+  assert response.status_code == 200
+  stats = client.get("/health/caches").json()["text"]
+  assert stats["llm_calls"] == 2 and stats["llm_failures"] == 1
+  assert stats["served_ratio"] == 0.5 and stats["hit_ratio"] == 0.5
+
+
+def test_generate_text_streams_sse_and_stops_after_two_sentences(client: TestClient, monkeypatch):
+  import json
+
+  import httpx
+
+  monkeypatch.setenv("TEXT_GEN_ENDPOINT", "https://llm.stand-in/v1")
+  monkeypatch.setenv("TEXT_GEN_KEY", "key")
+  get_settings.cache_clear()
+  get_text_service.cache_clear()
+
+  deltas = ["\n铜壶", "闪着光。它", "记得每个", "清晨。", "第三句不该出现。"]
+  sent = []
+
+  async def upstream():
+    for delta in deltas:
+      sent.append(delta)
+      yield f"data: {json.dumps({'choices': [{'delta': {'content': delta}}]}, ensure_ascii=False)}\n\n".encode()
+    yield b"data: [DONE]\n\n"
+
+  def handler(request: httpx.Request) -> httpx.Response:
+    assert json.loads(request.content)["stream"] is True
+    return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=upstream())
+
+  get_http_pool()._clients["llm"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+  response = client.post("/generate-text", json={"object_name": "铜壶"}, headers={"Accept": "text/event-stream"})
+  assert response.status_code == 200
+  assert response.headers["content-type"].startswith("text/event-stream")
+
+  events = [block for block in response.text.split("\n\n") if block]
+  pieces = [json.loads(block.removeprefix("data: "))["delta"] for block in events[:-1]]
+  assert events[-1].startswith("event: done\n")
+  done = json.loads(events[-1].split("data: ", 1)[1])
+  assert "".join(pieces) == done["description"] == "铜壶闪着光。它记得每个清晨。"
+  assert deltas[-1] not in sent
+  assert get_text_service().cache_stats()["size"] == 1
+
+
+def test_hedged_router_prefers_fast_provider_and_cancels_loser():
+  import asyncio
+
+  from ..services.provider_router import DetectionProvider, HedgedDetectionRouter
+
+  box = DetectionBox(id="cup", label="cup", bounds=NormalizedBounds(x=0.1, y=0.1, width=0.5, height=0.5))
+  cancelled = []
+
+  def stub(name, delay, fail=False):
+    async def detect(image_bytes, width, height, max_results):
+      try:
+        await asyncio.sleep(delay)
+      except asyncio.CancelledError:
+        cancelled.append(name)
+        raise
+      if fail:
+        raise DetectionError(f"{name}_error", "失败", status_code=502)
+      return [box.model_copy(update={"id": name})]
+
+    return DetectionProvider(name, detect)
+
+  async def scenario():
+    slow_first = HedgedDetectionRouter(
+      [stub("slow", 0.5), stub("fast", 0.01)], default_hedge_delay=0.05, min_hedge_delay=0.01, min_samples=3
+    )
+    result = await slow_first.detect(b"img", 10, 10, 1)
+    assert result[0].id == "fast"
+    await asyncio.sleep(0)
+    assert cancelled == ["slow"]
+    assert slow_first.hedges == 1 and slow_first.hedge_wins == 1
+
+    for _ in range(3):
+      await slow_first.detect(b"img", 10, 10, 1)
+    assert [p.name for p in slow_first.ranked()][0] == "fast"
+
+    failing = HedgedDetectionRouter([stub("broken", 0.0, fail=True), stub("backup", 0.01)], default_hedge_delay=5)
+    assert (await failing.detect(b"img", 10, 10, 1))[0].id == "backup"
+    assert failing.trackers["broken"].error_rate() == 1.0
+
+    all_down = HedgedDetectionRouter([stub("a", 0.0, fail=True), stub("b", 0.0, fail=True)])
+    with pytest.raises(DetectionError):
+      await all_down.detect(b"img", 10, 10, 1)
+
+  asyncio.run(scenario())
+
+
+def test_resilient_transport_retries_throttles_and_breaks():
+  import asyncio
+
+  import httpx
+
+  from ..clients.resilience import ResilientTransport, UpstreamGuard
+
+  async def scenario():
+    answers = [httpx.Response(429, headers={"Retry-After": "0"}), httpx.Response(200, json={"ok": True})]
+    retried = UpstreamGuard("retry", retry_base_delay=0.001, initial_concurrency=4)
+    async with httpx.AsyncClient(
+      transport=ResilientTransport(httpx.MockTransport(lambda request: answers.pop(0)), retried)
+    ) as http:
+      response = await http.post("https://upstream.stand-in/", json={"a": 1})
+    assert response.status_code == 200
+    assert retried.retries == 1 and retried.calls == 2
+    assert retried.limiter.limit < 4 and retried.limiter.in_flight == 0
+
+    hits = []
+
+    def throttled_upstream(request):
+      hits.append(request)
+      return httpx.Response(429, headers={"Retry-After": "60"})
+
+    throttled = UpstreamGuard("throttled", retry_max_delay=1.0)
+    async with httpx.AsyncClient(transport=ResilientTransport(httpx.MockTransport(throttled_upstream), throttled)) as http:
+      first = await http.post("https://upstream.stand-in/")
+      second = await http.post("https://upstream.stand-in/")
+    assert first.status_code == second.status_code == 429
+    assert len(hits) == 1 and throttled.rejected == 1
+    assert throttled.stats()["state"] == "open"
+
+    broken = UpstreamGuard("broken", max_attempts=1, failure_threshold=2, reset_seconds=60)
+    async with httpx.AsyncClient(
+      transport=ResilientTransport(httpx.MockTransport(lambda request: httpx.Response(500)), broken)
+    ) as http:
+      statuses = [(await http.get("https://upstream.stand-in/")).status_code for _ in range(4)]
+    assert statuses == [500, 500, 503, 503]
+    assert broken.calls == 2 and broken.breaker.opened == 1
+
+  asyncio.run(scenario())
+
+
+def test_resilient_transport_cancelled_probe_frees_the_half_open_slot():
+  import asyncio
+
+  import httpx
+
+  from ..clients.resilience import ResilientTransport, UpstreamGuard
+
+  now = [0.0]
+  started = asyncio.Event()
+
+  async def hanging_upstream(request):
+    started.set()
+    await asyncio.sleep(60)
+    return httpx.Response(200)
+
+  async def scenario():
+    guard = UpstreamGuard("probe", max_attempts=1, failure_threshold=1, reset_seconds=5, clock=lambda: now[0])
+    guard.breaker.record_failure()
+    now[0] = 10.0
+    async with httpx.AsyncClient(transport=ResilientTransport(httpx.MockTransport(hanging_upstream), guard)) as http:
+      probe = asyncio.ensure_future(http.get("https://upstream.stand-in/"))
+      await started.wait()
+      assert guard.breaker.allow() == 1.0  # one probe at a time
+      probe.cancel()
+      await asyncio.gather(probe, return_exceptions=True)
+
+    # Still half-open, and the next call gets to probe instead of being refused forever.
+    assert guard.breaker.state == "half_open"
+    assert guard.breaker.allow() is None
+    assert guard.limiter.in_flight == 0
+
+  asyncio.run(scenario())
+
+
+def test_image_generation_budget_returns_local_then_cached_remote(client: TestClient, monkeypatch):
+  import asyncio
+  import time
+
+  monkeypatch.setenv("IMAGE_GEN_ENDPOINT", "https://gemini.stand-in")
+  monkeypatch.setenv("IMAGE_GEN_KEY", "key")
+  monkeypatch.setenv("IMAGE_GEN_LATENCY_BUDGET", "0.05")
+  get_settings.cache_clear()
+  get_image_gen_service.cache_clear()
+
+  service = get_image_gen_service()
+  remote_image = _make_base64_image(color=(10, 200, 30))
+  calls = []
+
+  async def slow_remote(image_bytes, prompt):
+    calls.append(prompt)
+    await asyncio.sleep(0.3)
+    return remote_image
+
+  monkeypatch.setattr(service, "_call_remote_model", slow_remote)
+  payload = {"image_base64": _make_base64_image(), "block_size": 8}
+
+  with client:
+    started = time.perf_counter()
+    first = client.post("/generate-image", json=payload)
+    assert time.perf_counter() - started < 0.3
+    assert first.json()["image_base64"] != remote_image
+
+    deadline = time.time() + 5
+    while service.remote_cache.stats()["size"] == 0 and time.time() < deadline:
+      time.sleep(0.02)
+
+    second = client.post("/generate-image", json=payload)
+    assert second.json()["image_base64"] == remote_image
+
+  assert len(calls) == 1
+  assert service.late_results == 1
+
+
+def test_image_jobs_run_by_priority_on_sqlite_store(client: TestClient, monkeypatch, tmp_path):
+  import asyncio
+  import time
+
+  from ..clients.job_store import QUEUED, JobRecord, SQLiteJobStore
+
+  async def claim_order() -> list[str]:
+    store = SQLiteJobStore(tmp_path / "order.sqlite3")
+    try:
+      for index, priority in enumerate([0, 5, 0, 9]):
+        await store.add(JobRecord(f"job-{index}", QUEUED, priority, index, index, b"img", None, 10))
+      claimed = [await store.claim_next(10.0) for _ in range(5)]
+      assert await store.count_queued() == 0
+      return [job.id if job else None for job in claimed]
+    finally:
+      store.close()
+
+  assert asyncio.run(claim_order()) == ["job-3", "job-1", "job-0", "job-2", None]
+
+  monkeypatch.setenv("IMAGE_JOB_BACKEND", "sqlite")
+  monkeypatch.setenv("IMAGE_JOB_SQLITE_PATH", str(tmp_path / "jobs.sqlite3"))
+  get_settings.cache_clear()
+  get_job_queue.cache_clear()
+
+  with client:
+    submitted = client.post("/generate-image/jobs", json={"image_base64": _make_base64_image(), "priority": 3})
+    assert submitted.status_code == 202
+    job_id = submitted.json()["id"]
+    assert submitted.headers["location"].endswith(f"/generate-image/jobs/{job_id}")
+
+    deadline = time.time() + 5
+    job = submitted.json()
+    while job["status"] in ("queued", "running") and time.time() < deadline:
+      time.sleep(0.02)
+      job = client.get(f"/generate-image/jobs/{job_id}").json()
+
+    assert job["status"] == "succeeded" and job["priority"] == 3 and job["expires_at"]
+    assert job["image_base64"].startswith("data:image/png;base64,")
+    assert client.get("/generate-image/jobs/unknown").status_code == 404
+
+
+def test_metrics_exposes_route_histograms_fallbacks_and_service_stats(client: TestClient):
+  from prometheus_client.parser import text_string_to_metric_families
+
+  assert client.post("/generate-text", json={"object_name": "铜壶"}).status_code == 200
+  assert client.post("/generate-image", json={"image_base64": _make_base64_image()}).status_code == 200
+  assert client.get("/does-not-exist").status_code == 404
+
+  response = client.get("/metrics")
+  assert response.status_code == 200
+  assert response.headers["content-type"].startswith("text/plain")
+  samples = {
+    (sample.name, frozenset(sample.labels.items())): sample.value
+    for family in text_string_to_metric_families(response.text)
+    for sample in family.samples
+  }
+
+  def value(name: str, **labels: str) -> float | None:
+    return samples.get((name, frozenset(labels.items())))
+
+  assert value(
+    "http_request_duration_seconds_count", router="text_gen", route="/generate-text", method="POST", status="200"
+  )
+  assert value("http_request_duration_seconds_count", router="none", route="unmatched", method="GET", status="404")
+  assert value("fallbacks_total", kind="text_template") >= 1
+  assert value("fallbacks_total", kind="image_local_pixelation") >= 1
+  assert value("image_bytes_count", kind="generate_output") >= 1
+  assert value("upstream_state", upstream="gemini", state="closed") == 1.0
+  assert value("cache_size", cache="image_gen") is not None
+  assert value("image_workers_completed") >= 1
+
+
+def test_server_timing_reports_save_artwork_stages(client: TestClient, monkeypatch):
+  payload = {
+    "user_id": "user-1",
+    "base_image": _make_base64_image(),
+    "label": {
+      "name": "铜壶",
+      "category": "杂物",
+      "description": "壶嘴还冒着热气。",
+      "energy": 10,
+      "health": 5,
+      "time": {"hour": 7, "minute": 45, "month": 2, "day": 9},
+      "tag_position": {"x_percent": 0.5, "y_percent": 0.5},
+    },
+  }
+  assert "server-timing" not in client.post("/save-artwork", json=payload).headers
+
+  monkeypatch.setenv("SERVER_TIMING_ENABLED", "true")
+  get_settings.cache_clear()
+  timed = TestClient(create_app())
+  response = timed.post("/save-artwork", json={**payload, "user_id": "user-2"})
+  assert response.status_code == 200
+
+  stages = dict(entry.split(";dur=") for entry in response.headers["server-timing"].split(", "))
+  for name in ("decode", "image_worker", "compose", "encode", "sha256", "find_image", "save_record", "total"):
+    assert float(stages[name]) >= 0
+  assert float(stages["compose"]) + float(stages["encode"]) <= float(stages["image_worker"]) + 0.2  # rounding
+
+
+def test_image_jobs_wait_for_slow_remote_model(client: TestClient, monkeypatch):
+  import asyncio
+  import time
+
+  monkeypatch.setenv("IMAGE_GEN_ENDPOINT", "https://gemini.stand-in")
+  monkeypatch.setenv("IMAGE_GEN_KEY", "key")
+  monkeypatch.setenv("IMAGE_GEN_LATENCY_BUDGET", "0.05")
+  get_settings.cache_clear()
+  get_image_gen_service.cache_clear()
+  get_job_queue.cache_clear()
+
+  service = get_image_gen_service()
+  remote_image = _make_base64_image(color=(10, 200, 30))
+
+  async def slow_remote(image_bytes, prompt):
+    await asyncio.sleep(0.3)
+    return remote_image
+
+  monkeypatch.setattr(service, "_call_remote_model", slow_remote)
+
+  with client:
+    job_id = client.post("/generate-image/jobs", json={"image_base64": _make_base64_image()}).json()["id"]
+    deadline = time.time() + 5
+    job = client.get(f"/generate-image/jobs/{job_id}").json()
+    while job["status"] in ("queued", "running") and time.time() < deadline:
+      time.sleep(0.02)
+      job = client.get(f"/generate-image/jobs/{job_id}").json()
+
+  assert job["status"] == "succeeded"
+  assert job["image_base64"] == remote_image
+  assert service.late_results == 0  # the job waited for it
+
+
+def test_image_jobs_interrupted_or_orphaned_are_requeued(tmp_path):
+  import asyncio
+
+  from ..clients.job_store import QUEUED, RUNNING, JobRecord, MemoryJobStore, SQLiteJobStore
+  from ..services.job_queue import JobQueue
+
+  class HangingService:
+    async def generate_image(self, *args, **kwargs):
+      await asyncio.Event().wait()
+
+  async def interrupted(store) -> str:
+    queue = JobQueue(store, HangingService(), workers=1)
+    queue.start()
+    job = await queue.submit(b"img")
+    while (await store.get(job.id)).status != RUNNING:
+      await asyncio.sleep(0.01)
+    await queue.stop()
+    return job.id
+
+  memory = MemoryJobStore()
+  job_id = asyncio.run(interrupted(memory))
+  assert asyncio.run(memory.get(job_id)).status == QUEUED
+  assert asyncio.run(memory.claim_next(1.0)).id == job_id
+
+  async def orphaned() -> list[str | None]:
+    store = SQLiteJobStore(tmp_path / "jobs.sqlite3")
+    try:
+      await store.add(JobRecord("crashed", RUNNING, 0, 1.0, 1.0, b"img", None, 10))
+      await store.add(JobRecord("fresh", RUNNING, 0, 1.0, 50.0, b"img", None, 10))
+      assert await store.requeue_stale(before=10.0, now=60.0) == 1
+      return [job.id if job else None for job in [await store.claim_next(61.0), await store.claim_next(61.0)]]
+    finally:
+      store.close()
+
+  assert asyncio.run(orphaned()) == ["crashed", None]
+
+
+def test_image_job_callbacks_are_allowlisted_and_use_the_pool(client: TestClient, monkeypatch):
+  import json
+  import time
+
+  import httpx
+
+  from ..clients.http_pool import CALLBACK
+
+  monkeypatch.setenv("IMAGE_JOB_CALLBACK_HOSTS", '[".hooks.stand-in"]')
+  get_settings.cache_clear()
+  get_http_pool.cache_clear()
+  get_job_queue.cache_clear()
+
+  received = []
+
+  def handler(request: httpx.Request) -> httpx.Response:
+    received.append((str(request.url), json.loads(request.content)))
+    return httpx.Response(204)
+
+  get_http_pool()._clients[CALLBACK] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+  payload = {"image_base64": _make_base64_image()}
+
+  with client:
+    for url in ("http://169.254.169.254/latest/meta-data", "https://hooks.stand-in.evil/x", "file:///etc/passwd"):
+      rejected = client.post("/generate-image/jobs", json={**payload, "callback_url": url})
+      assert rejected.status_code in (400, 422)
+      if rejected.status_code == 400:
+        assert rejected.json()["detail"]["code"] == "callback_not_allowed"
+
+    accepted = client.post("/generate-image/jobs", json={**payload, "callback_url": "https://app.hooks.stand-in/done"})
+    assert accepted.status_code == 202
+    deadline = time.time() + 5
+    while not received and time.time() < deadline:
+      time.sleep(0.02)
+
+  assert received[0][0] == "https://app.hooks.stand-in/done"
+  assert received[0][1]["id"] == accepted.json()["id"] and received[0][1]["status"] == "succeeded"
+
+
+def test_artwork_encoding_profile_setting_is_validated(monkeypatch):
+  from typing import get_args
+
+  from pydantic import ValidationError
+
+  from ..config import Settings
+  from ..models.artwork import EncodingProfileName
+  from ..services.image_service import ENCODING_PROFILES
+
+  assert set(get_args(EncodingProfileName)) == set(ENCODING_PROFILES)
+  monkeypatch.setenv("ARTWORK_ENCODING_PROFILE", "webp-lossles")
+  with pytest.raises(ValidationError):
+    Settings()
+
+
+def test_image_generation_close_cancels_background_remote_calls():
+  import asyncio
+
+  from ..config import Settings
+  from ..services.image_gen_service import ImageGenerationService
+
+  async def scenario() -> None:
+    service = ImageGenerationService(
+      Settings(image_gen_endpoint="https://gemini.stand-in", image_gen_key="key", image_gen_latency_budget=0.01)
+    )
+
+    async def hanging_remote(image_bytes, prompt):
+      await asyncio.Event().wait()
+
+    service._call_remote_model = hanging_remote
+    generated = await service.generate_image(base64.b64decode(_make_base64_image().split(",", 1)[1]))
+    assert generated.mime_type == "image/png"
+    task = next(iter(service._remote_calls.values()))
+    await service.aclose()
+    assert task.cancelled() and not service._remote_calls and service.late_results == 0
+
+  asyncio.run(scenario())
+
+
+def test_server_timing_times_remote_wait_on_the_caller_side(client: TestClient, monkeypatch):
+  import asyncio
+  import threading
+
+  monkeypatch.setenv("IMAGE_GEN_ENDPOINT", "https://gemini.stand-in")
+  monkeypatch.setenv("IMAGE_GEN_KEY", "key")
+  monkeypatch.setenv("IMAGE_GEN_LATENCY_BUDGET", "0.05")
+  monkeypatch.setenv("SERVER_TIMING_ENABLED", "true")
+  get_settings.cache_clear()
+  get_image_gen_service.cache_clear()
+  service = get_image_gen_service()
+
+  async def slow_remote(image_bytes, prompt):
+    await asyncio.sleep(0.3)
+    return _make_base64_image(color=(10, 200, 30))
+
+  monkeypatch.setattr(service, "_call_remote_model", slow_remote)
+  payload = {"image_base64": _make_base64_image(color=(1, 2, 3)), "block_size": 8}
+  responses = []
+
+  def post() -> None:
+    responses.append(timed.post("/generate-image", json=payload))
+
+  with TestClient(create_app()) as timed:
+    threads = [threading.Thread(target=post) for _ in range(2)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+  timings = [dict(entry.split(";dur=") for entry in r.headers["server-timing"].split(", ")) for r in responses]
+  # Whether a request ran the race or joined one in flight, it reports its own wait,
+  # and the remote wait is bounded by the budget rather than the 300 ms model call.
+  for stages in timings:
+    assert "coalesced_wait" in stages or float(stages["remote_model"]) < 300
+  assert any("remote_model" in stages and "pixelate" in stages for stages in timings)
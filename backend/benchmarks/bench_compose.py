@@ -0,0 +1,72 @@
+"""Per-artwork compose time with cold and warm chrome/text-layout caches.
+
+Run from `backend/`: python -m benchmarks.bench_compose [--repeat N]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from app.models.common import LabelPayload
+from app.services import image_service
+from app.services.image_service import ImageService
+
+SIZES = {"640x480": (640, 480), "1MP": (1152, 864), "4MP": (2304, 1728)}
+CACHES = (image_service.layout_text, image_service.tag_chrome, image_service.time_chip_chrome, image_service.coin_chip)
+
+
+def _label(scale: float) -> LabelPayload:
+  return LabelPayload.model_validate(
+    {
+      "name": "暖黄色吊灯",
+      "category": "菜品",
+      "description": "带着暖暖香气，像刚出炉的面包。" * 3,
+      "energy": 80,
+      "health": 40,
+      "time": {"hour": 8, "minute": 20, "month": 3, "day": 14},
+      "tag_position": {"x_percent": 0.5, "y_percent": 0.6},
+      "tag_scale": scale,
+    }
+  )
+
+
+def _png(size: tuple[int, int]) -> bytes:
+  buffer = BytesIO()
+  Image.new("RGB", size, (180, 120, 80)).save(buffer, format="PNG")
+  return buffer.getvalue()
+
+
+def _time(fn, repeat: int) -> float:
+  best = float("inf")
+  for _ in range(repeat):
+    start = time.perf_counter()
+    fn()
+    best = min(best, time.perf_counter() - start)
+  return best
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--repeat", type=int, default=20)
+  args = parser.parse_args()
+
+  service = ImageService()
+  label = _label(1.0)
+  print(f"{'size':>8}  {'cold ms':>8} {'warm ms':>8}")
+  for name, size in SIZES.items():
+    data = _png(size)
+
+    def cold() -> None:
+      for cache in CACHES:
+        cache.cache_clear()
+      service.compose(data, label, None)
+
+    warm = _time(lambda: service.compose(data, label, None), args.repeat)
+    print(f"{name:>8}  {_time(cold, args.repeat) * 1000:8.2f} {warm * 1000:8.2f}")
+
+
+if __name__ == "__main__":
+  main()
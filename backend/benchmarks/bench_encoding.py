@@ -0,0 +1,56 @@
+"""Encode latency vs. output size for each artwork encoding profile.
+
+Run from `backend/`: python -m benchmarks.bench_encoding [--repeat N]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from app.services.errors import ImageGenerationError
+from app.services.image_service import ENCODING_PROFILES, get_encoding_profile
+from app.services.pixel_art import pixelate
+
+SIZE = (1152, 864)
+
+
+def _photo_like() -> Image.Image:
+  width, height = SIZE
+  rng = np.random.default_rng(0)
+  y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+  base = np.stack([x / width * 255, y / height * 255, (x + y) / (width + height) * 255], axis=-1)
+  noise = rng.normal(0, 18, size=base.shape).astype(np.float32)
+  return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8)).convert("RGBA")
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--repeat", type=int, default=3)
+  args = parser.parse_args()
+
+  photo = _photo_like()
+  sources = {"photo": photo, "pixel-art": pixelate(photo, 10).convert("RGBA")}
+  print(f"{'content':<10} {'profile':<14} {'ms':>8} {'KiB':>8}")
+  for content, image in sources.items():
+    for name in ENCODING_PROFILES:
+      try:
+        profile = get_encoding_profile(name)
+      except ImageGenerationError:
+        print(f"{content:<10} {name:<14} {'unsupported':>17}")
+        continue
+      best, size = float("inf"), 0
+      for _ in range(args.repeat):
+        buffer = BytesIO()
+        start = time.perf_counter()
+        image.save(buffer, format=profile.format, **profile.options)
+        best = min(best, time.perf_counter() - start)
+        size = buffer.tell()
+      print(f"{content:<10} {name:<14} {best * 1000:8.1f} {size / 1024:8.1f}")
+
+
+if __name__ == "__main__":
+  main()
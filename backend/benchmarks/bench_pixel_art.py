@@ -0,0 +1,70 @@
+"""Throughput of the local pixel-art engine at 1, 4 and 12 MP.
+
+Run from `backend/`: python -m benchmarks.bench_pixel_art [--repeat N]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from app.services.pixel_art import palette_lut, pixelate
+
+SIZES = {"1MP": (1152, 864), "4MP": (2304, 1728), "12MP": (4000, 3000)}
+VARIANTS = {
+  "legacy-nearest": None,
+  "average+palette": {},
+  "average+palette+dither": {"dither": True},
+  "average+palette+outline": {"outline_edges": True},
+}
+
+
+def _photo_like(size: tuple[int, int]) -> Image.Image:
+  width, height = size
+  rng = np.random.default_rng(0)
+  y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+  base = np.stack([x / width * 255, y / height * 255, (x + y) / (width + height) * 255], axis=-1)
+  noise = rng.normal(0, 18, size=base.shape).astype(np.float32)
+  return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8))
+
+
+def _legacy(image: Image.Image, block: int) -> Image.Image:
+  small = image.resize((image.width // block, image.height // block), resample=Image.NEAREST)
+  return small.resize(image.size, resample=Image.NEAREST)
+
+
+def _time(fn, repeat: int) -> float:
+  best = float("inf")
+  for _ in range(repeat):
+    start = time.perf_counter()
+    fn()
+    best = min(best, time.perf_counter() - start)
+  return best
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--repeat", type=int, default=3)
+  parser.add_argument("--block", type=int, default=10)
+  args = parser.parse_args()
+
+  palette_lut()  # built once per process; exclude from per-image timings
+  print(f"{'size':>5}  {'variant':<26} {'ms':>8} {'MP/s':>7} {'+PNG ms':>8}")
+  for label, size in SIZES.items():
+    image = _photo_like(size)
+    megapixels = size[0] * size[1] / 1e6
+    for name, options in VARIANTS.items():
+      if options is None:
+        render = lambda: _legacy(image, args.block)  # noqa: E731
+      else:
+        render = lambda options=options: pixelate(image, args.block, **options)  # noqa: E731
+      seconds = _time(render, args.repeat)
+      encoded = _time(lambda: render().save(BytesIO(), format="PNG"), 1)
+      print(f"{label:>5}  {name:<26} {seconds * 1000:8.1f} {megapixels / seconds:7.1f} {encoded * 1000:8.1f}")
+
+
+if __name__ == "__main__":
+  main()